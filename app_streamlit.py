@@ -1,20 +1,24 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
+# pandas, plotly, numpy and the index modules built on them are imported
+# inside the functions that use them, so the login page renders without them
 from product_data import (
-    products, products_by_category, products_by_brand,
-    search_by_price_range, search_by_top_ratings,
-    add_product_obj, remove_product_obj
+    get_catalog, search_by_price_range, search_by_top_ratings,
+    add_product_obj, remove_product_obj, update_product_obj, add_catalog_listener,
+    set_duplicate_detector, start_background_load
 )
 from models import Product
-from search_algorithms import SearchAlgorithms
+from search_algorithms import Analyzer, product_facets
+from search_runtime import get_search_engine, start_background_build, search_ready
+from search_metrics import MetricsRegistry, exporters_from_env
+from query_log import QueryLogger
 import difflib
 from user_management import (
     register_user, login_user, add_to_cart, remove_from_cart, 
-    get_cart, get_user_data, update_user_data
+    get_cart, get_user_data, checkout,
+    load_users, add_basket_listener
 )
 import json
+import os
 import time
 
 # Set page configuration - must be the first Streamlit command
@@ -24,8 +28,41 @@ st.set_page_config(
     layout="wide"
 )
 
-# Initialize search algorithms
-search_algo = SearchAlgorithms(products)
+# Search metrics are shared by every session and survive reruns
+@st.cache_resource
+def get_metrics_registry():
+    return MetricsRegistry(exporters_from_env())
+
+# Query capture is opt-in: set SEARCH_QUERY_LOG to a file path to enable it
+@st.cache_resource
+def get_query_logger():
+    path = os.environ.get("SEARCH_QUERY_LOG")
+    return QueryLogger(path) if path else None
+
+# Catalog and search indexes load on a background thread while the login page renders.
+# With a search service the local indexes are never used, so only the catalog loads.
+if os.environ.get("SEARCH_SERVICE_URL"):
+    start_background_load()
+else:
+    start_background_build(metrics=get_metrics_registry(), query_logger=get_query_logger())
+
+# Optional shared search service (see search_server.py): set SEARCH_SERVICE_URL to use it
+@st.cache_resource
+def get_search_client(url):
+    from search_server import SearchClient
+    client = SearchClient(url)
+    # Keep the service index in step with edits made from the Manage Products tab
+    def forward_change(event, product):
+        if event == "add":
+            client.add_product(product)
+        elif event == "remove":
+            client.remove_product(product.pid)
+        elif event == "update":
+            fields = product.to_dict()
+            del fields["pid"]
+            client.update_product(product.pid, **fields)
+    add_catalog_listener(forward_change)
+    return client
 
 # Custom CSS for better UI
 st.markdown("""
@@ -132,6 +169,44 @@ def show_search_box():
                         st.session_state.show_suggestions = False
                         st.rerun()
 
+def highlight_field(product, field_name, highlights):
+    """Wrap the phrase engine's matched spans of one field in <mark> tags"""
+    text = getattr(product, field_name)
+    spans = sorted((start, end) for name, start, end in highlights.get(product.pid, ()) if name == field_name)
+    # Offsets index the analyzed text, which only lines up when normalization kept the length
+    if not spans or len(Analyzer.normalize(text)) != len(text):
+        return text
+    parts, last = [], 0
+    for start, end in spans:
+        if start < last:
+            continue
+        parts.append(text[last:start])
+        parts.append(f"<mark>{text[start:end]}</mark>")
+        last = end
+    parts.append(text[last:])
+    return "".join(parts)
+
+FACET_LABELS = {"brand": "Brand", "category": "Category", "availability": "Availability", "price": "Price (PKR)"}
+
+def show_facet_filters(results):
+    """Sidebar drill-down built from the facet counts of the broadest result"""
+    broadest = max(results.values(), key=lambda r: r.matches_found)
+    if not broadest.facets:
+        return {}
+    st.sidebar.markdown("### Refine Results")
+    selected = {}
+    for facet, counts in broadest.facets.items():
+        chosen = st.sidebar.multiselect(
+            FACET_LABELS.get(facet, facet.title()),
+            options=list(counts),
+            format_func=lambda value, facet=facet, counts=counts:
+                f"{value if facet == 'price' else value.title()} ({counts[value]})",
+            key=f"facet_{facet}"
+        )
+        if chosen:
+            selected[facet] = set(chosen)
+    return selected
+
 def show_search_results(query):
     if not query:
         return
@@ -139,7 +214,16 @@ def show_search_results(query):
     st.markdown("### Search Results")
     
     # Run all search algorithms
-    results = search_algo.run_all_searches(query)
+    results = search_algo.run_all_searches(query, facets=True)
+    if not results:
+        st.info("No products found")
+        return
+    corrected = next((r.corrected_query for r in results.values() if r.corrected_query), None)
+    if corrected:
+        st.markdown(f"Showing results for **{corrected}**")
+    selected = show_facet_filters(results)
+    
+    import plotly.graph_objects as go
     
     # Create comparison chart
     algo_names = [r.algorithm_name for r in results.values()]
@@ -176,19 +260,25 @@ def show_search_results(query):
     # Display results from each algorithm
     for algo_name, result in results.items():
         with st.expander(f"{result.algorithm_name} Results ({result.matches_found} matches, {result.time_taken*1000:.2f}ms)"):
-            if result.products:
-                for idx, product in enumerate(result.products):
+            st.caption(" | ".join(f"{stage}: {ns / 1e6:.3f}ms" for stage, ns in result.stages.items()))
+            products = result.products
+            if selected:
+                products = [p for p in products
+                            if all(value in selected[facet] for facet, value in product_facets(p).items() if facet in selected)]
+            if products:
+                for idx, product in enumerate(products):
                     with st.container():
                         col1, col2 = st.columns([3, 1])
                         with col1:
                             st.markdown(f"""
                             <div class="product-card">
-                                <h3>{product.name}</h3>
+                                <h3>{highlight_field(product, 'name', result.highlights)}</h3>
                                 <p><strong>Brand:</strong> {product.brand}</p>
                                 <p><strong>Price:</strong> PKR {product.price:,}</p>
                                 <p><strong>Rating:</strong> {'⭐' * product.rating}</p>
                                 <p><strong>Availability:</strong> {product.availability}</p>
-                                <p>{product.description}</p>
+                                {f"<p><strong>Relevance:</strong> {result.scores[product.pid]:.2f}</p>" if product.pid in result.scores else ""}
+                                <p>{highlight_field(product, 'description', result.highlights)}</p>
                             </div>
                             """, unsafe_allow_html=True)
                         with col2:
@@ -201,6 +291,26 @@ def show_search_results(query):
             else:
                 st.write("No products found")
 
+def show_metrics_panel():
+    """Rolling per-engine latency and work counters since the server started"""
+    import pandas as pd
+    
+    summary = get_metrics_registry().snapshot()
+    if not summary:
+        st.write("No searches recorded yet")
+        return
+    rows = []
+    for engine, stats in summary.items():
+        rows.append({
+            'Engine': engine,
+            'Searches': stats['count'],
+            'p50 (ms)': round(stats['p50_ms'], 3),
+            'p95 (ms)': round(stats['p95_ms'], 3),
+            'p99 (ms)': round(stats['p99_ms'], 3),
+            **{k.replace('_', ' ').capitalize(): v for k, v in stats['counters'].items()}
+        })
+    st.dataframe(pd.DataFrame(rows), hide_index=True)
+
 def show_login_form():
     st.subheader("Login")
     username = st.text_input("Username", key="login_username")
@@ -243,7 +353,7 @@ def show_cart():
     
     total = 0
     for product_id in cart_items:
-        product = next((p for p in products if p.pid == product_id), None)
+        product = catalog.products_by_id.get(product_id)
         if product:
             col1, col2, col3 = st.columns([3, 1, 1])
             with col1:
@@ -257,13 +367,24 @@ def show_cart():
             total += product.price
     
     st.write(f"**Total: PKR {total:,}**")
+    
+    recommended = get_recommender().for_cart(cart_items, k=5, catalog_version=catalog.version)
+    recommended = [catalog.products_by_id[pid] for pid, _ in recommended if pid in catalog.products_by_id]
+    if recommended:
+        st.markdown("#### Frequently Added Together")
+        for product in recommended:
+            col1, col2 = st.columns([4, 1])
+            with col1:
+                st.write(f"{product.name} - PKR {product.price:,}")
+            with col2:
+                if st.button("Add", key=f"cart_recommend_{product.pid}"):
+                    add_to_cart(st.session_state.username, product.pid)
+                    st.rerun()
+    
     if st.button("Checkout", key="cart_checkout"):
         st.success("Order placed successfully!")
-        # Clear cart after checkout
-        user_data = get_user_data(st.session_state.username)
-        if user_data:
-            user_data["cart"] = []
-            update_user_data(st.session_state.username, user_data)
+        # The cart becomes an order and starts over empty
+        if checkout(st.session_state.username):
             st.rerun()
 
 def add_to_compare(product_id):
@@ -277,9 +398,11 @@ def show_compare_products():
         st.write("No products selected for comparison")
         return
     
+    import pandas as pd
+    
     compare_data = []
     for pid in st.session_state.compare_products:
-        product = next((p for p in products if p.pid == pid), None)
+        product = catalog.products_by_id.get(pid)
         if product:
             compare_data.append({
                 'Name': product.name,
@@ -294,25 +417,51 @@ def show_compare_products():
         df = pd.DataFrame(compare_data)
         st.table(df)
         
+        st.markdown("#### Similar Products")
+        pids = [pid for pid in st.session_state.compare_products if pid in catalog.products_by_id]
+        for pid, neighbours in zip(pids, get_similarity_index().similar_many(pids, k=5)):
+            similar = [catalog.products_by_id[n] for n, _ in neighbours if n in catalog.products_by_id]
+            st.caption(f"Like {catalog.products_by_id[pid].name}: " + (", ".join(
+                f"{p.name} (PKR {p.price:,})" for p in similar) or "nothing close"))
+        
         if st.button("Clear Comparison", key="clear_comparison"):
             st.session_state.compare_products = []
             st.rerun()
 
-# Convert products to DataFrame for easier manipulation
+# Columnar catalog view shared by every session, patched on each mutation
+@st.cache_resource
+def get_catalog_frame():
+    from catalog_frame import CatalogFrame
+    return CatalogFrame()
+
+# "More like this" vectors, shared by every session and patched on each mutation
+@st.cache_resource
+def get_similarity_index():
+    from similar_products import SimilarityIndex
+    index = SimilarityIndex(list(get_catalog().products))
+    add_catalog_listener(index.on_catalog_change)
+    return index
+
+# Co-occurrence counts seeded from users.json, then patched on every basket event
+@st.cache_resource
+def get_recommender():
+    from recommendations import CooccurrenceRecommender
+    recommender = CooccurrenceRecommender.from_users(load_users())
+    recommender.warm()
+    add_basket_listener(recommender.on_basket_change)
+    return recommender
+
+# Near-duplicate check for new listings, seeded from the catalog in one bulk pass
+@st.cache_resource
+def get_duplicate_detector():
+    from dedup import NearDuplicateIndex
+    detector = NearDuplicateIndex()
+    detector.add_many(list(get_catalog().products))
+    set_duplicate_detector(detector)
+    return detector
+
 def get_products_df():
-    data = []
-    for product in products:
-        data.append({
-            'ID': product.pid,
-            'Name': product.name,
-            'Brand': product.brand,
-            'Price': product.price,
-            'Availability': product.availability,
-            'Category': product.category,
-            'Rating': product.rating,
-            'Description': product.description
-        })
-    return pd.DataFrame(data)
+    return get_catalog_frame().get()
 
 # Function to check login status
 def check_login_status():
@@ -368,9 +517,22 @@ if not is_logged_in:
     with tab2:
         show_register_form()
 else:
+    # Initialize search algorithms (shared by every session, usually built by now)
+    if os.environ.get("SEARCH_SERVICE_URL"):
+        search_algo = get_search_client(os.environ["SEARCH_SERVICE_URL"])
+    elif search_ready.is_set():
+        search_algo = get_search_engine()
+    else:
+        with st.spinner("Loading catalog..."):
+            search_algo = get_search_engine()
+    # One consistent catalog snapshot for this whole rerun, even if another session edits it
+    catalog = get_catalog()
+    
     st.sidebar.write(f"Welcome, {st.session_state.username}!")
     if st.sidebar.button("Logout", key="logout_button"):
         handle_logout()
+    with st.sidebar.expander("Search Metrics"):
+        show_metrics_panel()
     
     # Main tabs
     tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
@@ -409,6 +571,8 @@ else:
                         st.success("Added to comparison!")
     
     with tab3:
+        import plotly.express as px
+        
         st.header("Product Analytics")
         df = get_products_df()
         
@@ -452,10 +616,12 @@ else:
             new_price = st.number_input("Price (PKR)", min_value=0, key="new_product_price")
             new_availability = st.selectbox("Availability", ["In Stock", "Out of Stock"], key="new_product_availability")
             new_description = st.text_area("Description", key="new_product_description")
-            new_category = st.selectbox("Category", list(products_by_category.keys()) + ["New Category"], key="new_product_category")
+            new_category = st.selectbox("Category", list(catalog.products_by_category.keys()) + ["New Category"], key="new_product_category")
             if new_category == "New Category":
                 new_category = st.text_input("Enter New Category", key="new_category_input")
             new_rating = st.slider("Rating", 1, 5, 3, key="new_product_rating")
+            merge_duplicates = st.checkbox("Merge into an existing near-duplicate listing", value=False,
+                                           key="new_product_merge")
             
             submitted = st.form_submit_button("Add Product")
             if submitted:
@@ -463,28 +629,32 @@ else:
                     st.error("Please fill in all fields")
                 else:
                     # Get the next available product ID
-                    new_pid = max(p.pid for p in products) + 1 if products else 1
+                    new_pid = max(catalog.products_by_id) + 1 if catalog.products else 1
                     # Create new product
                     new_product = Product(new_pid, new_name, new_brand, new_price, 
                                         new_availability, new_description, new_category, new_rating)
-                    add_product_obj(new_product)
-                    st.success(f"Product '{new_name}' added successfully!")
+                    get_duplicate_detector()
+                    stored_pid = add_product_obj(new_product, on_duplicate="merge" if merge_duplicates else "add")
+                    if stored_pid != new_pid:
+                        st.info(f"'{new_name}' looks like '{catalog.products_by_id[stored_pid].name}', "
+                                f"updated that listing instead")
+                    else:
+                        st.success(f"Product '{new_name}' added successfully!")
                     st.rerun()
         
         # Edit/Delete existing products
         st.subheader("Manage Existing Products")
-        product_df = get_products_df()
-        st.dataframe(product_df)
+        st.dataframe(get_products_df(), hide_index=True)
         
         # Edit product
         st.subheader("Edit Product")
         edit_pid = st.selectbox("Select Product to Edit", 
-                              options=[p.pid for p in products],
-                              format_func=lambda x: f"{x} - {next(p.name for p in products if p.pid == x)}",
+                              options=[p.pid for p in catalog.products],
+                              format_func=lambda x: f"{x} - {catalog.products_by_id[x].name}",
                               key="edit_product_select")
         
         if edit_pid:
-            product_to_edit = next(p for p in products if p.pid == edit_pid)
+            product_to_edit = catalog.products_by_id[edit_pid]
             with st.form("edit_product_form"):
                 edit_name = st.text_input("Product Name", value=product_to_edit.name, key="edit_product_name")
                 edit_brand = st.text_input("Brand", value=product_to_edit.brand, key="edit_product_brand")
@@ -493,9 +663,9 @@ else:
                                               index=0 if product_to_edit.availability == "In Stock" else 1,
                                               key="edit_product_availability")
                 edit_description = st.text_area("Description", value=product_to_edit.description, key="edit_product_description")
-                edit_category = st.selectbox("Category", list(products_by_category.keys()) + ["New Category"],
-                                          index=list(products_by_category.keys()).index(product_to_edit.category) 
-                                          if product_to_edit.category in products_by_category.keys() else len(products_by_category.keys()),
+                edit_category = st.selectbox("Category", list(catalog.products_by_category.keys()) + ["New Category"],
+                                          index=list(catalog.products_by_category.keys()).index(product_to_edit.category) 
+                                          if product_to_edit.category in catalog.products_by_category.keys() else len(catalog.products_by_category.keys()),
                                           key="edit_product_category")
                 if edit_category == "New Category":
                     edit_category = st.text_input("Enter New Category", value=product_to_edit.category, key="edit_category_input")
@@ -506,25 +676,27 @@ else:
                     if not all([edit_name, edit_brand, edit_price, edit_availability, edit_description, edit_category]):
                         st.error("Please fill in all fields")
                     else:
-                        # Remove old product
-                        remove_product_obj(edit_pid)
-                        # Add updated product
-                        updated_product = Product(edit_pid, edit_name, edit_brand, edit_price,
-                                                edit_availability, edit_description, edit_category, edit_rating)
-                        add_product_obj(updated_product)
+                        # Only send the fields that actually changed
+                        edited = {
+                            "name": edit_name, "brand": edit_brand, "price": edit_price,
+                            "availability": edit_availability, "description": edit_description,
+                            "category": edit_category, "rating": edit_rating
+                        }
+                        changes = {k: v for k, v in edited.items() if getattr(product_to_edit, k) != v}
+                        update_product_obj(edit_pid, **changes)
                         st.success(f"Product '{edit_name}' updated successfully!")
                         st.rerun()
         
         # Delete product
         st.subheader("Delete Product")
         delete_pid = st.selectbox("Select Product to Delete",
-                                options=[p.pid for p in products],
-                                format_func=lambda x: f"{x} - {next(p.name for p in products if p.pid == x)}",
+                                options=[p.pid for p in catalog.products],
+                                format_func=lambda x: f"{x} - {catalog.products_by_id[x].name}",
                                 key="delete_product_select")
         
         if delete_pid:
             if st.button("Delete Product", key="delete_product_button"):
-                product_to_delete = next(p for p in products if p.pid == delete_pid)
+                product_to_delete = catalog.products_by_id[delete_pid]
                 if remove_product_obj(delete_pid):
                     st.success(f"Product '{product_to_delete.name}' deleted successfully!")
                     st.rerun()
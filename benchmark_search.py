@@ -0,0 +1,175 @@
+"""Scaling benchmark for the SearchAlgorithms engines.
+
+Example:
+    python benchmark_search.py --sizes 1000,10000,100000 --queries 300 --output bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from search_algorithms import SearchAlgorithms
+from search_metrics import percentile
+from synthetic_catalog import generate_catalog, generate_queries
+
+ENGINES = ["linear", "indexed", "fuzzy", "regex", "price_range", "suggestions"]
+
+def summarize(latencies):
+    """Latency percentiles in milliseconds plus throughput for a list of seconds."""
+    total = sum(latencies)
+    return {
+        "queries": len(latencies),
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "mean_ms": total / len(latencies) * 1000 if latencies else 0.0,
+        "throughput_qps": len(latencies) / total if total else 0.0,
+    }
+
+def engine_call(search, engine, query):
+    """Return a zero-argument callable that runs one query on one engine."""
+    if engine == "price_range":
+        match = re.match(r'price:(\d+)-(\d+)', query)
+        min_price, max_price = map(float, match.groups())
+        return lambda: search.price_range_search(min_price, max_price)
+    if engine == "suggestions":
+        return lambda: search.get_suggestions(query)
+    return lambda: getattr(search, f"{engine}_search")(query)
+
+def engine_queries(engine, workload):
+    # Price queries only make sense for the price engine and vice versa
+    if engine == "price_range":
+        return [q for kind, q in workload if kind == "price"]
+    return [q for kind, q in workload if kind != "price"]
+
+def run_engine(search, engine, queries, memory_sample):
+    SearchAlgorithms._get_suggestions.cache_clear()
+    latencies = []
+    for query in queries:
+        call = engine_call(search, engine, query)
+        start = time.perf_counter()
+        call()
+        latencies.append(time.perf_counter() - start)
+    stats = summarize(latencies)
+
+    # Measure peak allocation separately so tracing does not skew the latencies
+    SearchAlgorithms._get_suggestions.cache_clear()
+    tracemalloc.start()
+    for query in queries[:memory_sample]:
+        engine_call(search, engine, query)()
+    stats["peak_memory_bytes"] = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return stats
+
+def run_batch(search, queries):
+    """Per-query loop against one search_many call on the indexed engine.
+
+    Measured twice: on the workload as generated (repeated queries are
+    answered once by search_many) and on its distinct queries only, which
+    shows the work the batch shares beyond deduplication.
+    """
+    distinct = list(dict.fromkeys(search.analyzer.query_tokens(q)[0] for q in queries))
+    report = {}
+    for label, batch in (("with_repeats", queries), ("distinct", distinct)):
+        start = time.perf_counter()
+        for query in batch:
+            search.indexed_search(query)
+        loop_s = time.perf_counter() - start
+        start = time.perf_counter()
+        search.search_many(batch, "indexed")
+        batch_s = time.perf_counter() - start
+        report[label] = {"queries": len(batch), "loop_s": loop_s, "batch_s": batch_s,
+                         "speedup": loop_s / batch_s if batch_s else None}
+    return report
+
+def build_peak_memory(catalog, build_workers):
+    """Peak allocation of a second, traced build (tracing slows the build several times over)"""
+    tracemalloc.start()
+    SearchAlgorithms(catalog, build_workers=build_workers)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+def run_size(size, args):
+    catalog = generate_catalog(size, seed=args.seed)
+    workload = generate_queries(catalog, args.queries, seed=args.seed)
+
+    start = time.perf_counter()
+    search = SearchAlgorithms(catalog, build_workers=args.build_workers)
+    build_time = time.perf_counter() - start
+    build_peak = build_peak_memory(catalog, args.build_workers)
+
+    result = {"size": size, "build_time_s": build_time, "build_peak_memory_bytes": build_peak,
+              "build_stages_ms": {stage: ns / 1e6 for stage, ns in search.build_stages.items()}, "engines": {}}
+    for engine in args.engines:
+        queries = engine_queries(engine, workload)
+        if engine in args.slow_engines:
+            queries = queries[:args.slow_queries]
+        result["engines"][engine] = run_engine(search, engine, queries, args.memory_sample)
+        print(f"  {engine:<12} p50={result['engines'][engine]['p50_ms']:.3f}ms "
+              f"p99={result['engines'][engine]['p99_ms']:.3f}ms "
+              f"qps={result['engines'][engine]['throughput_qps']:.1f}", file=sys.stderr)
+    if "indexed" in args.engines:
+        result["batch_indexed"] = run_batch(search, engine_queries("indexed", workload))
+        for label, batch in result["batch_indexed"].items():
+            print(f"  batch {label:<12} {batch['queries']} queries x{batch['speedup']:.2f}", file=sys.stderr)
+    SearchAlgorithms._get_suggestions.cache_clear()
+    return result
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark every search engine on synthetic catalogs")
+    parser.add_argument("--sizes", default="1000,10000", help="comma separated catalog sizes (up to 1000000)")
+    parser.add_argument("--queries", type=int, default=300, help="queries in the workload per size")
+    parser.add_argument("--engines", default=",".join(ENGINES), help="comma separated engines to run")
+    parser.add_argument("--slow-engines", default="fuzzy,regex,linear",
+                        help="engines capped at --slow-queries (they scan the whole catalog)")
+    parser.add_argument("--slow-queries", type=int, default=50)
+    parser.add_argument("--memory-sample", type=int, default=20, help="queries traced for peak memory")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--build-workers", type=int, default=0,
+                        help="processes building each index (0 builds in-process)")
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    args = parser.parse_args(argv)
+    args.engines = [e for e in args.engines.split(",") if e]
+    args.slow_engines = set(e for e in args.slow_engines.split(",") if e)
+    unknown = set(args.engines) - set(ENGINES)
+    if unknown:
+        parser.error(f"unknown engines: {', '.join(sorted(unknown))}")
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "queries": args.queries,
+            "build_workers": args.build_workers,
+        },
+        "results": [],
+    }
+    for size in (int(s) for s in args.sizes.split(",") if s):
+        print(f"Catalog size {size:,}", file=sys.stderr)
+        report["results"].append(run_size(size, args))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+    return report
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,101 @@
+"""Cold-start benchmark: import time and time to first search in a fresh interpreter.
+
+Each run is a new Python process, so nothing is warm from the previous one.
+"lazy" imports only what the login page needs, as app_streamlit.py does;
+"eager" also imports pandas, plotly and the numpy-backed indexes up front,
+as the app used to.
+
+Example:
+    python benchmark_startup.py --runs 7 --target-ms 1500 --output startup.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+from datetime import datetime
+from benchmark_search import git_commit
+
+# What the app imports before login, minus streamlit itself
+APP_MODULES = ["product_data", "search_runtime", "search_metrics", "query_log"]
+HEAVY_MODULES = ["pandas", "plotly.express", "plotly.graph_objects", "catalog_frame",
+                 "similar_products", "recommendations", "dedup", "search_server"]
+
+# Runs in the child process; prints its own timings as JSON
+_PROBE = """
+import importlib, json, sys, time
+start = time.perf_counter()
+for name in {modules!r}:
+    importlib.import_module(name)
+imported = time.perf_counter()
+import search_runtime
+ready = search_runtime.start_background_build()
+ready.wait()
+built = time.perf_counter()
+search_runtime.get_search_engine().run_all_searches({query!r})
+searched = time.perf_counter()
+print(json.dumps({{"import_ms": (imported - start) * 1000,
+                   "build_ms": (built - imported) * 1000,
+                   "first_search_ms": (searched - start) * 1000}}))
+"""
+
+def run_once(mode, query):
+    modules = APP_MODULES + (HEAVY_MODULES if mode == "eager" else [])
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(__file__)))
+    # The child's stderr passes through, so a failed import shows its traceback
+    completed = subprocess.run([sys.executable, "-c", _PROBE.format(modules=modules, query=query)],
+                               stdout=subprocess.PIPE, text=True, env=env, check=True)
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def run_mode(mode, args):
+    runs = [run_once(mode, args.query) for _ in range(args.runs)]
+    result = {"runs": args.runs}
+    for key in ("import_ms", "build_ms", "first_search_ms"):
+        values = [r[key] for r in runs]
+        result[key] = statistics.median(values)
+        result[key.replace("_ms", "_max_ms")] = max(values)
+    print(f"  {mode:<6} import={result['import_ms']:.1f}ms build={result['build_ms']:.1f}ms "
+          f"first search={result['first_search_ms']:.1f}ms", file=sys.stderr)
+    return result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure cold-start import time and time to first search")
+    parser.add_argument("--runs", type=int, default=5, help="fresh processes per mode; medians are reported")
+    parser.add_argument("--modes", default="lazy,eager", help="comma separated: lazy, eager")
+    parser.add_argument("--query", default="laptop")
+    parser.add_argument("--target-ms", type=float,
+                        help="exit with status 1 if the lazy median time to first search exceeds this")
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    args = parser.parse_args(argv)
+    modes = [m for m in args.modes.split(",") if m]
+    unknown = set(modes) - {"lazy", "eager"}
+    if unknown:
+        parser.error(f"unknown modes: {', '.join(sorted(unknown))}")
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "runs": args.runs,
+            "query": args.query,
+        },
+        "results": {mode: run_mode(mode, args) for mode in modes},
+    }
+    if args.target_ms is not None and "lazy" in report["results"]:
+        report["target_ms"] = args.target_ms
+        report["within_target"] = report["results"]["lazy"]["first_search_ms"] <= args.target_ms
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+    return report
+
+if __name__ == "__main__":
+    report = main()
+    sys.exit(0 if report.get("within_target", True) else 1)
@@ -0,0 +1,124 @@
+import threading
+import pandas as pd
+import product_data
+
+# Column order shown in the Manage Products table
+COLUMNS = ['ID', 'Name', 'Brand', 'Price', 'Availability', 'Category', 'Rating', 'Description']
+# Low-cardinality columns stored as pandas categoricals
+CATEGORICAL_COLUMNS = ['Brand', 'Category', 'Availability']
+
+def product_row(product):
+    return {
+        'ID': product.pid,
+        'Name': product.name,
+        'Brand': product.brand,
+        'Price': product.price,
+        'Availability': product.availability,
+        'Category': product.category,
+        'Rating': product.rating,
+        'Description': product.description
+    }
+
+def build_frame(products):
+    """Build a columnar frame straight from the product attributes."""
+    df = pd.DataFrame({
+        'ID': [p.pid for p in products],
+        'Name': [p.name for p in products],
+        'Brand': pd.Categorical([p.brand for p in products]),
+        'Price': [p.price for p in products],
+        'Availability': pd.Categorical([p.availability for p in products]),
+        'Category': pd.Categorical([p.category for p in products]),
+        'Rating': [p.rating for p in products],
+        'Description': [p.description for p in products],
+    }, columns=COLUMNS)
+    df.index = pd.Index(df['ID'].to_numpy())
+    return df
+
+class CatalogFrame:
+    """Versioned DataFrame view of product_data, patched from catalog mutations.
+
+    One instance is shared by every session, so callers must treat ``df``
+    as read-only. Mutations are only recorded as they happen. The next
+    get() applies them all in one patch: removed rows are dropped in one
+    call, new rows are appended with a single concat, and only the columns
+    an edit changed are copied. Unchanged columns are shared with the previous
+    frame, and frames already handed out are never modified. A large backlog
+    of changes is cheaper as a rebuild.
+    """
+    # Pending changes beyond this share of the catalog rebuild the frame instead
+    REBUILD_RATIO = 0.25
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        catalog = product_data.get_catalog()
+        self.df = build_frame(catalog.products)
+        self.version = catalog.version
+        # pid -> latest product, or None once removed, since self.version
+        self._pending = {}
+        self._pending_version = catalog.version
+        product_data.add_catalog_listener(self._on_change)
+
+    def _on_change(self, event, product):
+        with self._lock:
+            self._pending[product.pid] = None if event == "remove" else product
+            self._pending_version += 1
+
+    def get(self):
+        """Return the current frame, applying pending changes or rebuilding if one slipped past."""
+        with self._lock:
+            catalog = product_data.get_catalog()
+            if self.version == catalog.version:
+                return self.df
+            if (self._pending_version != catalog.version
+                    or len(self._pending) > self.REBUILD_RATIO * max(len(catalog.products), 1)):
+                self.df = build_frame(catalog.products)
+            else:
+                self.df = self._patch(self.df, self._pending)
+            self._pending = {}
+            self._pending_version = self.version = catalog.version
+            return self.df
+
+    @staticmethod
+    def _patch(df, changes):
+        present = df.index
+        removed = [pid for pid, product in changes.items() if product is None and pid in present]
+        updated = {pid: product for pid, product in changes.items() if product is not None and pid in present}
+        added = [product for pid, product in changes.items() if product is not None and pid not in present]
+        df = df.drop(index=removed) if removed else df.copy(deep=False)
+        if updated:
+            df = CatalogFrame._replace_rows(df, updated)
+        if added:
+            df = CatalogFrame._append(df, added)
+        if removed or updated:
+            for col in CATEGORICAL_COLUMNS:
+                df[col] = df[col].cat.remove_unused_categories()
+        return df
+
+    @staticmethod
+    def _replace_rows(df, products):
+        positions = df.index.get_indexer(list(products))
+        rows = [product_row(p) for p in products.values()]
+        for col in COLUMNS:
+            values = [row[col] for row in rows]
+            column = df[col]
+            if column.iloc[positions].tolist() == values:
+                # Untouched columns stay shared with the previous frame
+                continue
+            column = column.copy()
+            if col in CATEGORICAL_COLUMNS:
+                column = column.cat.add_categories(sorted(set(values) - set(column.cat.categories)))
+            column.iloc[positions] = values
+            # Assigning a column replaces it in this frame only
+            df[col] = column
+        return df
+
+    @staticmethod
+    def _append(df, products):
+        rows = pd.DataFrame([product_row(p) for p in products], columns=COLUMNS,
+                            index=[p.pid for p in products])
+        for col in CATEGORICAL_COLUMNS:
+            # Keep both sides on the same categories so concat stays categorical
+            categories = df[col].cat.categories.union(rows[col].unique())
+            df[col] = df[col].cat.set_categories(categories)
+            rows[col] = pd.Categorical(rows[col], categories=categories)
+        return pd.concat([df, rows])
@@ -0,0 +1,194 @@
+"""MinHash/LSH near-duplicate detection for catalog ingestion.
+
+A product's shingles are the character trigrams of its name words (so word
+order does not matter: "Apple iPhone 14 Pro" and "iPhone 14 Pro - Apple"
+shingle identically) plus its description words. Shingles are hashed with
+CRC32, which is stable across processes, and compressed into a MinHash
+signature. Signatures are split into LSH bands, so only products sharing a
+whole band are compared: insertion cost does not grow with catalog size.
+Name tokens containing digits must match exactly, so "iPhone 14" and
+"iPhone 15" never merge however similar the rest of the listing is.
+"""
+import threading
+import zlib
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import numpy as np
+from models import Product
+from search_algorithms import Analyzer
+
+# Mersenne prime for the (a * x + b) mod p hash family; a * x stays below 2**62
+_PRIME = (1 << 31) - 1
+
+_analyzer = Analyzer()
+
+# The only product fields shingles() and model_numbers() read
+SHINGLE_FIELDS = ("name", "description")
+
+def shingles(product: Product) -> Set[int]:
+    """CRC32 hashes of name-word trigrams and description words"""
+    tokens = set()
+    for word in _analyzer.tokenize(_analyzer.normalize(product.name)):
+        padded = f" {word} "
+        tokens.update(padded[i:i + 3] for i in range(max(1, len(padded) - 2)))
+    tokens.update("d:" + word for word in _analyzer.tokenize(_analyzer.normalize(product.description)))
+    return {zlib.crc32(token.encode()) for token in tokens}
+
+def shingle_text(product: Product) -> Tuple[str, ...]:
+    return tuple(getattr(product, name) for name in SHINGLE_FIELDS)
+
+def model_numbers(product: Product) -> frozenset:
+    """Name tokens with a digit in them (model numbers, sizes, capacities)"""
+    return frozenset(t for t in _analyzer.tokenize(_analyzer.normalize(product.name)) if any(c.isdigit() for c in t))
+
+class MinHasher:
+    def __init__(self, num_perm: int = 128, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, _PRIME, size=(num_perm, 1), dtype=np.uint64)
+        self.b = rng.integers(0, _PRIME, size=(num_perm, 1), dtype=np.uint64)
+
+    def signature(self, hashes: Iterable[int]) -> np.ndarray:
+        x = np.fromiter(hashes, dtype=np.uint64) % _PRIME
+        if not len(x):
+            return np.full(len(self.a), _PRIME, dtype=np.uint64)
+        return ((self.a * x + self.b) % _PRIME).min(axis=1)
+
+def _signatures(args):
+    num_perm, seed, products = args
+    hasher = MinHasher(num_perm, seed)
+    return [(p.pid, hasher.signature(shingles(p)), model_numbers(p)) for p in products]
+
+class NearDuplicateIndex:
+    """LSH index of MinHash signatures with a Jaccard threshold.
+
+    With ``bands`` bands of ``rows`` rows, pairs above roughly
+    (1 / bands) ** (1 / rows) similarity become candidates (about 0.7 for the
+    defaults). Candidates are then kept only if their estimated Jaccard
+    similarity reaches ``threshold``.
+    """
+    def __init__(self, threshold: float = 0.8, bands: int = 16, rows: int = 8, seed: int = 1):
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = rows
+        self.seed = seed
+        self.hasher = MinHasher(bands * rows, seed)
+        self._lock = threading.Lock()
+        self.signatures: Dict[int, np.ndarray] = {}
+        self.models: Dict[int, frozenset] = {}
+        self.texts: Dict[int, Tuple[str, ...]] = {}
+        self.buckets: List[Dict[bytes, Set[int]]] = [defaultdict(set) for _ in range(bands)]
+        # pid -> [(duplicate pid, estimated Jaccard)] found when the pid was added
+        self.flagged: Dict[int, List[Tuple[int, float]]] = {}
+
+    def signature(self, product: Product) -> np.ndarray:
+        return self.hasher.signature(shingles(product))
+
+    def _band_keys(self, signature: np.ndarray):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def _matches(self, signature: np.ndarray, models: frozenset,
+                 exclude: Optional[int] = None) -> List[Tuple[int, float]]:
+        candidates = set()
+        for band, key in self._band_keys(signature):
+            candidates.update(self.buckets[band].get(key, ()))
+        candidates.discard(exclude)
+        matches = []
+        for pid in candidates:
+            if self.models[pid] != models:
+                continue
+            similarity = float(np.mean(self.signatures[pid] == signature))
+            if similarity >= self.threshold:
+                matches.append((pid, similarity))
+        matches.sort(key=lambda m: (-m[1], m[0]))
+        return matches
+
+    def find_duplicates(self, product: Product) -> List[Tuple[int, float]]:
+        """Indexed products that look like near-duplicates of ``product``, most similar first"""
+        signature = self.signature(product)
+        with self._lock:
+            return self._matches(signature, model_numbers(product), exclude=product.pid)
+
+    def add(self, product: Product, signature: Optional[np.ndarray] = None,
+            models: Optional[frozenset] = None) -> List[Tuple[int, float]]:
+        """Index a product and return (and flag) the near-duplicates it already had"""
+        if signature is None:
+            signature = self.signature(product)
+        if models is None:
+            models = model_numbers(product)
+        with self._lock:
+            if product.pid in self.signatures:
+                self._remove(product.pid)
+            matches = self._matches(signature, models, exclude=product.pid)
+            if matches:
+                self.flagged[product.pid] = matches
+            self.signatures[product.pid] = signature
+            self.models[product.pid] = models
+            self.texts[product.pid] = shingle_text(product)
+            for band, key in self._band_keys(signature):
+                self.buckets[band][key].add(product.pid)
+            return matches
+
+    def _remove(self, pid: int) -> bool:
+        signature = self.signatures.pop(pid, None)
+        if signature is None:
+            return False
+        del self.models[pid]
+        del self.texts[pid]
+        for band, key in self._band_keys(signature):
+            bucket = self.buckets[band].get(key)
+            if bucket is not None:
+                bucket.discard(pid)
+                if not bucket:
+                    del self.buckets[band][key]
+        self.flagged.pop(pid, None)
+        return True
+
+    def remove(self, pid: int) -> bool:
+        with self._lock:
+            return self._remove(pid)
+
+    def on_catalog_change(self, event: str, product: Product):
+        """product_data listener keeping the index in step with catalog mutations"""
+        if event == "update" and self.texts.get(product.pid) == shingle_text(product):
+            # Price, stock and rating changes leave the signature as it is
+            return
+        if event in ("add", "update"):
+            self.add(product)
+        elif event == "remove":
+            self.remove(product.pid)
+
+    def add_many(self, products: List[Product], workers: Optional[int] = None,
+                 chunk_size: int = 2000) -> List[List[Tuple[int, float]]]:
+        """Bulk load: signatures are computed in parallel, then banded in input order.
+
+        Returns each product's matches among the products before it (and the
+        existing index), so the first product of every duplicate group has none.
+        """
+        chunks = [products[i:i + chunk_size] for i in range(0, len(products), chunk_size)]
+        jobs = [(self.bands * self.rows, self.seed, chunk) for chunk in chunks]
+        if workers == 1 or len(chunks) <= 1:
+            results = list(map(_signatures, jobs))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(_signatures, jobs))
+        signatures = {pid: (sig, models) for chunk in results for pid, sig, models in chunk}
+        return [self.add(p, *signatures[p.pid]) for p in products]
+
+def dedupe(products: List[Product], threshold: float = 0.8, workers: Optional[int] = None
+           ) -> Tuple[List[Product], Dict[int, int]]:
+    """Drop near-duplicates from a bulk load.
+
+    Returns the products to keep (first of each group, input order) and a
+    map from each dropped pid to the kept pid it duplicates.
+    """
+    index = NearDuplicateIndex(threshold)
+    kept, dropped = [], {}
+    for product, matches in zip(products, index.add_many(products, workers)):
+        if matches:
+            # Point at the kept product even when the closest match was itself dropped
+            dropped[product.pid] = dropped.get(matches[0][0], matches[0][0])
+        else:
+            kept.append(product)
+    return kept, dropped
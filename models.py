@@ -1,3 +1,15 @@
+# Fields that can change after a product is created (pid is its identity)
+EDITABLE_FIELDS = ("name", "brand", "price", "availability", "description", "category", "rating")
+NUMERIC_FIELDS = ("price", "rating")
+
+def check_field(field, value):
+    """Reject a value that would not index or sort like the rest of the catalog"""
+    if field in NUMERIC_FIELDS:
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or value != value or value < 0:
+            raise ValueError(f"Product {field} must be a non-negative number, got {value!r}")
+    elif not isinstance(value, str):
+        raise ValueError(f"Product {field} must be a string, got {value!r}")
+
 class Product:
     def __init__(self, pid, name, brand, price, availability, description, category, rating=0):
         self.pid = pid
@@ -13,6 +25,39 @@ class Product:
         return (f"[{self.pid}] {self.name} ({self.brand}) - Rs. {self.price} | {self.availability} | Rating: {self.rating}\n"
                 f"{self.description} | Category: {self.category}\n")
     
+    def to_dict(self):
+        """Plain-dict form used when products cross a process or network boundary"""
+        return {
+            "pid": self.pid,
+            "name": self.name,
+            "brand": self.brand,
+            "price": self.price,
+            "availability": self.availability,
+            "description": self.description,
+            "category": self.category,
+            "rating": self.rating
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["pid"], data["name"], data["brand"], data["price"], data["availability"],
+                   data["description"], data["category"], data.get("rating", 0))
+    
+    def replace(self, **changes):
+        """Return a copy of this product with the given fields changed.
+
+        Raises ValueError before anything is copied if a field is unknown or
+        has the wrong type, so callers can replace first and mutate after.
+        """
+        unknown = set(changes) - set(EDITABLE_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown product fields: {', '.join(sorted(unknown))}")
+        for field, value in changes.items():
+            check_field(field, value)
+        data = self.to_dict()
+        data.update(changes)
+        return Product.from_dict(data)
+    
     def __hash__(self):
         return hash(self.pid)  # Use pid as the unique identifier for hashing
     
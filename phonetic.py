@@ -0,0 +1,115 @@
+"""Sound-alike keys for brand and product name lookups.
+
+A compact Metaphone-style encoder in the spirit of Double Metaphone: each
+word maps to a primary key and, where the spelling is ambiguous (a "g"
+before e/i, "ch"), an alternate key. Vowels after the first letter are
+dropped and consonants that sound alike share a code, so "Adiddas" and
+"Adidas", "Unicklo" and "Uniqlo", "Nesley" and "Nestle" or "Aashirwad" and
+"Aashirvaad" collide.
+"""
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Tuple
+
+VOWELS = set("aeiouy")
+# Shorter keys ("S" for "s8", "zzzz" or "x1") collide with far too many words
+MIN_KEY_LENGTH = 2
+
+# Multi-letter spellings rewritten before the letter pass, longest first
+_REWRITES = [
+    (re.compile(r"^(kn|gn|pn|wr|ps)"), lambda m: m.group()[1]),
+    (re.compile(r"^x"), lambda m: "s"),
+    (re.compile(r"^wh"), lambda m: "w"),
+    (re.compile(r"mb$"), lambda m: "m"),
+    (re.compile(r"sch"), lambda m: "sk"),
+    (re.compile(r"tch"), lambda m: "ch"),
+    (re.compile(r"(?<=s)t(?=l|en$)"), lambda m: ""),  # castle, nestle, listen
+    (re.compile(r"gh(?![aeiouy])"), lambda m: ""),
+    (re.compile(r"ph"), lambda m: "f"),
+    (re.compile(r"ck|q"), lambda m: "k"),
+    (re.compile(r"x"), lambda m: "ks"),
+    (re.compile(r"dg(?=[eiy])"), lambda m: "j"),
+]
+
+def _encode(word: str, alternate: bool) -> str:
+    for pattern, replace in _REWRITES:
+        word = pattern.sub(replace, word)
+    key = []
+    i = 0
+    while i < len(word):
+        c = word[i]
+        nxt = word[i + 1] if i + 1 < len(word) else ""
+        if c in VOWELS:
+            code = "A" if i == 0 else ""
+        elif c == "c":
+            if nxt == "c" and i + 2 < len(word) and word[i + 2] in ("e", "i", "y"):
+                # Italian "cci" (gucci) vs English "cc" (accent)
+                code, i = ("KS" if alternate else "X"), i + 1
+            elif nxt == "h":
+                code, i = ("K" if alternate else "X"), i + 1
+            elif nxt in ("e", "i", "y"):
+                code = "S"
+            else:
+                code = "K"
+        elif c == "g":
+            code = ("K" if alternate else "J") if nxt in ("e", "i", "y") else "K"
+        elif c in ("s", "z"):
+            if nxt == "h":
+                code, i = "X", i + 1
+            else:
+                code = "S"
+        elif c == "t":
+            if nxt == "h":
+                code, i = "0", i + 1
+            else:
+                code = "T"
+        elif c == "d":
+            code = "T"
+        elif c == "h":
+            # Only sounded at the start of a syllable
+            prev = word[i - 1] if i else ""
+            code = "H" if nxt in VOWELS and (not prev or prev in VOWELS) else ""
+        elif c == "w":
+            # A w before a vowel sounds like v mid-word, and may at the start too (alternate)
+            code = ("F" if i or alternate else "W") if nxt in VOWELS else ""
+        elif c == "v":
+            code = "F"
+        elif c == "j":
+            code = "J"
+        else:
+            code = c.upper()
+        for letter in code:
+            if not key or key[-1] != letter:
+                key.append(letter)
+        i += 1
+    return "".join(key)
+
+@lru_cache(maxsize=1 << 16)
+def phonetic_keys(word: str) -> Tuple[str, ...]:
+    """(primary,) or (primary, alternate) keys for one word.
+
+    Empty for words with digits (model numbers are not pronounced), words
+    without letters, and words whose keys are shorter than MIN_KEY_LENGTH.
+    """
+    word = unicodedata.normalize("NFKD", word.casefold())
+    if any(c.isdigit() for c in word):
+        return ()
+    word = "".join(c for c in word if "a" <= c <= "z")
+    if not word:
+        return ()
+    keys = {_encode(word, alternate=False): None, _encode(word, alternate=True): None}
+    return tuple(key for key in keys if len(key) >= MIN_KEY_LENGTH)
+
+@lru_cache(maxsize=1 << 16)
+def token_keys(token: str) -> Tuple[str, ...]:
+    """Keys for an analyzed token, used the same way for indexing and queries.
+
+    The analyzer drops a possessive "'s" ("levi's" -> "levi") but cannot
+    tell a bare "levis" from a plural, so a token ending in "s" also gets
+    the keys of the token without it, and all three spellings meet.
+    """
+    keys = phonetic_keys(token)
+    if len(token) > 3 and token.endswith("s"):
+        keys += tuple(key for key in phonetic_keys(token[:-1]) if key not in keys)
+    return keys
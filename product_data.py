@@ -1,17 +1,271 @@
-from collections import defaultdict
 import bisect
+import itertools
+import logging
+import threading
+from collections.abc import Mapping as MappingABC, Sequence as SequenceABC
+from dataclasses import dataclass
+from operator import attrgetter, itemgetter
+from types import MappingProxyType
+from typing import Mapping, Sequence, Tuple
 from models import Product
 
-# Initialize data structures
-products = []
-products_by_id = {}
-products_by_brand = defaultdict(list)
-products_by_category = defaultdict(list)
-products_by_price = []  # Sorted list of (price, pid, product)
-product_names = []  # For fuzzy name search
+# Largest chunk a write copies; bigger chunks are split in two
+CHUNK_SIZE = 256
+
+class SortedChunks(SequenceABC):
+    """Immutable sequence kept sorted by ``key(item)`` and stored in chunks.
+
+    Every write returns a new SortedChunks that copies the one chunk it
+    touches plus the per-chunk directory (about n / CHUNK_SIZE entries) and
+    shares all other chunks with the original, so a snapshot write costs
+    O(CHUNK_SIZE + n / CHUNK_SIZE) instead of O(n). Lookups by key bisect.
+    """
+    __slots__ = ("_chunks", "_maxes", "_key", "_len", "_offsets")
+
+    def __init__(self, key, chunks=(), maxes=None, length=None):
+        self._key = key
+        self._chunks = chunks
+        self._maxes = tuple(key(chunk[-1]) for chunk in chunks) if maxes is None else maxes
+        self._len = sum(map(len, chunks)) if length is None else length
+        self._offsets = None
+
+    @classmethod
+    def from_sorted(cls, key, items):
+        items = tuple(items)
+        return cls(key, tuple(items[i:i + CHUNK_SIZE] for i in range(0, len(items), CHUNK_SIZE)))
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        return itertools.chain.from_iterable(self._chunks)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._len)
+            return tuple(itertools.islice(self, start, stop, step)) if step > 0 else tuple(self)[index]
+        if index < 0:
+            index += self._len
+        if not 0 <= index < self._len:
+            raise IndexError("SortedChunks index out of range")
+        if self._offsets is None:
+            # Start position of each chunk, built on first positional access
+            self._offsets = (0,) + tuple(itertools.accumulate(map(len, self._chunks)))[:-1]
+        ci = bisect.bisect_right(self._offsets, index) - 1
+        return self._chunks[ci][index - self._offsets[ci]]
+
+    def _find(self, k):
+        """(chunk index, position in chunk) where key k is or would be inserted"""
+        ci = bisect.bisect_left(self._maxes, k)
+        if ci == len(self._chunks):
+            return ci, 0
+        return ci, bisect.bisect_left(self._chunks[ci], k, key=self._key)
+
+    def get(self, k, default=None):
+        ci, j = self._find(k)
+        if ci < len(self._chunks) and j < len(self._chunks[ci]) and self._key(self._chunks[ci][j]) == k:
+            return self._chunks[ci][j]
+        return default
+
+    def irange(self, lo, hi):
+        """Items whose key lies in [lo, hi], in order"""
+        ci, j = self._find(lo)
+        for chunk in self._chunks[ci:]:
+            for item in chunk[j:]:
+                if self._key(item) > hi:
+                    return
+                yield item
+            j = 0
+
+    def _with_chunk(self, ci, replaced, chunks, length):
+        """Copy with chunks[ci:ci + replaced] swapped for ``chunks`` (empty chunks are dropped)"""
+        chunks = tuple(chunk for chunk in chunks if chunk)
+        return SortedChunks(self._key, self._chunks[:ci] + chunks + self._chunks[ci + replaced:],
+                            self._maxes[:ci] + tuple(self._key(chunk[-1]) for chunk in chunks)
+                            + self._maxes[ci + replaced:], length)
+
+    def insert(self, item):
+        """Copy with item added (after any items with an equal key)"""
+        k = self._key(item)
+        ci = bisect.bisect_right(self._maxes, k)
+        if ci == len(self._chunks):
+            if not self._chunks:
+                return SortedChunks(self._key, ((item,),), (k,), 1)
+            ci -= 1
+        chunk = self._chunks[ci]
+        j = bisect.bisect_right(chunk, k, key=self._key)
+        chunk = chunk[:j] + (item,) + chunk[j:]
+        half = len(chunk) // 2
+        chunks = (chunk[:half], chunk[half:]) if len(chunk) > CHUNK_SIZE else (chunk,)
+        return self._with_chunk(ci, 1, chunks, self._len + 1)
+
+    def remove(self, k):
+        """Copy without the first item whose key is k; raises KeyError if there is none"""
+        ci, j = self._find(k)
+        if ci == len(self._chunks) or self._key(self._chunks[ci][j]) != k:
+            raise KeyError(k)
+        chunk = self._chunks[ci]
+        return self._with_chunk(ci, 1, (chunk[:j] + chunk[j + 1:],), self._len - 1)
+
+    def replace(self, item):
+        """Copy with the item that has item's key swapped for item"""
+        k = self._key(item)
+        ci, j = self._find(k)
+        if ci == len(self._chunks) or self._key(self._chunks[ci][j]) != k:
+            raise KeyError(k)
+        chunk = self._chunks[ci]
+        return self._with_chunk(ci, 1, (chunk[:j] + (item,) + chunk[j + 1:],), self._len)
+
+class ProductsById(MappingABC):
+    """Read-only pid -> Product mapping over a pid-sorted SortedChunks"""
+    __slots__ = ("_products",)
+
+    def __init__(self, products):
+        self._products = products
+
+    def __getitem__(self, pid):
+        product = self._products.get(pid)
+        if product is None:
+            raise KeyError(pid)
+        return product
+
+    def __contains__(self, pid):
+        return self._products.get(pid) is not None
+
+    def __iter__(self):
+        return (product.pid for product in self._products)
+
+    def __len__(self):
+        return len(self._products)
+
+class ProductNames(SequenceABC):
+    """Product names, in the same order as the products they come from"""
+    __slots__ = ("_products",)
+
+    def __init__(self, products):
+        self._products = products
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return tuple(p.name for p in self._products[index])
+        return self._products[index].name
+
+    def __iter__(self):
+        return (product.name for product in self._products)
+
+    def __len__(self):
+        return len(self._products)
+
+logger = logging.getLogger(__name__)
+
+_by_pid = attrgetter("pid")
+_by_price = itemgetter(0, 1)
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    """Immutable, versioned view of the whole catalog.
+
+    Readers grab the current snapshot once with get_catalog() and can iterate
+    it freely; writers never modify a published snapshot. Each write builds
+    the next version, sharing every brand/category bucket and every chunk of
+    the sorted sequences it did not touch, and publishes it with a single
+    reference swap. Products and buckets are ordered by pid.
+    """
+    version: int
+    products: Sequence[Product]  # SortedChunks by pid
+    products_by_id: Mapping[int, Product]
+    products_by_brand: Mapping[str, Sequence[Product]]
+    products_by_category: Mapping[str, Sequence[Product]]
+    products_by_price: Sequence[Tuple[float, int, Product]]  # SortedChunks by (price, pid)
+    product_names: Sequence[str]  # For fuzzy name search
+
+_EMPTY = MappingProxyType({})
+_NO_PRODUCTS = SortedChunks(_by_pid)
+_catalog = CatalogSnapshot(0, _NO_PRODUCTS, ProductsById(_NO_PRODUCTS), _EMPTY, _EMPTY,
+                           SortedChunks(_by_price), ProductNames(_NO_PRODUCTS))
+# Serializes writers only; readers never take it
+_write_lock = threading.Lock()
+# The initial products are generated on first use, not at import
+_load_lock = threading.Lock()
+catalog_ready = threading.Event()
 
 product_id_counter = 1
 
+# Callbacks notified with (event, product) after every mutation
+catalog_listeners = []
+
+# Optional near-duplicate check consulted by add_product_obj (see dedup.NearDuplicateIndex)
+duplicate_detector = None
+
+# Fields a merged duplicate refreshes on the product already in the catalog
+MERGE_FIELDS = ("price", "availability", "rating")
+# What add_product_obj can do with a near-duplicate
+DUPLICATE_ACTIONS = ("add", "skip", "merge")
+
+def load_catalog():
+    """Generate the initial products once per process; later calls return immediately."""
+    if not catalog_ready.is_set():
+        with _load_lock:
+            if not catalog_ready.is_set():
+                generate_products()
+                catalog_ready.set()
+
+def start_background_load():
+    """Load the catalog on a daemon thread; wait on the returned event for readiness."""
+    if not catalog_ready.is_set():
+        threading.Thread(target=load_catalog, name="catalog-load", daemon=True).start()
+    return catalog_ready
+
+def get_catalog():
+    """Return the current catalog snapshot (lock-free once loaded)."""
+    load_catalog()
+    return _catalog
+
+def get_catalog_and_listen(listener):
+    """Register a listener and return the snapshot it starts from, with no mutation in between."""
+    load_catalog()
+    with _write_lock:
+        add_catalog_listener(listener)
+        return _catalog
+
+def __getattr__(name):
+    # Module attributes kept for older callers; each read sees the latest snapshot
+    if name == "catalog_version":
+        return get_catalog().version
+    if name in ("products", "products_by_id", "products_by_brand", "products_by_category",
+                "products_by_price", "product_names"):
+        return getattr(get_catalog(), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def add_catalog_listener(listener):
+    """Register a callback invoked as listener(event, product) on "add", "remove" and "update"."""
+    catalog_listeners.append(listener)
+
+def set_duplicate_detector(detector):
+    """Install a near-duplicate detector and keep it in step with catalog mutations."""
+    global duplicate_detector
+    duplicate_detector = detector
+    add_catalog_listener(detector.on_catalog_change)
+
+def _publish(snapshot, event, product):
+    global _catalog
+    _catalog = snapshot
+    # The write is already published: one failing listener must not keep it from the others
+    for listener in catalog_listeners:
+        try:
+            listener(event, product)
+        except Exception:
+            logger.exception("Catalog listener %r failed on %s of product %s", listener, event, product.pid)
+
+def _with_bucket(index, key, bucket):
+    """Copy of a bucket mapping with one key replaced (or dropped when empty)."""
+    updated = dict(index)
+    if bucket:
+        updated[key] = bucket
+    else:
+        updated.pop(key, None)
+    return MappingProxyType(updated)
+
 def generate_products():
     global product_id_counter
 
@@ -78,83 +332,146 @@ def generate_products():
     ]
 
     for item in initial_products:
-        add_product_obj(Product(product_id_counter, *item))
+        _add_product(Product(product_id_counter, *item))
         product_id_counter += 1
 
-def add_product_obj(product):
-    # Add to master list
-    products.append(product)
-    # Index by ID
-    products_by_id[product.pid] = product
-    # Index by brand
-    products_by_brand[product.brand.lower()].append(product)
-    # Index by category
-    products_by_category[product.category.lower()].append(product)
-    # Index by price (maintain sorted order - add pid for unique key)
-    bisect.insort(products_by_price, (product.price, product.pid, product))
-    # Store names for fuzzy search
-    product_names.append(product.name)
+def add_product_obj(product, on_duplicate="add"):
+    """Add a product and return the pid it is stored under.
+
+    With a duplicate detector installed, ``on_duplicate`` decides what happens
+    to a near-duplicate of an existing product: "add" stores it anyway (the
+    detector flags it), "skip" drops it, and "merge" copies its MERGE_FIELDS
+    onto the existing product. Both "skip" and "merge" return the existing pid.
+    """
+    if on_duplicate not in DUPLICATE_ACTIONS:
+        raise ValueError(f"on_duplicate must be one of {', '.join(DUPLICATE_ACTIONS)}, got {on_duplicate!r}")
+    load_catalog()
+    if on_duplicate != "add" and duplicate_detector is not None:
+        matches = duplicate_detector.find_duplicates(product)
+        if matches:
+            existing = matches[0][0]
+            if on_duplicate == "merge":
+                update_product_obj(existing, **{f: getattr(product, f) for f in MERGE_FIELDS})
+            return existing
+    _add_product(product)
+    return product.pid
+
+def _add_product(product):
+    with _write_lock:
+        old = _catalog
+        if product.pid in old.products_by_id:
+            raise ValueError(f"Product id {product.pid} already exists")
+        products = old.products.insert(product)
+        # Index by brand and category (only the touched bucket is rebuilt)
+        brand = product.brand.lower()
+        by_brand = _with_bucket(old.products_by_brand, brand, _bucket(old.products_by_brand, brand).insert(product))
+        category = product.category.lower()
+        by_category = _with_bucket(old.products_by_category, category,
+                                   _bucket(old.products_by_category, category).insert(product))
+        _publish(CatalogSnapshot(
+            version=old.version + 1,
+            products=products,
+            products_by_id=ProductsById(products),
+            products_by_brand=by_brand,
+            products_by_category=by_category,
+            # Index by price (sorted by price, then pid for a unique key)
+            products_by_price=old.products_by_price.insert((product.price, product.pid, product)),
+            # Names for fuzzy search follow the products
+            product_names=ProductNames(products)
+        ), "add", product)
+
+def _bucket(index, key):
+    return index.get(key) or _NO_PRODUCTS
 
 def remove_product_obj(pid):
-    """Remove a product from all data structures."""
-    if pid not in products_by_id:
-        return False
-    
-    product = products_by_id[pid]
-    
-    # Remove from master list
-    products.remove(product)
-    
-    # Remove from ID index
-    del products_by_id[pid]
-    
-    # Remove from brand index
-    brand_products = products_by_brand[product.brand.lower()]
-    brand_products.remove(product)
-    if not brand_products:
-        del products_by_brand[product.brand.lower()]
-    
-    # Remove from category index
-    category_products = products_by_category[product.category.lower()]
-    category_products.remove(product)
-    if not category_products:
-        del products_by_category[product.category.lower()]
-    
-    # Remove from price index
-    for i, (price, prod_id, p) in enumerate(products_by_price):
-        if p.pid == pid:
-            del products_by_price[i]
-            break
-    
-    # Remove from names list
-    product_names.remove(product.name)
-    
-    return True
-
-# Generate initial products
-generate_products()
+    """Remove a product by publishing a snapshot without it."""
+    load_catalog()
+    with _write_lock:
+        old = _catalog
+        product = old.products.get(pid)
+        if product is None:
+            return False
+        products = old.products.remove(pid)
+        
+        # Remove from brand and category indexes
+        brand = product.brand.lower()
+        by_brand = _with_bucket(old.products_by_brand, brand, old.products_by_brand[brand].remove(pid))
+        category = product.category.lower()
+        by_category = _with_bucket(old.products_by_category, category, old.products_by_category[category].remove(pid))
+        
+        _publish(CatalogSnapshot(
+            version=old.version + 1,
+            products=products,
+            products_by_id=ProductsById(products),
+            products_by_brand=by_brand,
+            products_by_category=by_category,
+            products_by_price=old.products_by_price.remove((product.price, pid)),
+            product_names=ProductNames(products)
+        ), "remove", product)
+        return True
+
+def _moved(index, old_key, key, product):
+    """Bucket mapping with product swapped in place, or moved to another bucket when its key changed"""
+    if key == old_key:
+        return _with_bucket(index, key, index[key].replace(product))
+    index = _with_bucket(index, old_key, index[old_key].remove(product.pid))
+    return _with_bucket(index, key, _bucket(index, key).insert(product))
+
+def update_product_obj(pid, **changes):
+    """Publish a copy of a product with some fields changed, touching only the affected indexes."""
+    load_catalog()
+    with _write_lock:
+        old = _catalog
+        before = old.products.get(pid)
+        if before is None:
+            return False
+        product = before.replace(**changes)
+        # pid never changes, so the product keeps its place in pid-ordered sequences
+        products = old.products.replace(product)
+        
+        # Brand and category buckets: move on a key change, otherwise swap in place
+        by_brand = _moved(old.products_by_brand, before.brand.lower(), product.brand.lower(), product)
+        by_category = _moved(old.products_by_category, before.category.lower(), product.category.lower(), product)
+        
+        # Price index: reposition only when the price moved
+        by_price = old.products_by_price
+        if product.price == before.price:
+            by_price = by_price.replace((product.price, pid, product))
+        else:
+            by_price = by_price.remove((before.price, pid)).insert((product.price, pid, product))
+        
+        _publish(CatalogSnapshot(
+            version=old.version + 1,
+            products=products,
+            products_by_id=ProductsById(products),
+            products_by_brand=by_brand,
+            products_by_category=by_category,
+            products_by_price=by_price,
+            product_names=ProductNames(products)
+        ), "update", product)
+        return True
 
 # Search Functions
 def search_by_id(pid):
-    return [products_by_id[pid]] if pid in products_by_id else []
+    catalog = get_catalog()
+    return [catalog.products_by_id[pid]] if pid in catalog.products_by_id else []
 
 def search_by_name(keyword):
     keyword = keyword.lower()
-    return [p for p in products if keyword in p.name.lower()]
+    return [p for p in get_catalog().products if keyword in p.name.lower()]
 
 def search_by_brand(keyword):
     keyword = keyword.lower()
-    return products_by_brand.get(keyword, [])
+    return list(get_catalog().products_by_brand.get(keyword, ()))
 
 def search_by_category(keyword):
     keyword = keyword.lower()
-    return products_by_category.get(keyword, [])
+    return list(get_catalog().products_by_category.get(keyword, ()))
 
 def search_by_price_range(min_price, max_price):
     # products_by_price is sorted by price, pid
-    idx_start = bisect.bisect_left(products_by_price, (min_price, -float('inf')))
-    idx_end = bisect.bisect_right(products_by_price, (max_price, float('inf')))
-    return [p for _, _, p in products_by_price[idx_start:idx_end]]
+    products_by_price = get_catalog().products_by_price
+    return [p for _, _, p in products_by_price.irange((min_price, -float('inf')), (max_price, float('inf')))]
 
 def search_by_top_ratings(top_n=3):
-    return sorted(products, key=lambda x: x.rating, reverse=True)[:top_n] 
\ No newline at end of file
+    return sorted(get_catalog().products, key=lambda x: x.rating, reverse=True)[:top_n]
\ No newline at end of file
@@ -0,0 +1,70 @@
+import glob
+import logging
+import logging.handlers
+import re
+import time
+
+# Each line: timestamp \t engine \t latency_us \t hits \t normalized query
+FIELD_SEPARATOR = "\t"
+
+def normalize_query(query, lowercase=True):
+    """Trim, collapse whitespace and lowercase so equivalent queries log identically."""
+    query = re.sub(r'\s+', ' ', query.strip())
+    return query.lower() if lowercase else query
+
+class QueryLogger:
+    """Opt-in, buffered and size-rotated log of search traffic.
+
+    Lines are written through a MemoryHandler so the search path only pays
+    for a string format and a list append; the buffer is flushed to a
+    RotatingFileHandler every ``flush_every`` records.
+    """
+    def __init__(self, path, max_bytes=10 * 1024 * 1024, backup_count=5, flush_every=200):
+        self.path = path
+        self._file_handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+        self._file_handler.setFormatter(logging.Formatter("%(message)s"))
+        self._handler = logging.handlers.MemoryHandler(
+            flush_every, flushLevel=logging.CRITICAL, target=self._file_handler)
+        self._logger = logging.getLogger(f"query_log.{path}")
+        self._logger.setLevel(logging.INFO)
+        self._logger.propagate = False
+        self._logger.handlers = [self._handler]
+
+    def log(self, engine, query, latency_s, hits):
+        self._logger.info(FIELD_SEPARATOR.join((
+            f"{time.time():.6f}",
+            engine,
+            str(int(latency_s * 1e6)),
+            str(hits),
+            # Regex patterns keep their case since escapes like \D are case sensitive
+            normalize_query(query, lowercase=engine != "regex"),
+        )))
+
+    def flush(self):
+        self._handler.flush()
+
+    def close(self):
+        self._handler.close()
+        self._file_handler.close()
+
+def log_files(path):
+    """The live log plus its rotated backups, oldest first."""
+    backups = sorted(glob.glob(f"{glob.escape(path)}.*"),
+                     key=lambda p: int(p.rsplit(".", 1)[1]) if p.rsplit(".", 1)[1].isdigit() else 0,
+                     reverse=True)
+    return [p for p in backups if p.rsplit(".", 1)[1].isdigit()] + [path]
+
+def read_query_log(path):
+    """Yield (timestamp, engine, latency_s, hits, query) from a log and its backups."""
+    for file_path in log_files(path):
+        try:
+            with open(file_path, encoding="utf-8") as f:
+                for line in f:
+                    parts = line.rstrip("\n").split(FIELD_SEPARATOR, 4)
+                    if len(parts) != 5:
+                        continue
+                    ts, engine, latency_us, hits, query = parts
+                    yield float(ts), engine, int(latency_us) / 1e6, int(hits), query
+        except FileNotFoundError:
+            continue
\ No newline at end of file
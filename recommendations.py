@@ -0,0 +1,178 @@
+"""Item-item co-occurrence recommendations from carts and wishlists.
+
+Every basket (a user's cart or wishlist, or a past order) contributes one
+count to each pair of products it holds. Counts live in a sparse dict-of-Counters matrix that
+is patched on every basket event from user_management, so it never has to
+be rebuilt from users.json. Scores are cosine-normalized co-occurrence,
+count(a, b) / sqrt(baskets(a) * baskets(b)), so bestsellers do not drown
+out everything else.
+"""
+import threading
+from collections import Counter, OrderedDict, defaultdict
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+import numpy as np
+
+class CooccurrenceRecommender:
+    """"Frequently added together" top-k for a pid or a whole cart.
+
+    Each item's neighbour list is computed once per change to its row and
+    cached; ``warm`` precomputes the lists of the most basketed items. Cart
+    answers are cached per (catalog version, basket version, cart) so
+    re-rendering a cart costs one dict lookup.
+    """
+    def __init__(self, baskets: Optional[Dict[Hashable, Iterable[int]]] = None,
+                 neighbours: int = 50, cache_size: int = 1024):
+        self.neighbours = neighbours
+        self.cache_size = cache_size
+        self._lock = threading.RLock()
+        self.baskets: Dict[Hashable, set] = {}
+        self.counts: Dict[int, Counter] = defaultdict(Counter)
+        # Number of baskets holding each item
+        self.frequency: Counter = Counter()
+        # Bumped on every basket change so cached cart answers can be invalidated
+        self.version = 0
+        self._rows: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+        self._cart_cache: OrderedDict = OrderedDict()
+        for key, pids in (baskets or {}).items():
+            for pid in pids:
+                self.add_item(key, pid)
+
+    @classmethod
+    def from_users(cls, users: Dict[str, dict], **kwargs) -> "CooccurrenceRecommender":
+        """Seed from users.json data: one basket per user cart and wishlist"""
+        baskets = {}
+        for username, data in users.items():
+            for basket in ("cart", "wishlist"):
+                if data.get(basket):
+                    baskets[(username, basket)] = data[basket]
+        recommender = cls(baskets, **kwargs)
+        # Past orders count like any basket but can no longer change
+        for username, data in users.items():
+            for i, order in enumerate(data.get("orders", ())):
+                key = (username, "order", i)
+                for pid in order:
+                    recommender.add_item(key, pid)
+                recommender.commit(key)
+        return recommender
+
+    def _touch(self, pid, basket):
+        # The basket's rows changed, and pid's new frequency rescales every row it appears in
+        self.version += 1
+        for other in basket | self.counts.get(pid, {}).keys() | {pid}:
+            self._rows.pop(other, None)
+
+    def add_item(self, key: Hashable, pid: int) -> bool:
+        with self._lock:
+            basket = self.baskets.setdefault(key, set())
+            if pid in basket:
+                return False
+            for other in basket:
+                self.counts[pid][other] += 1
+                self.counts[other][pid] += 1
+            basket.add(pid)
+            self.frequency[pid] += 1
+            self._touch(pid, basket)
+            return True
+
+    def remove_item(self, key: Hashable, pid: int) -> bool:
+        with self._lock:
+            basket = self.baskets.get(key)
+            if not basket or pid not in basket:
+                return False
+            basket.discard(pid)
+            for other in basket:
+                self._decrement(pid, other)
+                self._decrement(other, pid)
+            self.frequency[pid] -= 1
+            if self.frequency[pid] <= 0:
+                del self.frequency[pid]
+            self._touch(pid, basket)
+            if not basket:
+                del self.baskets[key]
+            return True
+
+    def _decrement(self, a, b):
+        row = self.counts[a]
+        row[b] -= 1
+        if row[b] <= 0:
+            del row[b]
+            if not row:
+                del self.counts[a]
+
+    def clear(self, key: Hashable):
+        with self._lock:
+            for pid in list(self.baskets.get(key, ())):
+                self.remove_item(key, pid)
+
+    def commit(self, key: Hashable):
+        """Keep a basket's co-occurrence counts for good and start the key over with an empty basket"""
+        with self._lock:
+            self.baskets.pop(key, None)
+
+    def on_basket_change(self, event: str, key: Hashable, pid: Optional[int]):
+        """user_management listener: "add" and "remove" carry a pid, "clear" and "checkout" do not.
+
+        A checkout empties the cart like "clear" does, but what was bought
+        together stays counted.
+        """
+        if event == "add":
+            self.add_item(key, pid)
+        elif event == "remove":
+            self.remove_item(key, pid)
+        elif event == "clear":
+            self.clear(key)
+        elif event == "checkout":
+            self.commit(key)
+
+    def _row(self, pid: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(neighbour pids, cosine scores) best first, cut to ``neighbours``"""
+        row = self._rows.get(pid)
+        if row is None:
+            counts = self.counts.get(pid)
+            if counts:
+                others = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+                together = np.fromiter(counts.values(), dtype=np.float64, count=len(counts))
+                frequency = np.fromiter((self.frequency[o] for o in counts), dtype=np.float64, count=len(counts))
+                scores = together / np.sqrt(frequency * self.frequency[pid])
+                order = np.lexsort((others, -scores))[:self.neighbours]
+                row = (others[order], scores[order])
+            else:
+                row = (np.empty(0, np.int64), np.empty(0, np.float64))
+            self._rows[pid] = row
+        return row
+
+    def warm(self, top: int = 256):
+        """Precompute neighbour lists for the ``top`` most basketed items"""
+        with self._lock:
+            for pid, _ in self.frequency.most_common(top):
+                self._row(pid)
+
+    def similar(self, pid: int, k: int = 5) -> List[Tuple[int, float]]:
+        with self._lock:
+            others, scores = self._row(pid)
+            return [(int(o), float(s)) for o, s in zip(others[:k], scores[:k])]
+
+    def for_cart(self, pids: Iterable[int], k: int = 5, catalog_version: int = 0) -> List[Tuple[int, float]]:
+        """Top-k items not in the cart, summing the neighbour scores of every cart item"""
+        cart = frozenset(pids)
+        with self._lock:
+            key = (catalog_version, self.version, cart, k)
+            cached = self._cart_cache.get(key)
+            if cached is not None:
+                self._cart_cache.move_to_end(key)
+                return cached
+            rows = [self._row(pid) for pid in cart]
+            result = []
+            if rows:
+                others = np.concatenate([r[0] for r in rows])
+                scores = np.concatenate([r[1] for r in rows])
+                candidates, inverse = np.unique(others, return_inverse=True)
+                totals = np.bincount(inverse, weights=scores, minlength=len(candidates))
+                keep = ~np.isin(candidates, np.fromiter(cart, dtype=np.int64, count=len(cart)))
+                candidates, totals = candidates[keep], totals[keep]
+                order = np.lexsort((candidates, -totals))[:k]
+                result = [(int(candidates[i]), float(totals[i])) for i in order]
+            self._cart_cache[key] = result
+            if len(self._cart_cache) > self.cache_size:
+                self._cart_cache.popitem(last=False)
+            return result
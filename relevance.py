@@ -0,0 +1,105 @@
+"""Query-product relevance shared by every engine answering one request.
+
+A QueryScorer holds one normalized query. The first time a product is
+looked at, its relevance features are computed from the product's
+normalized name and name words, and then kept. The costly SequenceMatcher
+ratio is computed only when something reads it, and threshold checks skip
+it when its cheap upper bounds already fail. Fuzzy filtering, engine
+ranking and comparison-mode ranking can then ask about the same product as
+often as they like and pay for it once. Scores come from a pluggable
+``score(features) -> float`` function, higher is better.
+"""
+import difflib
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+class RelevanceFeatures:
+    """What one product's name has in common with the query"""
+    __slots__ = ("query", "name", "exact", "contained", "matched_words", "partial", "_ratio", "_scorer")
+
+    def __init__(self, scorer: "QueryScorer", name: str, name_words: Sequence[str]):
+        query, words = scorer.query, scorer.words
+        self._scorer = scorer
+        self.query = query
+        self.name = name
+        # Whole query inside the name, or the whole name inside the query
+        self.exact = query in name
+        self.contained = name in query
+        # Query words found anywhere in the name
+        self.matched_words = sum(1 for word in words if word in name)
+        # Share of query words that are part of some name word
+        self.partial = (sum(1 for word in words if any(word in name_word for name_word in name_words)) / len(words)
+                        if words else 0.0)
+        self._ratio = None
+
+    @property
+    def ratio(self) -> float:
+        """difflib similarity of query and name, computed on first use"""
+        if self._ratio is None:
+            self._scorer.similarity_calls += 1
+            self._ratio = difflib.SequenceMatcher(None, self.query, self.name).ratio()
+        return self._ratio
+
+    def ratio_exceeds(self, threshold: float) -> bool:
+        """ratio > threshold, skipping the full comparison when SequenceMatcher's cheap upper bounds rule it out"""
+        if self._ratio is None:
+            matcher = difflib.SequenceMatcher(None, self.query, self.name)
+            if matcher.real_quick_ratio() <= threshold or matcher.quick_ratio() <= threshold:
+                return False
+            self._scorer.similarity_calls += 1
+            self._ratio = matcher.ratio()
+        return self._ratio > threshold
+
+ScoreFunction = Callable[[RelevanceFeatures], float]
+
+def default_score(features: RelevanceFeatures) -> float:
+    """Exact matches first, then more matching words, then closer spelling (the ratio term is always < 1)"""
+    return (1000.0 if features.exact else 0.0) + features.matched_words + features.ratio / 2
+
+def word_overlap_score(features: RelevanceFeatures) -> float:
+    """Ranks on word overlap alone, never running SequenceMatcher"""
+    return (1000.0 if features.exact else 0.0) + features.matched_words + features.partial / 2
+
+class QueryScorer:
+    """Memoized relevance features and scores for one query.
+
+    ``name_of(pid)`` returns a product's normalized name and its name words.
+    """
+    def __init__(self, query: str, words: Sequence[str], name_of: Callable[[int], Tuple[str, Sequence[str]]],
+                 score: Optional[ScoreFunction] = None):
+        self.query = query
+        self.words = tuple(words)
+        self.name_of = name_of
+        self.score_function = score or default_score
+        self.features: Dict[int, RelevanceFeatures] = {}
+        self.scores: Dict[int, float] = {}
+        # SequenceMatcher runs so far, across every engine sharing this scorer
+        self.similarity_calls = 0
+
+    def evaluate(self, pid: int) -> RelevanceFeatures:
+        """Features for a pid, without keeping them unless already kept (for full scans)"""
+        features = self.features.get(pid)
+        if features is None:
+            features = RelevanceFeatures(self, *self.name_of(pid))
+        return features
+
+    def remember(self, pid: int, features: RelevanceFeatures):
+        self.features.setdefault(pid, features)
+
+    def features_for(self, pid: int) -> RelevanceFeatures:
+        features = self.features.get(pid)
+        if features is None:
+            features = self.features[pid] = RelevanceFeatures(self, *self.name_of(pid))
+        return features
+
+    def score(self, pid: int) -> float:
+        score = self.scores.get(pid)
+        if score is None:
+            score = self.scores[pid] = self.score_function(self.features_for(pid))
+        return score
+
+    def rank(self, products: Iterable) -> List:
+        """Products by descending score; ties keep their incoming order"""
+        return sorted(products, key=lambda product: -self.score(product.pid))
+
+    def scores_for(self, products: Iterable) -> Dict[int, float]:
+        return {product.pid: self.score(product.pid) for product in products}
@@ -0,0 +1,130 @@
+"""Replay a captured query log against a local SearchAlgorithms instance.
+
+Example:
+    python replay_queries.py queries.log --concurrency 8 --speedup 10 --catalog-size 100000
+    python replay_queries.py queries.log --concurrency 32 --speedup 0 --url http://127.0.0.1:8765
+"""
+import argparse
+import json
+import re
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from benchmark_search import summarize
+from query_log import read_query_log
+from search_algorithms import SearchAlgorithms
+
+def load_catalog(size, seed):
+    if size:
+        from synthetic_catalog import generate_catalog
+        return generate_catalog(size, seed=seed)
+    from product_data import get_catalog
+    return list(get_catalog().products)
+
+def make_call(search, engine, query):
+    """Map a logged (engine, query) pair back onto the engine that served it."""
+    if engine == "suggest":
+        return lambda: search.get_suggestions(query)
+    if engine == "price_range":
+        match = re.match(r'price:(\d+)-(\d+)', query)
+        if not match:
+            return None
+        min_price, max_price = map(float, match.groups())
+        return lambda: search.price_range_search(min_price, max_price)
+    method = getattr(search, f"{engine}_search", None)
+    return (lambda: method(query)) if method else None
+
+def replay(search, entries, concurrency=4, speedup=1.0):
+    """Drive entries through a thread pool, preserving inter-arrival gaps divided by speedup.
+
+    A speedup of 0 replays as fast as the pool allows. Returns per-engine
+    latencies of the successful queries, per-engine error counts, the
+    wall-clock duration and how far dispatch fell behind schedule.
+    """
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    futures = []
+    lock = threading.Lock()
+    max_lag = 0.0
+
+    def run(engine, call):
+        start = time.perf_counter()
+        call()
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies[engine].append(elapsed)
+
+    first_ts = entries[0][0] if entries else 0.0
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for ts, engine, call in entries:
+            if speedup > 0:
+                due = wall_start + (ts - first_ts) / speedup
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    max_lag = max(max_lag, -delay)
+            futures.append((engine, pool.submit(run, engine, call)))
+    duration = time.perf_counter() - wall_start
+    for engine, future in futures:
+        if future.exception() is not None:
+            errors[engine] += 1
+    return latencies, errors, duration, max_lag
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay captured search traffic")
+    parser.add_argument("log", help="query log written by query_log.QueryLogger")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--speedup", type=float, default=1.0, help="time compression factor, 0 for flat out")
+    parser.add_argument("--catalog-size", type=int, default=0,
+                        help="replay against a synthetic catalog of this size instead of product_data")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--limit", type=int, default=0, help="replay at most this many entries")
+    parser.add_argument("--url", help="replay against a running search_server instead of in-process")
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    if args.url:
+        from search_server import SearchClient
+        search = SearchClient(args.url)
+    else:
+        search = SearchAlgorithms(load_catalog(args.catalog_size, args.seed))
+    entries = []
+    skipped = 0
+    for ts, engine, _, _, query in sorted(read_query_log(args.log)):
+        call = make_call(search, engine, query)
+        if call is None:
+            skipped += 1
+            continue
+        entries.append((ts, engine, call))
+        if args.limit and len(entries) >= args.limit:
+            break
+    print(f"Replaying {len(entries):,} queries ({skipped} skipped)", file=sys.stderr)
+
+    latencies, errors, duration, max_lag = replay(search, entries, args.concurrency, args.speedup)
+    all_latencies = [l for engine_latencies in latencies.values() for l in engine_latencies]
+    report = {
+        "queries": len(all_latencies),
+        "skipped": skipped,
+        "errors": sum(errors.values()),
+        "concurrency": args.concurrency,
+        "speedup": args.speedup,
+        "duration_s": duration,
+        "throughput_qps": len(all_latencies) / duration if duration else 0.0,
+        "max_dispatch_lag_s": max_lag,
+        "overall": summarize(all_latencies),
+        "engines": {engine: {**summarize(latencies[engine]), "errors": errors[engine]}
+                    for engine in sorted(latencies.keys() | errors.keys())},
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+    return report
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -1,13 +1,27 @@
 import time
-from typing import List, Tuple, Dict, Set
+from array import array
+from typing import List, Tuple, Dict, Set, Optional
 import difflib
+import gc
 from models import Product
-from collections import defaultdict
+from collections import Counter, OrderedDict, defaultdict
+from operator import attrgetter, itemgetter
 import bisect
+import heapq
+import math
 import re
-from dataclasses import dataclass
+import threading
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
 from datetime import datetime
-from functools import lru_cache
+from functools import lru_cache, partial
+from itertools import accumulate
+from search_metrics import SearchTrace, MetricsRegistry
+from query_log import QueryLogger
+from spelling import SymSpell
+from phonetic import token_keys
+from relevance import QueryScorer, ScoreFunction
 
 @dataclass
 class SearchResult:
@@ -15,56 +29,765 @@ class SearchResult:
     time_taken: float
     algorithm_name: str
     matches_found: int
+    # Nanoseconds spent in each engine stage
+    stages: Dict[str, int] = field(default_factory=dict)
+    # Work counters such as candidates examined or similarity calls
+    counters: Dict[str, int] = field(default_factory=dict)
+    # Matched (field, start, end) character offsets per pid, in the analyzed text
+    highlights: Dict[int, List[Tuple[str, int, int]]] = field(default_factory=dict)
+    # Set when the query was spelling-corrected before running
+    corrected_query: Optional[str] = None
+    # Facet -> value -> matching products, most common value first (when requested)
+    facets: Dict[str, Dict[str, int]] = field(default_factory=dict)
+    # Relevance score per pid (higher is better) for results ranked by relevance
+    scores: Dict[int, float] = field(default_factory=dict)
+
+def suggestion_key(query: str, suggestion: str) -> Tuple[int, int]:
+    """Sort key ranking a suggestion for a normalized query"""
+    # Exact match at start gets highest priority
+    if suggestion.startswith(query):
+        return (0, len(suggestion))
+    # Contains query gets second priority
+    if query in suggestion:
+        return (1, len(suggestion))
+    # Fuzzy match gets lowest priority
+    return (2, len(suggestion))
+
+# Opt-in stopword list for Analyzer(stopwords=DEFAULT_STOPWORDS)
+DEFAULT_STOPWORDS = frozenset({"a", "an", "and", "by", "for", "in", "of", "on", "or", "the", "to", "with"})
+
+def light_stem(token: str) -> str:
+    """Strip common English plural endings (headphones -> headphone, batteries -> battery)"""
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 4 and token.endswith(("ches", "shes", "sses", "xes")):
+        return token[:-2]
+    if len(token) > 3 and token.endswith("s") and not token.endswith(("ss", "us", "is")):
+        return token[:-1]
+    return token
+
+@dataclass(frozen=True)
+class AnalyzedField:
+    text: str  # NFKC-normalized, casefolded text used for substring checks
+    tokens: Tuple[int, ...]  # Token ids in field order
+    spans: array = field(default_factory=lambda: array("I"))  # Flat (start, end) offsets per token in text
+
+@dataclass(frozen=True)
+class AnalyzedProduct:
+    name: AnalyzedField
+    brand: AnalyzedField
+    category: AnalyzedField
+    description: AnalyzedField
+
+    @property
+    def full_text_tokens(self) -> Set[int]:
+        return set(self.name.tokens + self.brand.tokens + self.category.tokens + self.description.tokens)
+
+# Product fields run through the analyzer
+ANALYZED_FIELDS = ("name", "brand", "category", "description")
+
+# Positional postings pack (field number << FIELD_SHIFT) | token position into one int
+FIELD_SHIFT = 20
+POSITION_MASK = (1 << FIELD_SHIFT) - 1
+
+# Proximity operator between phrase clauses, e.g. '"noise cancelling" NEAR/5 battery'
+# (any case, so lowercased logged queries replay the same)
+NEAR_PATTERN = re.compile(r'\s+NEAR/(\d+)\s+', re.IGNORECASE)
+
+def is_phrase_query(query: str) -> bool:
+    """True for quoted phrases and NEAR/k proximity queries"""
+    return '"' in query or NEAR_PATTERN.search(query) is not None
+
+# Drill-down facets, in the order SearchResult.facets lists them
+FACETS = ("brand", "category", "availability", "price")
+
+# Facet counts kept per (query, catalog version)
+FACET_CACHE_SIZE = 1024
+
+# One pass over the match set costs about this many set-membership probes per match
+FACET_SCAN_COST = 6
+
+# Upper bounds of the price facet's buckets; the last bucket is open-ended
+PRICE_BUCKETS = (5000, 25000, 100000, 250000)
+
+def price_bucket(price: float) -> str:
+    """Price facet value, e.g. "5,000-25,000" """
+    i = bisect.bisect_right(PRICE_BUCKETS, price)
+    if i == 0:
+        return f"under {PRICE_BUCKETS[0]:,}"
+    if i == len(PRICE_BUCKETS):
+        return f"{PRICE_BUCKETS[-1]:,}+"
+    return f"{PRICE_BUCKETS[i - 1]:,}-{PRICE_BUCKETS[i]:,}"
+
+class Analyzer:
+    """Single text pipeline shared by indexing and query normalization.
+
+    Text is NFKC-normalized and casefolded, possessives and apostrophes are
+    dropped ("Levi's" -> "levi"), and the rest is split on punctuation
+    ("27-inch" -> "27", "inch"). Stopword removal and light stemming are
+    optional. Tokens are interned to integer ids in ``vocabulary``.
+    """
+    def __init__(self, stopwords: Optional[Set[str]] = None, stem: bool = False):
+        self.stopwords = frozenset(stopwords or ())
+        self.stem = stem
+        self.vocabulary: Dict[str, int] = {}
+        self.terms: List[str] = []
+        # Queries repeat a lot, so their normalization and tokenization are
+        # memoized per analyzer. Token ids are not: a term interned later
+        # (a product added after the query was first seen) must resolve.
+        self._query_text = lru_cache(maxsize=4096)(self._analyze_query_text)
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return unicodedata.normalize("NFKC", text).casefold().strip()
+
+    def spans(self, normalized: str) -> List[Tuple[str, int, int]]:
+        """(token, start, end) for already normalized text, offsets into that text"""
+        spans = []
+        for match in re.finditer(r"\w+(?:['\u2019]\w+)*", normalized):
+            token = re.sub(r"['\u2019]s$", "", match.group()).replace("'", "").replace("\u2019", "")
+            if self.stopwords and token in self.stopwords:
+                continue
+            if self.stem:
+                token = light_stem(token)
+            spans.append((token, match.start(), match.end()))
+        return spans
+
+    def tokenize(self, normalized: str) -> List[str]:
+        """Split already normalized text into tokens"""
+        return [token for token, _, _ in self.spans(normalized)]
+
+    def token_id(self, token: str) -> int:
+        token_id = self.vocabulary.get(token)
+        if token_id is None:
+            token_id = self.vocabulary[token] = len(self.terms)
+            self.terms.append(token)
+        return token_id
+
+    def analyze_field(self, text: str) -> AnalyzedField:
+        normalized = self.normalize(text)
+        spans = self.spans(normalized)
+        offsets = array("I")
+        for _, start, end in spans:
+            offsets.append(start)
+            offsets.append(end)
+        return AnalyzedField(normalized, tuple(self.token_id(t) for t, _, _ in spans), offsets)
+
+    def analyze_product(self, product: Product, previous: Optional[AnalyzedProduct] = None,
+                        changed: Optional[Set[str]] = None) -> AnalyzedProduct:
+        """Analyze every text field, or only ``changed`` ones when ``previous`` is given"""
+        fields = {}
+        for name in ANALYZED_FIELDS:
+            if previous is not None and name not in changed:
+                fields[name] = getattr(previous, name)
+            else:
+                fields[name] = self.analyze_field(getattr(product, name))
+        return AnalyzedProduct(**fields)
+
+    def _analyze_query_text(self, query: str) -> Tuple[str, Tuple[str, ...]]:
+        normalized = self.normalize(query)
+        return normalized, tuple(self.tokenize(normalized))
+
+    def query_tokens(self, query: str) -> Tuple[str, Tuple[str, ...], Tuple[Optional[int], ...]]:
+        """(normalized text, tokens, token ids) for a query; unseen tokens map to None"""
+        normalized, tokens = self._query_text(query)
+        vocabulary = self.vocabulary
+        return normalized, tokens, tuple(vocabulary.get(t) for t in tokens)
+
+# Availability has a handful of distinct spellings, so its normalization is memoized
+_availability_value = lru_cache(maxsize=256)(Analyzer.normalize)
+
+def product_facets(product: Product) -> Dict[str, str]:
+    """Facet values of a product, normalized the same way the facet indexes key them"""
+    return {
+        "brand": Analyzer.normalize(product.brand),
+        "category": Analyzer.normalize(product.category),
+        "availability": _availability_value(product.availability),
+        "price": price_bucket(product.price),
+    }
+
+def _facet_tuple(product: Product, analyzed: AnalyzedProduct) -> Tuple[str, str, str, str]:
+    # product_facets in FACETS order, reusing the analyzed brand and category text
+    return (analyzed.brand.text, analyzed.category.text,
+            _availability_value(product.availability), price_bucket(product.price))
+
+def _field_positions(analyzed: AnalyzedProduct, fields) -> Dict[int, List[int]]:
+    """Packed field/position postings of a product's tokens, limited to ``fields``"""
+    postings = defaultdict(list)
+    for name in fields:
+        base = ANALYZED_FIELDS.index(name) << FIELD_SHIFT
+        for i, token in enumerate(getattr(analyzed, name).tokens):
+            postings[token].append(base | i)
+    return postings
+
+def _phonetic_keys(terms: List[str], analyzed: AnalyzedProduct) -> Set[str]:
+    return {key for token in analyzed.name.tokens + analyzed.brand.tokens for key in token_keys(terms[token])}
+
+@dataclass
+class IndexPartition:
+    """Indexes for one slice of the catalog, keyed by ``terms`` (the building analyzer's vocabulary)"""
+    terms: List[str]
+    analyzed: List[AnalyzedProduct] = field(default_factory=list)
+    name_index: Dict[int, Set[int]] = field(default_factory=lambda: defaultdict(set))
+    brand_index: Dict[str, Set[int]] = field(default_factory=lambda: defaultdict(set))
+    category_index: Dict[str, Set[int]] = field(default_factory=lambda: defaultdict(set))
+    full_text_index: Dict[int, Set[int]] = field(default_factory=lambda: defaultdict(set))
+    phonetic_index: Dict[str, Set[int]] = field(default_factory=lambda: defaultdict(set))
+    availability_index: Dict[str, Set[int]] = field(default_factory=lambda: defaultdict(set))
+    price_bucket_index: Dict[str, Set[int]] = field(default_factory=lambda: defaultdict(set))
+    position_index: Dict[int, Dict[int, array]] = field(default_factory=lambda: defaultdict(dict))
+    # Sorted (price, pid) run, k-way merged with the other partitions' runs
+    prices: List[Tuple[float, int]] = field(default_factory=list)
+    # Per field (texts, token counts, flat token ids, flat spans) once unpickled
+    packed: Optional[list] = field(default=None, repr=False)
+
+    def _pack_analyzed(self) -> list:
+        packed = []
+        for name in ANALYZED_FIELDS:
+            values = [getattr(analyzed, name) for analyzed in self.analyzed]
+            packed.append((
+                [f.text for f in values],
+                array("I", [len(f.tokens) for f in values]),
+                array("I", [token for f in values for token in f.tokens]),
+                array("I", [offset for f in values for offset in f.spans]),
+            ))
+        return packed
+
+    def analyzed_products(self, remap: Optional[List[int]] = None) -> List[AnalyzedProduct]:
+        """Analyzed products in slice order, token ids translated through ``remap`` if given"""
+        if self.packed is None:
+            if remap is None:
+                return self.analyzed
+            self.packed = self._pack_analyzed()
+        columns = []
+        for texts, counts, tokens, spans in self.packed:
+            if remap is not None:
+                tokens = array("I", map(remap.__getitem__, tokens))
+            ends = list(accumulate(counts))
+            starts = [0] + ends[:-1]
+            field_tokens = map(tuple, map(tokens.__getitem__, map(slice, starts, ends)))
+            field_spans = map(spans.__getitem__, map(slice, [2 * i for i in starts], [2 * i for i in ends]))
+            columns.append(list(map(AnalyzedField, texts, field_tokens, field_spans)))
+        return list(map(AnalyzedProduct, *columns))
+
+    # Pickled as flat arrays: millions of small objects are slower to ship
+    # between processes than to rebuild from a few large buffers
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        if state["packed"] is None:
+            state["packed"] = self._pack_analyzed()
+        state["analyzed"] = None
+        tokens, counts, pids, lengths, flat = array("I"), array("I"), array("q"), array("I"), array("I")
+        for token, postings in self.position_index.items():
+            tokens.append(token)
+            counts.append(len(postings))
+            for pid, positions in postings.items():
+                pids.append(pid)
+                lengths.append(len(positions))
+                flat.extend(positions)
+        state["position_index"] = (tokens, counts, pids, lengths, flat)
+        return state
+
+    def __setstate__(self, state):
+        tokens, counts, pids, lengths, flat = state["position_index"]
+        ends = list(accumulate(lengths))
+        arrays = list(map(flat.__getitem__, map(slice, [0] + ends[:-1], ends)))
+        position_index = defaultdict(dict)
+        i = 0
+        for token, count in zip(tokens, counts):
+            position_index[token] = dict(zip(pids[i:i + count], arrays[i:i + count]))
+            i += count
+        state["position_index"] = position_index
+        self.__dict__.update(state)
+
+def build_partition(analyzer: Analyzer, products: List[Product]) -> IndexPartition:
+    """Analyze a slice of the catalog and build its partial indexes"""
+    part = IndexPartition(analyzer.terms)
+    for product in products:
+        pid = product.pid
+        analyzed = analyzer.analyze_product(product)
+        part.analyzed.append(analyzed)
+        for token in analyzed.name.tokens:
+            part.name_index[token].add(pid)
+        part.brand_index[analyzed.brand.text].add(pid)
+        part.category_index[analyzed.category.text].add(pid)
+        part.availability_index[_availability_value(product.availability)].add(pid)
+        part.price_bucket_index[price_bucket(product.price)].add(pid)
+        for token in analyzed.full_text_tokens:
+            part.full_text_index[token].add(pid)
+        for key in _phonetic_keys(analyzer.terms, analyzed):
+            part.phonetic_index[key].add(pid)
+        for token, positions in _field_positions(analyzed, ANALYZED_FIELDS).items():
+            part.position_index[token][pid] = array("I", positions)
+        part.prices.append((product.price, pid))
+    part.prices.sort()
+    return part
+
+def _build_partition_worker(args):
+    # Each worker interns tokens into its own vocabulary; the parent remaps them
+    stopwords, stem, products = args
+    gc.disable()
+    try:
+        return build_partition(Analyzer(stopwords, stem), products)
+    finally:
+        gc.enable()
+
+# Engines accepted by SearchAlgorithms.search_many
+BATCH_ENGINES = ("linear", "indexed", "fuzzy", "regex", "price_range")
+
+# Per-process engine used by search_many worker pools
+_worker_search = None
+
+_name = attrgetter("name")
+_pid = attrgetter("pid")
+
+def _init_batch_worker(products):
+    global _worker_search
+    _worker_search = SearchAlgorithms(products)
+
+def _batch_worker_search(engine, query):
+    """Run one query in a pool worker and return only the matching pids."""
+    result = getattr(_worker_search, f"{engine}_search")(query)
+    return [p.pid for p in result.products], result.time_taken, result.algorithm_name, result.stages, result.counters
 
 class SearchAlgorithms:
-    def __init__(self, products: List[Product]):
+    def __init__(self, products: List[Product], metrics: Optional[MetricsRegistry] = None,
+                 query_logger: Optional[QueryLogger] = None, analyzer: Optional[Analyzer] = None,
+                 build_workers: Optional[int] = None, build_chunk_size: int = 50000,
+                 score_function: Optional[ScoreFunction] = None):
+        """``build_workers`` > 1 builds the initial indexes in a process pool, in chunks
+        of at most ``build_chunk_size`` products; ``build_stages`` holds per-phase timings.
+        ``score_function`` replaces relevance.default_score for ranking."""
         self.products = products
-        self._build_indices()
+        self.analyzer = analyzer or Analyzer()
+        self.score_function = score_function
+        self.metrics = metrics
+        # Opt-in traffic capture for later replay
+        self.query_logger = query_logger
+        # search_many's process pool and the catalog version its workers indexed
+        self._batch_pool = None
+        self._batch_pool_key = None
+        self._build_indices(build_workers, build_chunk_size)
+
+    def _finish(self, trace: SearchTrace, products: List[Product], algorithm_name: str,
+                highlights: Optional[Dict[int, List[Tuple[str, int, int]]]] = None,
+                scores: Optional[Dict[int, float]] = None) -> SearchResult:
+        """Build the SearchResult for a trace and record it unless the caller defers."""
+        result = SearchResult(
+            products=products,
+            time_taken=trace.elapsed_ns / 1e9,
+            algorithm_name=algorithm_name,
+            matches_found=len(products),
+            stages=trace.stages,
+            counters=dict(trace.counters),
+            highlights=highlights or {},
+            scores=scores or {}
+        )
+        if self.metrics and not trace.deferred:
+            self.metrics.record(result)
+        return result
+
+    def scorer(self, query: str) -> QueryScorer:
+        """Relevance scorer for one request; pass it to several engines to score each product once"""
+        # Phrase quotes are syntax, not part of the text to match names against
+        normalized = self.analyzer.normalize(query.replace('"', ''))
+        words = self.analyzer.tokenize(normalized)
+        analyzed, terms = self.analyzed, self.analyzer.terms
+        
+        def name_of(pid):
+            name = analyzed[pid].name
+            return name.text, [terms[token] for token in name.tokens]
+        return QueryScorer(normalized, words, name_of, self.score_function)
     
-    def _build_indices(self):
+    def _build_indices(self, workers: Optional[int] = None, chunk_size: int = 50000):
+        # Postings below hold pids, resolved through products_by_id, so an
+        # updated product only has to be re-posted under the fields that changed.
+        # Name and full text postings are keyed by analyzer token id.
         # Name index for exact matches
         self.name_index = defaultdict(set)
         # Brand index
         self.brand_index = defaultdict(set)
         # Category index
         self.category_index = defaultdict(set)
+        # Facet-only indexes: normalized availability and price bucket -> pids
+        self.availability_index = defaultdict(set)
+        self.price_bucket_index = defaultdict(set)
+        # Precomputed value -> pids postings per facet, intersected with a match set to count it
+        self.facet_index = {"brand": self.brand_index, "category": self.category_index,
+                            "availability": self.availability_index, "price": self.price_bucket_index}
+        # pid -> facet values in FACETS order, for counting small match sets in one pass
+        self.facet_values: Dict[int, Tuple[str, str, str, str]] = {}
+        # (cache key, version) -> facet counts, least recently used first
+        self._facet_cache = OrderedDict()
+        # Searches may run on several reader threads at once (see search_server)
+        self._facet_lock = threading.Lock()
+        # (version, products in (name, pid) order, pid -> position), shared by search_many batches
+        self._name_order = None
         # Price index (sorted list of (price, pid))
         self.price_index = []
-        # Fuzzy search index
+        # Fuzzy search index (same order as self.products)
         self.fuzzy_index = []
         # Full text index for better matching
         self.full_text_index = defaultdict(set)
+        # Positional index: token id -> pid -> sorted packed field/position array
+        self.position_index = defaultdict(dict)
+        # Sound-alike keys of name and brand words -> pids
+        self.phonetic_index = defaultdict(set)
+        # "Did you mean" corrector over every indexed term, weighted by document frequency
+        self.speller = SymSpell(self._term_frequency)
+        # Product lookup by ID for resolving postings
+        self.products_by_id = {}
+        # Cached normalized text and token ids per pid, shared by every engine
+        self.analyzed: Dict[int, AnalyzedProduct] = {}
+        # Position of each pid in self.products and self.fuzzy_index
+        self._positions = {}
+        # Bumped on every incremental update so cached answers can be invalidated
+        self.version = 0
+        # Nanoseconds spent in each phase of the initial build
+        self.build_stages: Dict[str, int] = {}
         
-        for product in self.products:
-            # Add to name index (split by words)
-            words = product.name.lower().split()
-            for word in words:
-                self.name_index[word].add(product)
-            
-            # Add to brand index
-            self.brand_index[product.brand.lower()].add(product)
-            
-            # Add to category index
-            self.category_index[product.category.lower()].add(product)
-            
-            # Add to price index
-            bisect.insort(self.price_index, (product.price, product.pid))
-            
-            # Add to fuzzy index
-            self.fuzzy_index.append((product.name.lower(), product))
-            
-            # Add to full text index
-            full_text = f"{product.name} {product.brand} {product.category} {product.description}".lower()
-            for word in full_text.split():
-                self.full_text_index[word].add(product)
+        # A bulk load allocates millions of long-lived objects; generational
+        # collections would keep rescanning them for no garbage
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            self._build_all(workers, chunk_size)
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+    
+    def _build_all(self, workers: Optional[int], chunk_size: int):
+        trace = SearchTrace()
+        if workers and workers > 1 and len(self.products) > 1:
+            # Partition, analyze and index the chunks in parallel, then merge
+            size = max(1, min(chunk_size, math.ceil(len(self.products) / workers)))
+            jobs = [(self.analyzer.stopwords, self.analyzer.stem, self.products[i:i + size])
+                    for i in range(0, len(self.products), size)]
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                partitions = list(pool.map(_build_partition_worker, jobs))
+        else:
+            # One in-process partition interns straight into our analyzer, so nothing needs remapping
+            partitions = [build_partition(self.analyzer, self.products)]
+        trace.lap("partition")
+        self._merge_partitions(partitions, trace)
+        self.build_stages = trace.stages
+    
+    def _merge_partitions(self, partitions: List[IndexPartition], trace: SearchTrace):
+        """Fold partial indexes (built over consecutive slices of self.products) into ours."""
+        # Remap each partition's token ids into the shared vocabulary, in catalog
+        # order, so ids come out exactly as a sequential build would assign them
+        remaps = []
+        for part in partitions:
+            if part.terms is self.analyzer.terms:
+                remaps.append(None)
+                continue
+            remap = [self.analyzer.token_id(term) for term in part.terms]
+            remaps.append(None if remap == list(range(len(remap))) else remap)
+        trace.lap("vocabulary")
+        
+        products = iter(self.products)
+        for part, remap in zip(partitions, remaps):
+            for analyzed in part.analyzed_products(remap):
+                product = next(products)
+                self._positions[product.pid] = len(self.fuzzy_index)
+                self.products_by_id[product.pid] = product
+                self.analyzed[product.pid] = analyzed
+                self.facet_values[product.pid] = _facet_tuple(product, analyzed)
+                self.fuzzy_index.append((analyzed.name.text, product))
+        trace.lap("analyzed")
+        
+        # Pids are disjoint across partitions, so merging postings is a plain union
+        for attribute in ("name_index", "full_text_index", "brand_index", "category_index", "phonetic_index",
+                          "availability_index", "price_bucket_index"):
+            index = getattr(self, attribute)
+            by_token = attribute in ("name_index", "full_text_index")
+            for part, remap in zip(partitions, remaps):
+                for key, pids in getattr(part, attribute).items():
+                    if by_token and remap is not None:
+                        key = remap[key]
+                    existing = index.get(key)
+                    if existing is None:
+                        index[key] = pids
+                    else:
+                        existing |= pids
+        trace.lap("postings")
+        
+        for part, remap in zip(partitions, remaps):
+            for token, postings in part.position_index.items():
+                key = remap[token] if remap is not None else token
+                existing = self.position_index.get(key)
+                if existing is None:
+                    self.position_index[key] = postings
+                else:
+                    existing.update(postings)
+        trace.lap("positions")
+        
+        # k-way merge of the sorted price runs
+        if len(partitions) == 1:
+            self.price_index = partitions[0].prices
+        else:
+            self.price_index = list(heapq.merge(*(part.prices for part in partitions)))
+        trace.lap("prices")
+        
+        terms = self.analyzer.terms
+        self.speller.update(terms[token] for token in self.full_text_index)
+        trace.lap("speller")
+
+    def _index_product(self, product: Product, analyzed: Optional[AnalyzedProduct] = None):
+        pid = product.pid
+        self.products_by_id[pid] = product
+        analyzed = analyzed or self.analyzer.analyze_product(product)
+        self.analyzed[pid] = analyzed
+        
+        # Add to name index (one posting per token)
+        for token in analyzed.name.tokens:
+            self.name_index[token].add(pid)
+        
+        # Add to brand index
+        self.brand_index[analyzed.brand.text].add(pid)
+        
+        # Add to category index
+        self.category_index[analyzed.category.text].add(pid)
+        
+        # Add to facet indexes
+        values = self.facet_values[pid] = _facet_tuple(product, analyzed)
+        self.availability_index[values[2]].add(pid)
+        self.price_bucket_index[values[3]].add(pid)
+        
+        # Add to price index
+        bisect.insort(self.price_index, (product.price, pid))
+        
+        # Add to fuzzy index
+        self.fuzzy_index.append((analyzed.name.text, product))
+        
+        # Add to phonetic index
+        for key in self._phonetic_keys(analyzed):
+            self.phonetic_index[key].add(pid)
+        
+        # Add to full text index
+        for token in analyzed.full_text_tokens:
+            self.full_text_index[token].add(pid)
+        self.speller.update(self.analyzer.terms[token] for token in analyzed.full_text_tokens)
+        
+        # Add token positions for phrase and proximity queries
+        self._post_positions(pid, analyzed, ANALYZED_FIELDS)
+
+    def _post_positions(self, pid: int, analyzed: AnalyzedProduct, fields):
+        for token, positions in _field_positions(analyzed, fields).items():
+            existing = self.position_index[token].get(pid)
+            if existing is not None:
+                positions = sorted(existing.tolist() + positions)
+            self.position_index[token][pid] = array("I", positions)
+
+    def _unpost_positions(self, pid: int, analyzed: AnalyzedProduct, fields):
+        numbers = {ANALYZED_FIELDS.index(name) for name in fields}
+        for token in {t for name in fields for t in getattr(analyzed, name).tokens}:
+            postings = self.position_index.get(token)
+            if postings is None or pid not in postings:
+                continue
+            kept = array("I", (p for p in postings[pid] if p >> FIELD_SHIFT not in numbers))
+            if kept:
+                postings[pid] = kept
+            else:
+                del postings[pid]
+                if not postings:
+                    del self.position_index[token]
+
+    @staticmethod
+    def _discard(index, key, pid):
+        # Drop empty postings so suggestions never offer keys with no products
+        postings = index.get(key)
+        if postings is not None:
+            postings.discard(pid)
+            if not postings:
+                del index[key]
+
+    @classmethod
+    def _repost(cls, index, old_keys, new_keys, pid):
+        """Move a pid between postings, touching only keys that differ."""
+        for key in set(old_keys) - set(new_keys):
+            cls._discard(index, key, pid)
+        for key in set(new_keys) - set(old_keys):
+            index[key].add(pid)
+
+    def _unindex_product(self, product: Product):
+        pid = product.pid
+        del self.products_by_id[pid]
+        analyzed = self.analyzed.pop(pid)
+        for token in analyzed.name.tokens:
+            self._discard(self.name_index, token, pid)
+        self._discard(self.brand_index, analyzed.brand.text, pid)
+        self._discard(self.category_index, analyzed.category.text, pid)
+        values = self.facet_values.pop(pid)
+        self._discard(self.availability_index, values[2], pid)
+        self._discard(self.price_bucket_index, values[3], pid)
+        for key in self._phonetic_keys(analyzed):
+            self._discard(self.phonetic_index, key, pid)
+        
+        # Remove from price index
+        self._remove_price(product.price, pid)
+        
+        for token in analyzed.full_text_tokens:
+            self._discard(self.full_text_index, token, pid)
+        self._unpost_positions(pid, analyzed, ANALYZED_FIELDS)
+
+    def _phonetic_keys(self, analyzed: AnalyzedProduct) -> Set[str]:
+        return _phonetic_keys(self.analyzer.terms, analyzed)
+
+    def _term_frequency(self, term: str) -> int:
+        token = self.analyzer.vocabulary.get(term)
+        return len(self.full_text_index.get(token, ())) if token is not None else 0
+
+    def did_you_mean(self, query: str) -> Optional[str]:
+        """The query with each unknown word replaced by its closest indexed term, or None if unchanged"""
+        words = list(self.analyzer.query_tokens(query)[1])
+        corrected = self.speller.correct(words)
+        return " ".join(corrected) if corrected != words else None
+
+    def facet_counts(self, pids, cache_key=None) -> Dict[str, Dict[str, int]]:
+        """Matching products per facet value for a set of pids, most common value first.
+
+        Each facet is counted by intersecting the match set with every value's
+        precomputed postings, or, when that would probe more entries than the
+        match set holds, by one pass over the matches' stored facet values.
+        Choosing costs O(#facet values). With a ``cache_key`` (hashable, and
+        identifying the match set) counts are reused until the catalog changes.
+        """
+        if cache_key is not None:
+            with self._facet_lock:
+                cached = self._facet_cache.get((cache_key, self.version))
+                if cached is not None:
+                    self._facet_cache.move_to_end((cache_key, self.version))
+                    return cached
+        
+        if not isinstance(pids, (set, frozenset)):
+            pids = set(pids)
+        facets = {}
+        for i, name in enumerate(FACETS):
+            index = self.facet_index[name]
+            probes = sum(min(len(pids), len(postings)) for postings in index.values())
+            if probes <= len(pids) * FACET_SCAN_COST:
+                counts = {}
+                for value, postings in index.items():
+                    count = len(pids & postings)
+                    if count:
+                        counts[value] = count
+            else:
+                counts = Counter(map(itemgetter(i), map(self.facet_values.__getitem__, pids)))
+            facets[name] = dict(sorted(counts.items(), key=lambda item: (-item[1], item[0])))
+        
+        if cache_key is not None:
+            with self._facet_lock:
+                self._facet_cache[(cache_key, self.version)] = facets
+                if len(self._facet_cache) > FACET_CACHE_SIZE:
+                    self._facet_cache.popitem(last=False)
+        return facets
+
+    def _attach_facets(self, result: SearchResult, cache_key):
+        start_ns = time.perf_counter_ns()
+        result.facets = self.facet_counts({p.pid for p in result.products}, cache_key)
+        facet_ns = time.perf_counter_ns() - start_ns
+        result.stages["facets"] = facet_ns
+        result.time_taken += facet_ns / 1e9
+
+    def _remove_price(self, price, pid):
+        i = bisect.bisect_left(self.price_index, (price, pid))
+        if i < len(self.price_index) and self.price_index[i] == (price, pid):
+            del self.price_index[i]
+
+    def add_product(self, product: Product) -> bool:
+        """Add a product to self.products and index it without a full rebuild"""
+        if product.pid in self.products_by_id:
+            return False
+        self._positions[product.pid] = len(self.products)
+        self.products.append(product)
+        self._index_product(product)
+        self.version += 1
+        return True
+
+    def remove_product(self, pid: int) -> bool:
+        """Remove a product from self.products and every index"""
+        product = self.products_by_id.get(pid)
+        if product is None:
+            return False
+        i = self._positions.pop(pid)
+        del self.products[i]
+        del self.fuzzy_index[i]
+        # Later products shift down one slot
+        for j in range(i, len(self.products)):
+            self._positions[self.products[j].pid] = j
+        self._unindex_product(product)
+        self.version += 1
+        return True
+
+    def update_product(self, pid: int, **changes) -> bool:
+        """Apply field changes to a product, re-indexing only what they affect.
+
+        The product is replaced by an updated copy (published catalog
+        snapshots share Product objects, so they are never mutated in place).
+        """
+        old = self.products_by_id.get(pid)
+        if old is None:
+            return False
+        product = old.replace(**changes)
+        changed = {f for f in changes if getattr(old, f) != getattr(product, f)}
+        if not changed:
+            return True
+        
+        # Re-analyze only the text fields that changed
+        before = self.analyzed[pid]
+        analyzed = self.analyzer.analyze_product(product, before, changed)
+        self.analyzed[pid] = analyzed
+        
+        # Swap the object in the pid-resolved structures
+        self.products_by_id[pid] = product
+        i = self._positions[pid]
+        self.products[i] = product
+        self.fuzzy_index[i] = (analyzed.name.text, product)
+        
+        if "name" in changed:
+            self._repost(self.name_index, before.name.tokens, analyzed.name.tokens, pid)
+        if "brand" in changed:
+            self._repost(self.brand_index, [before.brand.text], [analyzed.brand.text], pid)
+        if changed & {"name", "brand"}:
+            self._repost(self.phonetic_index, self._phonetic_keys(before), self._phonetic_keys(analyzed), pid)
+        if "category" in changed:
+            self._repost(self.category_index, [before.category.text], [analyzed.category.text], pid)
+        if "price" in changed:
+            # Reposition only this entry in the price index
+            self._remove_price(old.price, pid)
+            bisect.insort(self.price_index, (product.price, pid))
+        if changed & {"brand", "category", "availability", "price"}:
+            before_values = self.facet_values[pid]
+            values = self.facet_values[pid] = _facet_tuple(product, analyzed)
+            self._repost(self.availability_index, [before_values[2]], [values[2]], pid)
+            self._repost(self.price_bucket_index, [before_values[3]], [values[3]], pid)
+        text_changed = [name for name in ANALYZED_FIELDS if name in changed]
+        if text_changed:
+            self._repost(self.full_text_index, before.full_text_tokens, analyzed.full_text_tokens, pid)
+            self.speller.update(self.analyzer.terms[token] for token in analyzed.full_text_tokens)
+            # Only the changed fields' positions move
+            self._unpost_positions(pid, before, text_changed)
+            self._post_positions(pid, analyzed, text_changed)
+        self.version += 1
+        return True
 
-    @lru_cache(maxsize=1000)
     def get_suggestions(self, query: str, max_suggestions: int = 5) -> List[str]:
-        """Get search suggestions with caching for better performance"""
+        """Get search suggestions, logging the call when a query logger is attached"""
+        if not self.query_logger:
+            return self._get_suggestions(query, max_suggestions, self.version)
+        start_ns = time.perf_counter_ns()
+        suggestions = self._get_suggestions(query, max_suggestions, self.version)
+        self.query_logger.log("suggest", query, (time.perf_counter_ns() - start_ns) / 1e9, len(suggestions))
+        return suggestions
+
+    @lru_cache(maxsize=1000)
+    def _get_suggestions(self, query: str, max_suggestions: int = 5, version: int = 0) -> List[str]:
+        """Get search suggestions with caching for better performance (keyed on index version)"""
         if not query:
             return []
         
-        query = query.lower().strip()
+        query = self.analyzer.query_tokens(query)[0]
         suggestions = set()
         
         # Get exact matches first
@@ -91,181 +814,264 @@ class SearchAlgorithms:
             suggestions.update(fuzzy_matches)
         
         # Sort suggestions by relevance
-        def relevance_score(suggestion):
-            # Exact match at start gets highest priority
-            if suggestion.startswith(query):
-                return (0, len(suggestion))
-            # Contains query gets second priority
-            if query in suggestion:
-                return (1, len(suggestion))
-            # Fuzzy match gets lowest priority
-            return (2, len(suggestion))
-        
-        sorted_suggestions = sorted(suggestions, key=relevance_score)
+        sorted_suggestions = sorted(suggestions, key=lambda x: suggestion_key(query, x))
         return sorted_suggestions[:max_suggestions]
 
-    def linear_search(self, query: str) -> SearchResult:
+    def linear_search(self, query: str, trace: Optional[SearchTrace] = None) -> SearchResult:
         """Linear search through all products"""
-        start_time = time.time()
-        query = query.lower().strip()
+        trace = trace or SearchTrace()
+        query = self.analyzer.query_tokens(query)[0]
         results = set()
+        trace.lap("normalize")
         
+        trace.count("candidates_examined", len(self.products))
+        analyzed = self.analyzed
         for product in self.products:
-            # Check if query matches any part of the product
-            if (query in product.name.lower() or
-                query in product.brand.lower() or
-                query in product.category.lower() or
-                query in product.description.lower()):
+            # Check if query matches any part of the product (pre-normalized text)
+            fields = analyzed[product.pid]
+            if (query in fields.name.text or
+                query in fields.brand.text or
+                query in fields.category.text or
+                query in fields.description.text):
                 results.add(product)
+        trace.lap("scan")
         
-        time_taken = time.time() - start_time
-        return SearchResult(
-            products=sorted(list(results), key=lambda x: x.name),
-            time_taken=time_taken,
-            algorithm_name="Linear Search",
-            matches_found=len(results)
-        )
+        sorted_results = sorted(list(results), key=lambda x: x.name)
+        trace.lap("sort")
+        return self._finish(trace, sorted_results, "Linear Search")
 
-    def indexed_search(self, query: str) -> SearchResult:
+    def indexed_search(self, query: str, trace: Optional[SearchTrace] = None) -> SearchResult:
         """Search using pre-built indices"""
-        start_time = time.time()
-        query = query.lower().strip()
+        trace = trace or SearchTrace()
+        query, _, token_ids = self.analyzer.query_tokens(query)
         results = set()
+        trace.lap("normalize")
         
-        # Split query into words
-        words = query.split()
+        # Collect the posting lists to union (.get avoids growing the defaultdicts)
+        postings = [self.name_index.get(token, ()) for token in token_ids]
+        postings.append(self.brand_index.get(query, ()))
+        postings.append(self.category_index.get(query, ()))
+        postings.extend(self.full_text_index.get(token, ()) for token in token_ids)
+        for posting in postings:
+            trace.count("postings_touched", len(posting))
+            results.update(posting)
+        trace.lap("lookup")
         
-        # Search in name index
-        for word in words:
-            results.update(self.name_index[word])
-        
-        # Search in brand index
-        results.update(self.brand_index[query])
-        
-        # Search in category index
-        results.update(self.category_index[query])
-        
-        # Search in full text index
-        for word in words:
-            results.update(self.full_text_index[word])
-        
-        time_taken = time.time() - start_time
-        return SearchResult(
-            products=sorted(list(results), key=lambda x: x.name),
-            time_taken=time_taken,
-            algorithm_name="Indexed Search",
-            matches_found=len(results)
-        )
+        sorted_results = sorted((self.products_by_id[pid] for pid in sorted(results)), key=_name)
+        trace.lap("sort")
+        return self._finish(trace, sorted_results, "Indexed Search")
 
-    def fuzzy_search(self, query: str) -> SearchResult:
+    def fuzzy_search(self, query: str, trace: Optional[SearchTrace] = None,
+                     scorer: Optional[QueryScorer] = None) -> SearchResult:
         """Fuzzy search using difflib with improved precision"""
-        start_time = time.time()
-        query = query.lower().strip()
-        results = set()
-        
-        # Split query into words for better matching
-        query_words = query.split()
+        trace = trace or SearchTrace()
+        scorer = scorer or self.scorer(query)
+        results = []
+        if not scorer.words:
+            trace.lap("normalize")
+            return self._finish(trace, [], "Fuzzy Search")
+        similarity_calls = scorer.similarity_calls
+        trace.lap("normalize")
         
-        for name, product in self.fuzzy_index:
-            product_name = name.lower()
-            product_words = product_name.split()
-            
-            # Calculate match scores
-            exact_match_score = 0
-            partial_match_score = 0
-            fuzzy_match_score = 0
+        trace.count("candidates_examined", len(self.fuzzy_index))
+        for _, product in self.fuzzy_index:
+            # Features already computed for this query (by another engine) are reused
+            features = scorer.evaluate(product.pid)
             
             # Check for exact matches first
-            if query in product_name:
+            if features.exact:
                 exact_match_score = 1.0
-            elif product_name in query:
+            elif features.contained:
                 exact_match_score = 0.9
+            else:
+                exact_match_score = 0
             
             # Check for partial matches
-            matched_words = 0
-            for q_word in query_words:
-                if any(q_word in p_word for p_word in product_words):
-                    matched_words += 1
-            partial_match_score = matched_words / len(query_words)
+            partial_match_score = features.partial
             
             # Use SequenceMatcher for fuzzy matching only if no exact/partial matches
+            fuzzy_match = False
             if exact_match_score < 0.9 and partial_match_score < 0.5:
-                fuzzy_match_score = difflib.SequenceMatcher(None, query, product_name).ratio()
-            
-            # Calculate final score
-            final_score = max(exact_match_score, partial_match_score, fuzzy_match_score)
+                fuzzy_match = features.ratio_exceeds(0.6)
             
             # Add to results if score is high enough
-            if final_score > 0.6:
-                results.add(product)
+            if exact_match_score > 0.6 or partial_match_score > 0.6 or fuzzy_match:
+                scorer.remember(product.pid, features)
+                results.append(product)
+        trace.lap("score")
         
-        # Sort results by relevance
-        sorted_results = sorted(
-            list(results),
-            key=lambda x: (
-                not query.lower() in x.name.lower(),  # Exact matches first
-                -len([w for w in query_words if w in x.name.lower()]),  # More matching words
-                -difflib.SequenceMatcher(None, query, x.name.lower()).ratio()  # Better fuzzy match
-            )
-        )
+        # Sort results by relevance (a ratio computed while filtering is not recomputed)
+        sorted_results = scorer.rank(results)
+        trace.count("similarity_calls", scorer.similarity_calls - similarity_calls)
+        trace.lap("sort")
+        return self._finish(trace, sorted_results, "Fuzzy Search", scores=scorer.scores_for(sorted_results))
+
+    @staticmethod
+    def _has_position(positions: array, target: int) -> bool:
+        i = bisect.bisect_left(positions, target)
+        return i < len(positions) and positions[i] == target
+
+    def _phrase_spans(self, token_ids, trace: SearchTrace) -> Dict[int, List[Tuple[int, int]]]:
+        """Packed (first, last) positions of each occurrence of a token sequence, per pid.
+
+        Candidates come from the rarest term's postings, so a phrase costs
+        about as much as its least frequent word.
+        """
+        if not token_ids or None in token_ids:
+            return {}
+        postings = [self.position_index.get(token, {}) for token in token_ids]
+        rarest = min(range(len(postings)), key=lambda i: len(postings[i]))
+        trace.count("candidates_examined", len(postings[rarest]))
+        last = len(token_ids) - 1
+        matches = {}
+        for pid, anchors in postings[rarest].items():
+            per_term = [p.get(pid) for p in postings]
+            if None in per_term:
+                continue
+            spans = []
+            for anchor in anchors:
+                # Skip anchors whose phrase would start before the field does
+                if (anchor & POSITION_MASK) < rarest:
+                    continue
+                start = anchor - rarest
+                if all(self._has_position(per_term[i], start + i) for i in range(len(per_term)) if i != rarest):
+                    spans.append((start, start + last))
+            if spans:
+                matches[pid] = spans
+        return matches
+
+    def phonetic_candidates(self, query: str) -> Set[int]:
+        """Pids whose name or brand has a sound-alike for every query word (dictionary lookups only)"""
+        matches = None
+        for word in self.analyzer.query_tokens(query)[1]:
+            keys = token_keys(word)
+            if not keys:
+                continue
+            pids = set().union(*(self.phonetic_index.get(key, ()) for key in keys))
+            matches = pids if matches is None else matches & pids
+            if not matches:
+                return set()
+        return matches or set()
+
+    def phonetic_search(self, query: str, trace: Optional[SearchTrace] = None,
+                        scorer: Optional[QueryScorer] = None) -> SearchResult:
+        """Sound-alike search on name and brand words ("Adiddas" finds Adidas).
+
+        A separate engine next to fuzzy_search, which still scans the whole
+        catalog; run_all_searches gives both one scorer, so products they
+        share are only scored once.
+        """
+        trace = trace or SearchTrace()
+        scorer = scorer or self.scorer(query)
+        similarity_calls = scorer.similarity_calls
+        trace.lap("normalize")
         
-        time_taken = time.time() - start_time
-        return SearchResult(
-            products=sorted_results,
-            time_taken=time_taken,
-            algorithm_name="Fuzzy Search",
-            matches_found=len(results)
-        )
+        pids = self.phonetic_candidates(query)
+        trace.count("candidates_examined", len(pids))
+        trace.lap("lookup")
+        
+        results = scorer.rank(self.products_by_id[pid] for pid in pids)
+        trace.count("similarity_calls", scorer.similarity_calls - similarity_calls)
+        trace.lap("sort")
+        return self._finish(trace, results, "Phonetic Search", scores=scorer.scores_for(results))
 
-    def regex_search(self, query: str) -> SearchResult:
+    def phrase_search(self, query: str, trace: Optional[SearchTrace] = None,
+                      scorer: Optional[QueryScorer] = None) -> SearchResult:
+        """Exact phrase and NEAR/k proximity search over the positional index
+
+        Words in a clause (quoted or not) must appear consecutively in one
+        field. Clauses joined by NEAR/k must fall within k positions of each
+        other in the same field, in either order.
+        """
+        trace = trace or SearchTrace()
+        parts = NEAR_PATTERN.split(query.strip())
+        clauses = [self.analyzer.query_tokens(clause.replace('"', ' '))[2] for clause in parts[0::2]]
+        distances = [int(k) for k in parts[1::2]]
+        trace.lap("normalize")
+        
+        spans = self._phrase_spans(clauses[0], trace)
+        for clause, distance in zip(clauses[1:], distances):
+            if not spans:
+                break
+            right = self._phrase_spans(clause, trace)
+            combined = {}
+            for pid in spans.keys() & right.keys():
+                near = [(min(s1, s2), max(e1, e2))
+                        for s1, e1 in spans[pid] for s2, e2 in right[pid]
+                        if s1 >> FIELD_SHIFT == s2 >> FIELD_SHIFT and max(s2 - e1, s1 - e2) <= distance]
+                if near:
+                    combined[pid] = near
+            spans = combined
+        trace.lap("intersect")
+        
+        # Character offsets come from the cached token spans, not a rescan of the text
+        highlights = {}
+        for pid, matched in spans.items():
+            analyzed = self.analyzed[pid]
+            offsets = []
+            for start, end in sorted(set(matched)):
+                name = ANALYZED_FIELDS[start >> FIELD_SHIFT]
+                field_spans = getattr(analyzed, name).spans
+                offsets.append((name, field_spans[2 * (start & POSITION_MASK)], field_spans[2 * (end & POSITION_MASK) + 1]))
+            highlights[pid] = offsets
+        trace.lap("highlight")
+        
+        scorer = scorer or self.scorer(query)
+        similarity_calls = scorer.similarity_calls
+        results = scorer.rank(self.products_by_id[pid] for pid in spans)
+        trace.count("similarity_calls", scorer.similarity_calls - similarity_calls)
+        trace.lap("sort")
+        return self._finish(trace, results, "Phrase Search", highlights, scorer.scores_for(results))
+
+    def regex_search(self, query: str, trace: Optional[SearchTrace] = None) -> SearchResult:
         """Search using regular expressions"""
-        start_time = time.time()
+        trace = trace or SearchTrace()
         try:
             # Create a case-insensitive pattern
             pattern = re.compile(query, re.IGNORECASE)
             results = set()
+            trace.lap("compile")
             
+            trace.count("candidates_examined", len(self.products))
             for product in self.products:
                 if (pattern.search(product.name) or
                     pattern.search(product.brand) or
                     pattern.search(product.category) or
                     pattern.search(product.description)):
                     results.add(product)
+            trace.lap("scan")
             
-            time_taken = time.time() - start_time
-            return SearchResult(
-                products=sorted(list(results), key=lambda x: x.name),
-                time_taken=time_taken,
-                algorithm_name="Regex Search",
-                matches_found=len(results)
-            )
+            sorted_results = sorted(list(results), key=lambda x: x.name)
+            trace.lap("sort")
+            return self._finish(trace, sorted_results, "Regex Search")
         except re.error:
-            return SearchResult([], time.time() - start_time, "Regex Search", 0)
+            trace.lap("compile")
+            return self._finish(trace, [], "Regex Search")
 
-    def price_range_search(self, min_price: float, max_price: float) -> SearchResult:
+    def price_range_search(self, min_price: float, max_price: float,
+                           trace: Optional[SearchTrace] = None) -> SearchResult:
         """Search products within a price range"""
-        start_time = time.time()
+        trace = trace or SearchTrace()
         
         # Binary search for price range
         idx_start = bisect.bisect_left(self.price_index, (min_price, -float('inf')))
         idx_end = bisect.bisect_right(self.price_index, (max_price, float('inf')))
+        trace.count("postings_touched", idx_end - idx_start)
+        trace.lap("bisect")
         
         results = []
         for price, pid in self.price_index[idx_start:idx_end]:
-            product = next((p for p in self.products if p.pid == pid), None)
+            product = self.products_by_id.get(pid)
             if product:
                 results.append(product)
+        trace.lap("resolve")
         
-        time_taken = time.time() - start_time
-        return SearchResult(
-            products=sorted(results, key=lambda x: x.price),
-            time_taken=time_taken,
-            algorithm_name="Price Range Search",
-            matches_found=len(results)
-        )
+        sorted_results = sorted(results, key=lambda x: x.price)
+        trace.lap("sort")
+        return self._finish(trace, sorted_results, "Price Range Search")
 
-    def run_all_searches(self, query: str) -> Dict[str, SearchResult]:
-        """Run all search algorithms and return their results"""
+    def run_all_searches(self, query: str, facets: bool = False) -> Dict[str, SearchResult]:
+        """Run all search algorithms and return their results, with facet counts if asked"""
         # Normalize query
         query = query.strip()
         
@@ -273,27 +1079,223 @@ class SearchAlgorithms:
         price_match = re.match(r'price:(\d+)-(\d+)', query.lower())
         if price_match:
             min_price, max_price = map(float, price_match.groups())
-            return {"price_range": self.price_range_search(min_price, max_price)}
-        
-        # Run all text-based searches
-        results = {
-            "linear": self.linear_search(query),
-            "indexed": self.indexed_search(query),
-            "fuzzy": self.fuzzy_search(query),
-            "regex": self.regex_search(query)
+            result = self.price_range_search(min_price, max_price)
+            if facets:
+                self._attach_facets(result, ("price_range", min_price, max_price))
+            if self.query_logger:
+                self.query_logger.log("price_range", query, result.time_taken, result.matches_found)
+            return {"price_range": result}
+        
+        # Run all text-based searches, deferring metrics until ranking is timed too.
+        # One scorer serves every engine, so a product found by several of them
+        # has its relevance features computed once
+        scorer = self.scorer(query)
+        engines = {
+            "linear": self.linear_search,
+            "indexed": self.indexed_search,
+            "fuzzy": partial(self.fuzzy_search, scorer=scorer),
+            "regex": self.regex_search,
+            "phonetic": partial(self.phonetic_search, scorer=scorer)
         }
+        if is_phrase_query(query):
+            engines["phrase"] = partial(self.phrase_search, scorer=scorer)
+        results = {name: engine(query, SearchTrace(deferred=True)) for name, engine in engines.items()}
         
         # Sort results by relevance across all algorithms
         for algo_name, result in results.items():
             if result.matches_found > 0:
+                rank_start = time.perf_counter_ns()
+                similarity_calls = scorer.similarity_calls
                 # Sort products by relevance
-                result.products.sort(
-                    key=lambda x: (
-                        not query.lower() in x.name.lower(),  # Exact matches first
-                        -len([w for w in query.split() if w in x.name.lower()]),  # More matching words
-                        -difflib.SequenceMatcher(None, query, x.name.lower()).ratio()  # Better fuzzy match
-                    )
-                )
+                result.products = scorer.rank(result.products)
+                result.scores = scorer.scores_for(result.products)
+                # Charge the ranking pass to the engine so the chart shows the real cost
+                rank_ns = time.perf_counter_ns() - rank_start
+                result.stages["rank"] = rank_ns
+                result.time_taken += rank_ns / 1e9
+                result.counters["similarity_calls"] = (result.counters.get("similarity_calls", 0)
+                                                       + scorer.similarity_calls - similarity_calls)
+                if facets:
+                    self._attach_facets(result, (algo_name, query))
+            if self.metrics:
+                self.metrics.record(result)
+            if self.query_logger:
+                self.query_logger.log(algo_name, query, result.time_taken, result.matches_found)
         
         # Remove empty results
-        return {k: v for k, v in results.items() if v.matches_found > 0} 
\ No newline at end of file
+        found = {k: v for k, v in results.items() if v.matches_found > 0}
+        if found:
+            return found
+        
+        # Nothing matched anywhere: retry the cheap indexed engine on a spelling-corrected query
+        corrected = self.did_you_mean(query)
+        if corrected:
+            result = self.indexed_search(corrected)
+            result.corrected_query = corrected
+            corrected_scorer = self.scorer(corrected)
+            result.products = corrected_scorer.rank(result.products)
+            result.scores = corrected_scorer.scores_for(result.products)
+            if facets and result.matches_found > 0:
+                self._attach_facets(result, ("indexed", corrected))
+            if self.query_logger:
+                self.query_logger.log("indexed", corrected, result.time_taken, result.matches_found)
+            if result.matches_found > 0:
+                return {"indexed": result}
+        return found
+
+    def search_many(self, queries: List[str], engine: str = "indexed", limit: Optional[int] = None,
+                    filters: Optional[Dict[str, str]] = None, workers: Optional[int] = None,
+                    facets: bool = False) -> List[SearchResult]:
+        """Run a batch of queries through one engine, sharing work across the batch.
+
+        Duplicate queries are answered once. The indexed engine reads each
+        posting list once per batch and orders every result through one
+        (name, pid) ranking of the catalog, so each query sorts integers instead
+        of names. Price bounds and attribute filters (brand, category,
+        availability, price bucket) are resolved once for the whole batch. The
+        scanning engines can fan out across ``workers`` processes, kept alive
+        between batches until the catalog changes or close() is called. With
+        ``facets``, each
+        result carries counts over its filtered (not limited) matches. Results
+        come back in input order; duplicate queries share the same SearchResult
+        object.
+        """
+        if engine not in BATCH_ENGINES:
+            raise ValueError(f"Unknown engine '{engine}', expected one of {', '.join(BATCH_ENGINES)}")
+        
+        # Deduplicate on the normalized form the engine would compute anyway
+        keys = [query.strip() if engine == "regex" else self.analyzer.query_tokens(query)[0] for query in queries]
+        unique_keys = list(dict.fromkeys(keys))
+        
+        if engine == "indexed":
+            unique_results = self._batch_indexed(unique_keys)
+        elif engine == "price_range":
+            unique_results = self._batch_price_range(unique_keys)
+        elif workers and workers > 1 and len(unique_keys) > 1:
+            unique_results = self._batch_in_pool(engine, unique_keys, workers)
+        else:
+            search = getattr(self, f"{engine}_search")
+            unique_results = {key: search(key) for key in unique_keys}
+        
+        allowed = self._batch_filter(filters) if filters else None
+        filter_key = tuple(sorted(filters.items())) if filters else ()
+        for key, result in unique_results.items():
+            if allowed is not None:
+                result.products = [p for p in result.products if p.pid in allowed]
+                result.matches_found = len(result.products)
+            if facets:
+                self._attach_facets(result, (engine, key, filter_key))
+            if limit is not None:
+                result.products = result.products[:limit]
+        return [unique_results[key] for key in keys]
+
+    def _batch_indexed(self, keys: List[str]) -> Dict[str, SearchResult]:
+        # Read every distinct term's postings once for the whole batch
+        shared = SearchTrace()
+        term_postings = {None: set()}
+        for key in keys:
+            for token in self.analyzer.query_tokens(key)[2]:
+                if token not in term_postings:
+                    term_postings[token] = self.full_text_index.get(token, set()) | self.name_index.get(token, set())
+                    shared.count("postings_touched", len(term_postings[token]))
+        ordered, rank = self._names_in_order()
+        shared.lap("shared_lookup")
+        amortized_ns = shared.elapsed_ns // max(1, len(keys))
+        
+        results = {}
+        for key in keys:
+            trace = SearchTrace()
+            matches = set(self.brand_index.get(key, ()))
+            matches.update(self.category_index.get(key, ()))
+            for token in self.analyzer.query_tokens(key)[2]:
+                matches.update(term_postings[token])
+            trace.lap("lookup")
+            sorted_results = [ordered[i] for i in sorted(map(rank.__getitem__, matches))]
+            trace.lap("sort")
+            trace.stages["shared_lookup"] = amortized_ns
+            trace.start_ns -= amortized_ns
+            results[key] = self._finish(trace, sorted_results, "Indexed Search")
+        return results
+
+    def _names_in_order(self) -> Tuple[List[Product], Dict[int, int]]:
+        """Products sorted by (name, pid) and each pid's position, kept until the catalog changes"""
+        cached = self._name_order
+        if cached is None or cached[0] != self.version:
+            # Stable sort over pid order, so same-named products sort by pid as in indexed_search
+            ordered = sorted(sorted(self.products_by_id.values(), key=_pid), key=_name)
+            cached = self._name_order = (self.version, ordered, {p.pid: i for i, p in enumerate(ordered)})
+        return cached[1], cached[2]
+
+    def _batch_price_range(self, keys: List[str]) -> Dict[str, SearchResult]:
+        # Split the price index once so each query is two bisects on plain floats
+        shared = SearchTrace()
+        prices = [price for price, _ in self.price_index]
+        shared.lap("shared_lookup")
+        amortized_ns = shared.elapsed_ns // max(1, len(keys))
+        
+        results = {}
+        for key in keys:
+            trace = SearchTrace()
+            match = re.match(r'price:(\d+)-(\d+)', key)
+            if not match:
+                raise ValueError(f"Price range queries must look like 'price:MIN-MAX', got '{key}'")
+            min_price, max_price = map(float, match.groups())
+            idx_start = bisect.bisect_left(prices, min_price)
+            idx_end = bisect.bisect_right(prices, max_price)
+            trace.count("postings_touched", idx_end - idx_start)
+            trace.lap("bisect")
+            matches = [self.products_by_id[pid] for _, pid in self.price_index[idx_start:idx_end]]
+            trace.lap("resolve")
+            trace.stages["shared_lookup"] = amortized_ns
+            trace.start_ns -= amortized_ns
+            results[key] = self._finish(trace, matches, "Price Range Search")
+        return results
+
+    def _batch_in_pool(self, engine: str, keys: List[str], workers: int) -> Dict[str, SearchResult]:
+        pool = self._pool_for(workers)
+        chunksize = max(1, len(keys) // (workers * 4))
+        outputs = pool.map(_batch_worker_search, [engine] * len(keys), keys, chunksize=chunksize)
+        results = {}
+        for key, (pids, time_taken, algorithm_name, stages, counters) in zip(keys, outputs):
+            matches = [self.products_by_id[pid] for pid in pids if pid in self.products_by_id]
+            result = SearchResult(matches, time_taken, algorithm_name, len(matches), stages, counters)
+            if self.metrics:
+                self.metrics.record(result)
+            results[key] = result
+        return results
+
+    def _pool_for(self, workers: int) -> ProcessPoolExecutor:
+        """A pool whose workers already hold this catalog version's indexes, started only when needed"""
+        key = (workers, self.version)
+        if self._batch_pool_key != key:
+            self.close()
+            # Workers build their indexes once, then only queries and pids travel
+            self._batch_pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_batch_worker,
+                                                   initargs=(list(self.products_by_id.values()),))
+            self._batch_pool_key = key
+        return self._batch_pool
+
+    def close(self):
+        """Shut down search_many's worker pool, if one is running"""
+        if self._batch_pool is not None:
+            self._batch_pool.shutdown()
+            self._batch_pool = None
+            self._batch_pool_key = None
+
+    def _batch_filter(self, filters: Dict[str, str]) -> Set[int]:
+        """Resolve attribute filters once into the set of allowed pids."""
+        allowed = None
+        for attribute, value in filters.items():
+            value = self.analyzer.normalize(value)
+            if attribute == "brand":
+                pids = set(self.brand_index.get(value, ()))
+            elif attribute == "category":
+                pids = set(self.category_index.get(value, ()))
+            elif attribute == "availability":
+                pids = set(self.availability_index.get(value, ()))
+            elif attribute == "price":
+                pids = set(self.price_bucket_index.get(value, ()))
+            else:
+                raise ValueError(f"Unsupported filter '{attribute}'")
+            allowed = pids if allowed is None else allowed & pids
+        return allowed if allowed is not None else set()
@@ -0,0 +1,167 @@
+import bisect
+import json
+import math
+import os
+import threading
+import time
+from collections import defaultdict, deque
+
+# Histogram bucket upper bounds in milliseconds
+LATENCY_BUCKETS_MS = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered), math.ceil(pct / 100 * len(ordered))) - 1)]
+
+class SearchTrace:
+    """Stage timings (perf_counter_ns) and work counters for one search call.
+
+    Call ``lap(stage)`` at the end of each stage; the time since the previous
+    lap is charged to that stage.
+    """
+    def __init__(self, deferred=False):
+        # Deferred traces are recorded by the caller once it has finished ranking
+        self.deferred = deferred
+        self.stages = {}
+        self.counters = defaultdict(int)
+        self.start_ns = time.perf_counter_ns()
+        self._mark_ns = self.start_ns
+
+    def lap(self, stage):
+        now = time.perf_counter_ns()
+        self.stages[stage] = self.stages.get(stage, 0) + now - self._mark_ns
+        self._mark_ns = now
+
+    def count(self, counter, amount=1):
+        self.counters[counter] += amount
+
+    @property
+    def elapsed_ns(self):
+        return self._mark_ns - self.start_ns
+
+class LatencyHistogram:
+    """Cumulative bucket counts plus a rolling window of recent samples for percentiles."""
+    def __init__(self, window=1024):
+        self.bucket_counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.sum_ms = 0.0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, latency_ms):
+        self.bucket_counts[bisect.bisect_left(LATENCY_BUCKETS_MS, latency_ms)] += 1
+        self.count += 1
+        self.sum_ms += latency_ms
+        self.recent.append(latency_ms)
+
+    def percentile(self, pct):
+        return percentile(self.recent, pct)
+
+class MetricsRegistry:
+    """Per-engine latency histograms, stage totals and counters fed by SearchAlgorithms."""
+    def __init__(self, exporters=None, window=1024):
+        self._lock = threading.Lock()
+        self.window = window
+        self.histograms = defaultdict(lambda: LatencyHistogram(self.window))
+        self.stage_ns = defaultdict(lambda: defaultdict(int))
+        self.counters = defaultdict(lambda: defaultdict(int))
+        self.exporters = list(exporters or [])
+
+    def record(self, result):
+        engine = result.algorithm_name
+        with self._lock:
+            self.histograms[engine].observe(result.time_taken * 1000)
+            for stage, ns in result.stages.items():
+                self.stage_ns[engine][stage] += ns
+            for counter, amount in result.counters.items():
+                self.counters[engine][counter] += amount
+        for exporter in self.exporters:
+            exporter.export(self, result)
+
+    def snapshot(self):
+        """Plain-dict summary of every engine, safe to render or serialize."""
+        with self._lock:
+            summary = {}
+            for engine, hist in self.histograms.items():
+                summary[engine] = {
+                    "count": hist.count,
+                    "mean_ms": hist.sum_ms / hist.count if hist.count else 0.0,
+                    "p50_ms": hist.percentile(50),
+                    "p95_ms": hist.percentile(95),
+                    "p99_ms": hist.percentile(99),
+                    "stage_ms": {s: ns / 1e6 for s, ns in self.stage_ns[engine].items()},
+                    "counters": dict(self.counters[engine]),
+                }
+            return summary
+
+def _metric_label(engine):
+    return engine.lower().replace(" ", "_")
+
+class PrometheusTextExporter:
+    """Rewrites a Prometheus text-format file (for node_exporter's textfile collector)."""
+    def __init__(self, path, min_interval=5.0):
+        self.path = path
+        self.min_interval = min_interval
+        self._last_write = 0.0
+
+    def export(self, registry, result):
+        now = time.monotonic()
+        if now - self._last_write < self.min_interval:
+            return
+        self._last_write = now
+        self.write(registry)
+
+    def write(self, registry):
+        lines = ["# TYPE search_latency_ms histogram"]
+        with registry._lock:
+            for engine, hist in registry.histograms.items():
+                label = _metric_label(engine)
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS_MS + ["+Inf"], hist.bucket_counts):
+                    cumulative += count
+                    lines.append(f'search_latency_ms_bucket{{engine="{label}",le="{bound}"}} {cumulative}')
+                lines.append(f'search_latency_ms_sum{{engine="{label}"}} {hist.sum_ms}')
+                lines.append(f'search_latency_ms_count{{engine="{label}"}} {hist.count}')
+            lines.append("# TYPE search_stage_seconds_total counter")
+            for engine, stages in registry.stage_ns.items():
+                for stage, ns in stages.items():
+                    lines.append(f'search_stage_seconds_total{{engine="{_metric_label(engine)}",stage="{stage}"}} {ns / 1e9}')
+            lines.append("# TYPE search_work_total counter")
+            for engine, counters in registry.counters.items():
+                for counter, amount in counters.items():
+                    lines.append(f'search_work_total{{engine="{_metric_label(engine)}",counter="{counter}"}} {amount}')
+        # Write then rename so scrapers never read a partial file
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, self.path)
+
+class JsonLinesExporter:
+    """Appends one JSON object per search to a file."""
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, registry, result):
+        line = json.dumps({
+            "ts": time.time(),
+            "engine": result.algorithm_name,
+            "latency_ms": result.time_taken * 1000,
+            "matches": result.matches_found,
+            "stages_ns": result.stages,
+            "counters": result.counters,
+        })
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(line + "\n")
+
+def exporters_from_env():
+    """Build exporters from SEARCH_METRICS_PROM and SEARCH_METRICS_JSONL."""
+    exporters = []
+    if os.environ.get("SEARCH_METRICS_PROM"):
+        exporters.append(PrometheusTextExporter(os.environ["SEARCH_METRICS_PROM"]))
+    if os.environ.get("SEARCH_METRICS_JSONL"):
+        exporters.append(JsonLinesExporter(os.environ["SEARCH_METRICS_JSONL"]))
+    return exporters
\ No newline at end of file
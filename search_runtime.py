@@ -0,0 +1,115 @@
+"""Process-wide search index, built lazily or on a background thread.
+
+Every Streamlit session (and anything else in the process) shares one
+SearchAlgorithms instance, kept in step with product_data through a
+catalog listener instead of being rebuilt on every rerun. Importing this
+module is cheap: the catalog and indexes are only built by the first
+get_search_engine() call, or by start_background_build() at startup so
+the login page renders while they load.
+"""
+import threading
+from typing import Optional
+import product_data
+from rwlock import ReadWriteLock
+from search_algorithms import SearchAlgorithms
+
+# SearchAlgorithms methods that change the index; every other call only reads it
+WRITE_METHODS = frozenset(("add_product", "remove_product", "update_product"))
+
+# Set once the shared engine can answer queries
+search_ready = threading.Event()
+
+_build_lock = threading.Lock()
+_start_lock = threading.Lock()
+_engine = None
+_build_thread = None
+
+class SharedSearch:
+    """Shares one SearchAlgorithms between several threads.
+
+    Searches run concurrently under the read side of a ReadWriteLock, while
+    catalog mutations take the write side, so a search never sees an index
+    halfway through an update.
+    """
+    def __init__(self):
+        self._lock = ReadWriteLock()
+        self._engine: Optional[SearchAlgorithms] = None
+        self._pending = []
+
+    def on_catalog_change(self, event, product):
+        self._lock.acquire_write()
+        try:
+            if self._engine is None:
+                # Still building from the snapshot; replay once it is ready
+                self._pending.append((event, product))
+            else:
+                self._apply(event, product)
+        finally:
+            self._lock.release_write()
+
+    def _apply(self, event, product):
+        if event == "add":
+            self._engine.add_product(product)
+        elif event == "remove":
+            self._engine.remove_product(product.pid)
+        elif event == "update":
+            fields = product.to_dict()
+            del fields["pid"]
+            self._engine.update_product(product.pid, **fields)
+
+    def attach(self, engine: SearchAlgorithms):
+        self._lock.acquire_write()
+        try:
+            self._engine = engine
+            for event, product in self._pending:
+                self._apply(event, product)
+            self._pending = []
+        finally:
+            self._lock.release_write()
+
+    def __getattr__(self, name):
+        attr = getattr(self._engine, name)
+        if not callable(attr):
+            return attr
+        if name in WRITE_METHODS:
+            acquire, release = self._lock.acquire_write, self._lock.release_write
+        else:
+            acquire, release = self._lock.acquire_read, self._lock.release_read
+        def locked(*args, **kwargs):
+            acquire()
+            try:
+                return attr(*args, **kwargs)
+            finally:
+                release()
+        return locked
+
+def _build(metrics=None, query_logger=None):
+    global _engine
+    with _build_lock:
+        if _engine is not None:
+            return _engine
+        shared = SharedSearch()
+        snapshot = product_data.get_catalog_and_listen(shared.on_catalog_change)
+        shared.attach(SearchAlgorithms(list(snapshot.products), metrics=metrics, query_logger=query_logger))
+        _engine = shared
+        search_ready.set()
+        return _engine
+
+def start_background_build(metrics=None, query_logger=None) -> threading.Event:
+    """Build the catalog and indexes on a daemon thread; returns the readiness event."""
+    global _build_thread
+    with _start_lock:
+        if _engine is None and _build_thread is None:
+            _build_thread = threading.Thread(target=_build, args=(metrics, query_logger),
+                                             name="search-build", daemon=True)
+            _build_thread.start()
+    return search_ready
+
+def get_search_engine(metrics=None, query_logger=None) -> SharedSearch:
+    """The shared engine, building it on this thread if nothing has started it yet.
+
+    ``metrics`` and ``query_logger`` only apply to whichever call builds it.
+    """
+    if _engine is not None:
+        return _engine
+    return _build(metrics, query_logger)
@@ -0,0 +1,452 @@
+"""Asyncio HTTP/JSON search service over one shared SearchAlgorithms index.
+
+Run:
+    python search_server.py --port 8765 --workers 4
+
+Endpoints:
+    GET    /health
+    GET    /search?q=...&engine=all|linear|indexed|fuzzy|regex|phonetic|phrase&limit=N
+    GET    /suggest?q=...&n=5
+    GET    /price?min=...&max=...&limit=N
+    POST   /batch           {"queries": [...], "engine": "indexed", "limit": N}
+    POST   /products        product JSON, indexed incrementally
+    PATCH  /products/<pid>  {"price": ..., ...} changed fields only
+    DELETE /products/<pid>
+"""
+import argparse
+import asyncio
+import http.client
+import json
+import threading
+import traceback
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from typing import Dict, List, Optional
+from models import EDITABLE_FIELDS, Product, check_field
+from rwlock import ReadWriteLock
+from search_algorithms import SearchAlgorithms, SearchResult, BATCH_ENGINES
+
+SEARCH_ENGINES = ("all", "linear", "indexed", "fuzzy", "regex", "phonetic", "phrase")
+MAX_BODY_BYTES = 4 * 1024 * 1024
+MAX_BATCH_QUERIES = 10000
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+def result_to_dict(result, limit=None):
+    products = result.products if limit is None else result.products[:limit]
+    return {
+        "algorithm_name": result.algorithm_name,
+        "time_taken": result.time_taken,
+        "matches_found": result.matches_found,
+        "stages": result.stages,
+        "counters": result.counters,
+        "corrected_query": result.corrected_query,
+        "highlights": {str(p.pid): result.highlights[p.pid] for p in products if p.pid in result.highlights},
+        "facets": result.facets,
+        "scores": {str(p.pid): result.scores[p.pid] for p in products if p.pid in result.scores},
+        "products": [p.to_dict() for p in products],
+    }
+
+def result_from_dict(data):
+    return SearchResult(
+        products=[Product.from_dict(p) for p in data["products"]],
+        time_taken=data["time_taken"],
+        algorithm_name=data["algorithm_name"],
+        matches_found=data["matches_found"],
+        stages=data.get("stages", {}),
+        counters=data.get("counters", {}),
+        highlights={int(pid): [tuple(h) for h in spans] for pid, spans in data.get("highlights", {}).items()},
+        corrected_query=data.get("corrected_query"),
+        facets=data.get("facets", {}),
+        scores={int(pid): score for pid, score in data.get("scores", {}).items()}
+    )
+
+def _int_param(params, name, default=None):
+    value = params.get(name)
+    if value is None:
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        value = -1
+    if value < 0:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"'{name}' must be a non-negative integer")
+    return value
+
+def _float_param(params, name):
+    if name not in params:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"Missing '{name}' parameter")
+    try:
+        return float(params[name])
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"'{name}' must be a number")
+
+class SearchService:
+    """Routes HTTP requests onto a worker pool sharing one incrementally updated index.
+
+    Identical in-flight reads are coalesced onto a single pool job, and once
+    ``max_pending`` jobs are queued further requests get 503 instead of
+    piling up behind the pool.
+    """
+    def __init__(self, search: SearchAlgorithms, workers: int = 4, max_pending: int = 256):
+        self.search = search
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="search")
+        self.lock = ReadWriteLock()
+        self.max_pending = max_pending
+        self.pending = 0
+        self.inflight = {}
+        self.stats = {"requests": 0, "coalesced": 0, "rejected": 0}
+
+    def _locked_read(self, fn):
+        self.lock.acquire_read()
+        try:
+            # Encode in the worker so the event loop only copies bytes
+            return json.dumps(fn()).encode()
+        finally:
+            self.lock.release_read()
+
+    def _locked_write(self, fn):
+        self.lock.acquire_write()
+        try:
+            return json.dumps(fn()).encode()
+        finally:
+            self.lock.release_write()
+
+    def _submit(self, worker, fn):
+        if self.pending >= self.max_pending:
+            self.stats["rejected"] += 1
+            raise HTTPError(HTTPStatus.SERVICE_UNAVAILABLE, "Search service is busy, retry later")
+        self.pending += 1
+        future = asyncio.get_running_loop().run_in_executor(self.executor, worker, fn)
+        future.add_done_callback(self._job_done)
+        return future
+
+    def _job_done(self, future):
+        self.pending -= 1
+
+    async def read(self, key, fn):
+        """Run a read-only call in the pool, sharing it with identical in-flight requests."""
+        future = self.inflight.get(key)
+        if future is not None:
+            self.stats["coalesced"] += 1
+        else:
+            future = self._submit(self._locked_read, fn)
+            self.inflight[key] = future
+            future.add_done_callback(lambda f: self.inflight.pop(key, None))
+        # Shield so one client hanging up does not cancel the job for the others
+        return await asyncio.shield(future)
+
+    async def write(self, fn):
+        return await self._submit(self._locked_write, fn)
+
+    async def dispatch(self, method, target, body):
+        url = urllib.parse.urlsplit(target)
+        params = dict(urllib.parse.parse_qsl(url.query))
+        path = url.path.rstrip("/") or "/"
+        if method == "GET" and path == "/health":
+            return json.dumps({"status": "ok", "products": len(self.search.products),
+                               "version": self.search.version, "pending": self.pending,
+                               **self.stats}).encode()
+        if method == "GET" and path == "/search":
+            return await self.handle_search(params)
+        if method == "GET" and path == "/suggest":
+            return await self.handle_suggest(params)
+        if method == "GET" and path == "/price":
+            return await self.handle_price(params)
+        if method == "POST" and path == "/batch":
+            return await self.handle_batch(self._json_body(body))
+        if method == "POST" and path == "/products":
+            return await self.handle_add_product(self._json_body(body))
+        if method in ("DELETE", "PATCH") and path.startswith("/products/"):
+            try:
+                pid = int(path.rsplit("/", 1)[1])
+            except ValueError:
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "Product id must be an integer")
+            if method == "PATCH":
+                changes = self._json_body(body)
+                unknown = set(changes) - set(EDITABLE_FIELDS)
+                if unknown:
+                    raise HTTPError(HTTPStatus.BAD_REQUEST, f"Fields cannot be changed: {', '.join(sorted(unknown))}")
+                return await self.write(lambda: {"updated": self.search.update_product(pid, **changes)})
+            return await self.write(lambda: {"removed": self.search.remove_product(pid)})
+        raise HTTPError(HTTPStatus.NOT_FOUND, f"No route for {method} {path}")
+
+    @staticmethod
+    def _json_body(body):
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Request body must be JSON")
+        if not isinstance(payload, dict):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Request body must be a JSON object")
+        return payload
+
+    async def handle_search(self, params):
+        query = params.get("q", "")
+        engine = params.get("engine", "all")
+        limit = _int_param(params, "limit")
+        # Sharded search has no facet indexes; its results simply come back without counts
+        facets = params.get("facets") in ("1", "true") and hasattr(self.search, "facet_counts")
+        if not query.strip():
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Missing 'q' parameter")
+        if engine not in SEARCH_ENGINES:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"Unknown engine '{engine}'")
+
+        def run():
+            if engine == "all":
+                results = self.search.run_all_searches(query, facets=True) if facets else self.search.run_all_searches(query)
+            else:
+                results = {engine: getattr(self.search, f"{engine}_search")(query)}
+                if facets:
+                    results[engine].facets = self.search.facet_counts(
+                        {p.pid for p in results[engine].products}, (engine, query))
+            return {"results": {name: result_to_dict(r, limit) for name, r in results.items()}}
+        # Regex patterns (also run by "all") are case sensitive
+        key_query = query.strip() if engine in ("all", "regex") else query.lower().strip()
+        return await self.read(("search", engine, key_query, limit, facets), run)
+
+    async def handle_suggest(self, params):
+        query = params.get("q", "")
+        n = _int_param(params, "n", 5)
+        return await self.read(("suggest", query.lower().strip(), n),
+                               lambda: {"suggestions": self.search.get_suggestions(query, n)})
+
+    async def handle_price(self, params):
+        min_price = _float_param(params, "min")
+        max_price = _float_param(params, "max")
+        limit = _int_param(params, "limit")
+        return await self.read(
+            ("price", min_price, max_price, limit),
+            lambda: {"results": {"price_range": result_to_dict(
+                self.search.price_range_search(min_price, max_price), limit)}})
+
+    async def handle_batch(self, payload):
+        queries = payload.get("queries")
+        engine = payload.get("engine", "indexed")
+        limit = payload.get("limit")
+        if not isinstance(queries, list) or not all(isinstance(q, str) for q in queries):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "'queries' must be a list of strings")
+        if len(queries) > MAX_BATCH_QUERIES:
+            raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                            f"At most {MAX_BATCH_QUERIES} queries per batch")
+        if engine not in BATCH_ENGINES:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"Unknown engine '{engine}'")
+        if limit is not None and (isinstance(limit, bool) or not isinstance(limit, int) or limit < 0):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "'limit' must be a non-negative integer")
+        # Batches are large and rarely identical, so they are not coalesced
+        return await self._submit(
+            self._locked_read,
+            lambda: {"results": [result_to_dict(r) for r in self.search.search_many(queries, engine, limit)]})
+
+    async def handle_add_product(self, payload):
+        try:
+            product = Product.from_dict(payload)
+        except (KeyError, TypeError):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Product JSON is missing required fields")
+        if isinstance(product.pid, bool) or not isinstance(product.pid, int):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Product id must be an integer")
+        for field in EDITABLE_FIELDS:
+            check_field(field, getattr(product, field))
+        return await self.write(lambda: {"added": self.search.add_product(product)})
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request_line = await reader.readline()
+                    if not request_line:
+                        break
+                    headers = {}
+                    while True:
+                        line = await reader.readline()
+                        if line in (b"\r\n", b"\n", b""):
+                            break
+                        name, _, value = line.decode("latin-1").partition(":")
+                        headers[name.strip().lower()] = value.strip()
+                except ValueError:
+                    # readline() raises this for a line longer than the stream's buffer limit
+                    await self._respond(writer, HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE,
+                                        {"error": "Request line or header too long"}, False)
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                    length = int(headers.get("content-length") or 0)
+                except ValueError:
+                    await self._respond(writer, HTTPStatus.BAD_REQUEST, {"error": "Malformed request"}, False)
+                    break
+                if length > MAX_BODY_BYTES:
+                    await self._respond(writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                                        {"error": "Request body too large"}, False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+
+                self.stats["requests"] += 1
+                try:
+                    status, payload = HTTPStatus.OK, await self.dispatch(method, target, body)
+                except HTTPError as e:
+                    status, payload = e.status, {"error": e.message}
+                except ValueError as e:
+                    status, payload = HTTPStatus.BAD_REQUEST, {"error": str(e)}
+                except Exception:
+                    # Anything else is a server bug: answer it rather than dropping the connection
+                    traceback.print_exc()
+                    status, payload = HTTPStatus.INTERNAL_SERVER_ERROR, {"error": "Internal server error"}
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _respond(writer, status, payload, keep_alive):
+        body = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+        extra = "Retry-After: 1\r\n" if status == HTTPStatus.SERVICE_UNAVAILABLE else ""
+        head = (f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n{extra}\r\n")
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+async def serve(search, host="127.0.0.1", port=8765, workers=4, max_pending=256):
+    service = SearchService(search, workers, max_pending)
+    server = await asyncio.start_server(service.handle_connection, host, port)
+    print(f"Search service listening on http://{host}:{port} ({len(search.products):,} products)")
+    async with server:
+        await server.serve_forever()
+
+class SearchClient:
+    """Talks to search_server with the same method names as SearchAlgorithms.
+
+    Keeps one persistent HTTP connection per calling thread.
+    """
+    def __init__(self, base_url: str, timeout: float = 10.0):
+        parts = urllib.parse.urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self._local.conn = conn
+        return conn
+
+    def _request(self, method, path, params=None, body=None):
+        if params:
+            path = f"{path}?{urllib.parse.urlencode({k: v for k, v in params.items() if v is not None})}"
+        payload = json.dumps(body).encode() if body is not None else None
+        headers = {"Content-Type": "application/json"} if payload else {}
+        for attempt in range(2):
+            conn = self._connection()
+            try:
+                conn.request(method, path, body=payload, headers=headers)
+                response = conn.getresponse()
+                data = json.loads(response.read() or b"{}")
+                break
+            except (http.client.HTTPException, ConnectionError):
+                # The server may have closed an idle keep-alive connection
+                conn.close()
+                self._local.conn = None
+                if attempt:
+                    raise
+        if response.status != HTTPStatus.OK:
+            raise RuntimeError(f"Search service error {response.status}: {data.get('error')}")
+        return data
+
+    def _results(self, data) -> Dict[str, SearchResult]:
+        return {name: result_from_dict(r) for name, r in data["results"].items()}
+
+    def run_all_searches(self, query: str, facets: bool = False) -> Dict[str, SearchResult]:
+        params = {"q": query, "engine": "all", "facets": "1" if facets else None}
+        return self._results(self._request("GET", "/search", params))
+
+    def _engine_search(self, engine, query):
+        return self._results(self._request("GET", "/search", {"q": query, "engine": engine}))[engine]
+
+    def linear_search(self, query: str) -> SearchResult:
+        return self._engine_search("linear", query)
+
+    def indexed_search(self, query: str) -> SearchResult:
+        return self._engine_search("indexed", query)
+
+    def fuzzy_search(self, query: str) -> SearchResult:
+        return self._engine_search("fuzzy", query)
+
+    def regex_search(self, query: str) -> SearchResult:
+        return self._engine_search("regex", query)
+
+    def phonetic_search(self, query: str) -> SearchResult:
+        return self._engine_search("phonetic", query)
+
+    def phrase_search(self, query: str) -> SearchResult:
+        return self._engine_search("phrase", query)
+
+    def price_range_search(self, min_price: float, max_price: float) -> SearchResult:
+        data = self._request("GET", "/price", {"min": min_price, "max": max_price})
+        return self._results(data)["price_range"]
+
+    def get_suggestions(self, query: str, max_suggestions: int = 5) -> List[str]:
+        return self._request("GET", "/suggest", {"q": query, "n": max_suggestions})["suggestions"]
+
+    def search_many(self, queries: List[str], engine: str = "indexed",
+                    limit: Optional[int] = None) -> List[SearchResult]:
+        data = self._request("POST", "/batch", body={"queries": queries, "engine": engine, "limit": limit})
+        return [result_from_dict(r) for r in data["results"]]
+
+    def add_product(self, product: Product) -> bool:
+        return self._request("POST", "/products", body=product.to_dict())["added"]
+
+    def remove_product(self, pid: int) -> bool:
+        return self._request("DELETE", f"/products/{pid}")["removed"]
+
+    def update_product(self, pid: int, **changes) -> bool:
+        return self._request("PATCH", f"/products/{pid}", body=changes)["updated"]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve product search over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=4, help="threads running search engines")
+    parser.add_argument("--max-pending", type=int, default=256, help="queued jobs before answering 503")
+    parser.add_argument("--catalog-size", type=int, default=0,
+                        help="serve a synthetic catalog of this size instead of product_data")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--shards", type=int, default=0,
+                        help="partition the catalog across this many worker processes")
+    parser.add_argument("--build-workers", type=int, default=0,
+                        help="processes building the initial index (unsharded only)")
+    args = parser.parse_args(argv)
+
+    if args.catalog_size:
+        from synthetic_catalog import generate_catalog
+        catalog = generate_catalog(args.catalog_size, seed=args.seed)
+    else:
+        from product_data import get_catalog
+        catalog = list(get_catalog().products)
+    if args.shards:
+        from sharded_search import ShardedSearch
+        search = ShardedSearch(catalog, args.shards)
+    else:
+        search = SearchAlgorithms(catalog, build_workers=args.build_workers)
+        print("Index built: " + ", ".join(f"{stage} {ns / 1e6:.0f}ms" for stage, ns in search.build_stages.items()))
+    try:
+        asyncio.run(serve(search, args.host, args.port, args.workers, args.max_pending))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if args.shards:
+            search.close()
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
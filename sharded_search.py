@@ -0,0 +1,294 @@
+"""Hash-sharded scatter-gather search across worker processes.
+
+Each shard process owns the products whose ``pid`` hashes to it and builds
+its own SearchAlgorithms indexes. Queries are broadcast to every shard, each
+shard ranks its own matches and returns its top-k, and the parent merges the
+per-shard lists by score. Mutations go only to the owning shard.
+"""
+import heapq
+import itertools
+import multiprocessing
+import re
+import threading
+import time
+from typing import Dict, List, Optional
+from models import Product
+from search_algorithms import SearchAlgorithms, SearchResult, is_phrase_query, suggestion_key
+from spelling import best_candidate, merge_candidates
+
+TEXT_ENGINES = ("linear", "indexed", "fuzzy", "regex", "phonetic")
+# Engines that rank by relevance themselves and accept a shared scorer
+RANKING_ENGINES = ("fuzzy", "phonetic", "phrase")
+SHARD_ENGINES = TEXT_ENGINES + ("phrase", "price_range")
+
+def _ranked(engine, result, k, scorer=None):
+    """(sort key, pid) pairs for a shard's result, best first, truncated to k."""
+    if engine == "price_range":
+        scored = [((p.price, p.pid), p.pid) for p in result.products]
+    else:
+        # Negated so the smallest key is the most relevant, as heapq.merge expects
+        scored = [((-scorer.score(p.pid), p.pid), p.pid) for p in result.products]
+    return heapq.nsmallest(k, scored) if k is not None else sorted(scored)
+
+def _run(search, engine, query, k):
+    scorer = None
+    if engine == "price_range":
+        min_price, max_price = query
+        result = search.price_range_search(min_price, max_price)
+    else:
+        scorer = search.scorer(query)
+        engine_search = getattr(search, f"{engine}_search")
+        # Engines that rank by relevance already scored their matches; reuse those scores
+        result = engine_search(query, scorer=scorer) if engine in RANKING_ENGINES else engine_search(query)
+    ranked = _ranked(engine, result, k, scorer)
+    highlights = {pid: result.highlights[pid] for _, pid in ranked if pid in result.highlights}
+    return ranked, result.matches_found, highlights
+
+def _shard_main(conn, products):
+    """Worker loop: answer (op, args) messages until told to stop."""
+    search = SearchAlgorithms(products)
+    while True:
+        op, args = conn.recv()
+        try:
+            if op == "search":
+                reply = _run(search, *args)
+            elif op == "batch":
+                engine, queries, k = args
+                reply = [_run(search, engine, q, k) for q in queries]
+            elif op == "suggest":
+                reply = search.get_suggestions(*args)
+            elif op == "spell":
+                words = search.analyzer.query_tokens(args)[1]
+                reply = words, [search.speller.candidates(word) for word in words]
+            elif op == "add":
+                reply = search.add_product(args)
+            elif op == "remove":
+                reply = search.remove_product(args)
+            elif op == "update":
+                pid, changes = args
+                reply = search.update_product(pid, **changes)
+            elif op == "stop":
+                conn.send(("ok", None))
+                break
+            else:
+                raise ValueError(f"Unknown shard operation '{op}'")
+            conn.send(("ok", reply))
+        except Exception as e:
+            conn.send(("error", repr(e)))
+    conn.close()
+
+class ShardedSearch:
+    """SearchAlgorithms-compatible front end over N shard processes.
+
+    Calls are serialized by a lock (each call already keeps every shard busy),
+    so one instance can be shared by the threads of search_server.
+    """
+    def __init__(self, products: List[Product], num_shards: Optional[int] = None):
+        self.num_shards = num_shards or multiprocessing.cpu_count()
+        self.products_by_id = {p.pid: p for p in products}
+        self.version = 0
+        self._lock = threading.Lock()
+        partitions = [[] for _ in range(self.num_shards)]
+        for product in products:
+            partitions[self.shard_for(product.pid)].append(product)
+        self._conns = []
+        self._procs = []
+        for partition in partitions:
+            parent_conn, child_conn = multiprocessing.Pipe()
+            proc = multiprocessing.Process(target=_shard_main, args=(child_conn, partition), daemon=True)
+            proc.start()
+            child_conn.close()
+            self._conns.append(parent_conn)
+            self._procs.append(proc)
+
+    @property
+    def products(self) -> List[Product]:
+        return list(self.products_by_id.values())
+
+    def shard_for(self, pid: int) -> int:
+        return hash(pid) % self.num_shards
+
+    @staticmethod
+    def _reply(conn):
+        return ShardedSearch._raise_errors([conn.recv()])[0]
+
+    @staticmethod
+    def _raise_errors(answers):
+        for status, reply in answers:
+            if status != "ok":
+                raise RuntimeError(f"Shard error: {reply}")
+        return [reply for _, reply in answers]
+
+    def _broadcast(self, op, args):
+        with self._lock:
+            # Send everything first so the shards work in parallel
+            for conn in self._conns:
+                conn.send((op, args))
+            # Drain every pipe before raising, or the next call would read this call's answers
+            return self._raise_errors([conn.recv() for conn in self._conns])
+
+    @staticmethod
+    def _check_engine(engine):
+        if engine not in SHARD_ENGINES:
+            raise ValueError(f"Unknown engine '{engine}'")
+
+    def _send(self, shard, op, args):
+        with self._lock:
+            self._conns[shard].send((op, args))
+            return self._reply(self._conns[shard])
+
+    def _merge(self, shard_replies, k, algorithm_name, start_ns, scatter_ns):
+        merge_start = time.perf_counter_ns()
+        merged = heapq.merge(*(ranked for ranked, _, _ in shard_replies))
+        top = list(merged if k is None else itertools.islice(merged, k))
+        pids = [pid for _, pid in top]
+        matches = [self.products_by_id[pid] for pid in pids if pid in self.products_by_id]
+        kept = set(pids)
+        # Text engines sort on (-score, pid); price keys are not scores
+        scores = {} if algorithm_name == "Price Range Search" else {pid: -key[0] for key, pid in top}
+        end_ns = time.perf_counter_ns()
+        return SearchResult(
+            products=matches,
+            time_taken=(end_ns - start_ns) / 1e9,
+            algorithm_name=algorithm_name,
+            matches_found=sum(found for _, found, _ in shard_replies),
+            stages={"scatter": scatter_ns, "merge": end_ns - merge_start},
+            counters={"shards": self.num_shards},
+            highlights={pid: spans for _, _, highlights in shard_replies
+                        for pid, spans in highlights.items() if pid in kept},
+            scores=scores
+        )
+
+    def search(self, engine: str, query, k: Optional[int] = None) -> SearchResult:
+        """Broadcast one query and merge each shard's top-k by score."""
+        self._check_engine(engine)
+        start_ns = time.perf_counter_ns()
+        replies = self._broadcast("search", (engine, query, k))
+        name = "Price Range Search" if engine == "price_range" else f"{engine.capitalize()} Search"
+        return self._merge(replies, k, name, start_ns, time.perf_counter_ns() - start_ns)
+
+    def linear_search(self, query: str, k: Optional[int] = None) -> SearchResult:
+        return self.search("linear", query, k)
+
+    def indexed_search(self, query: str, k: Optional[int] = None) -> SearchResult:
+        return self.search("indexed", query, k)
+
+    def fuzzy_search(self, query: str, k: Optional[int] = None) -> SearchResult:
+        return self.search("fuzzy", query, k)
+
+    def regex_search(self, query: str, k: Optional[int] = None) -> SearchResult:
+        return self.search("regex", query, k)
+
+    def phonetic_search(self, query: str, k: Optional[int] = None) -> SearchResult:
+        return self.search("phonetic", query, k)
+
+    def phrase_search(self, query: str, k: Optional[int] = None) -> SearchResult:
+        return self.search("phrase", query, k)
+
+    def price_range_search(self, min_price: float, max_price: float, k: Optional[int] = None) -> SearchResult:
+        return self.search("price_range", (min_price, max_price), k)
+
+    def run_all_searches(self, query: str) -> Dict[str, SearchResult]:
+        query = query.strip()
+        price_match = re.match(r'price:(\d+)-(\d+)', query.lower())
+        if price_match:
+            min_price, max_price = map(float, price_match.groups())
+            return {"price_range": self.price_range_search(min_price, max_price)}
+        engines = TEXT_ENGINES + ("phrase",) if is_phrase_query(query) else TEXT_ENGINES
+        results = {engine: self.search(engine, query) for engine in engines}
+        found = {k: v for k, v in results.items() if v.matches_found > 0}
+        if found:
+            return found
+        # Nothing matched on any shard: retry the indexed engine on a spelling-corrected query
+        corrected = self.did_you_mean(query)
+        if corrected:
+            result = self.indexed_search(corrected)
+            result.corrected_query = corrected
+            if result.matches_found > 0:
+                return {"indexed": result}
+        return found
+
+    def did_you_mean(self, query: str) -> Optional[str]:
+        """Spelling correction over the terms of every shard, with term frequencies summed across shards"""
+        replies = self._broadcast("spell", query)
+        words = list(replies[0][0])
+        corrected = []
+        for i, word in enumerate(words):
+            match = best_candidate(merge_candidates(candidates[i] for _, candidates in replies))
+            corrected.append(match[0] if match else word)
+        return " ".join(corrected) if corrected != words else None
+
+    def search_many(self, queries: List[str], engine: str = "indexed",
+                    limit: Optional[int] = None) -> List[SearchResult]:
+        """Ship the whole batch to every shard in one message, then merge per query."""
+        self._check_engine(engine)
+        start_ns = time.perf_counter_ns()
+        if engine == "price_range":
+            bounds = []
+            for query in queries:
+                match = re.match(r'price:(\d+)-(\d+)', query.lower().strip())
+                if not match:
+                    raise ValueError(f"Price range queries must look like 'price:MIN-MAX', got '{query}'")
+                bounds.append(tuple(map(float, match.groups())))
+            shard_queries = bounds
+        else:
+            shard_queries = list(queries)
+        replies = self._broadcast("batch", (engine, shard_queries, limit))
+        scatter_ns = time.perf_counter_ns() - start_ns
+        name = "Price Range Search" if engine == "price_range" else f"{engine.capitalize()} Search"
+        return [self._merge([shard[i] for shard in replies], limit, name, start_ns, scatter_ns)
+                for i in range(len(queries))]
+
+    def get_suggestions(self, query: str, max_suggestions: int = 5) -> List[str]:
+        suggestions = set()
+        for shard_suggestions in self._broadcast("suggest", (query, max_suggestions)):
+            suggestions.update(shard_suggestions)
+        normalized = query.lower().strip()
+        return sorted(suggestions, key=lambda x: suggestion_key(normalized, x))[:max_suggestions]
+
+    def add_product(self, product: Product) -> bool:
+        """Route a new product to the shard that owns its pid."""
+        if product.pid in self.products_by_id:
+            return False
+        added = self._send(self.shard_for(product.pid), "add", product)
+        if added:
+            self.products_by_id[product.pid] = product
+            self.version += 1
+        return added
+
+    def remove_product(self, pid: int) -> bool:
+        removed = self._send(self.shard_for(pid), "remove", pid)
+        if removed:
+            self.products_by_id.pop(pid, None)
+            self.version += 1
+        return removed
+
+    def update_product(self, pid: int, **changes) -> bool:
+        """Send field changes to the owning shard only."""
+        if pid not in self.products_by_id:
+            return False
+        product = self.products_by_id[pid].replace(**changes)
+        updated = self._send(self.shard_for(pid), "update", (pid, changes))
+        if updated:
+            self.products_by_id[pid] = product
+            self.version += 1
+        return updated
+
+    def close(self):
+        for conn in self._conns:
+            try:
+                conn.send(("stop", None))
+                conn.recv()
+            except (EOFError, OSError):
+                pass
+            conn.close()
+        for proc in self._procs:
+            proc.join(timeout=5)
+        self._conns = []
+        self._procs = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
\ No newline at end of file
@@ -0,0 +1,288 @@
+"""Character n-gram TF-IDF index for "more like this" product lookups.
+
+Each product's name, brand, category and description are run through the
+shared Analyzer, cut into padded character trigrams and weighted by
+sublinear TF-IDF with L2 normalization. The matrix is stored column-major
+(CSC-style ``col_ptr``/``row_idx``/``values`` NumPy arrays), so scoring a
+batch of queries is a sparse matrix product done with one ``np.bincount``.
+
+Mutations go to a small delta of re-vectorized rows plus a tombstone mask;
+the base matrix (and its IDF weights) is rebuilt once the delta grows past
+``compact_ratio`` of the catalog.
+"""
+import math
+import threading
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from models import Product
+from search_algorithms import Analyzer
+
+# Names count double so "similar" leans towards what the product is called
+FIELD_WEIGHTS = {"name": 2.0, "brand": 1.0, "category": 1.0, "description": 1.0}
+# Upper bound on query x row cells scored per bincount call
+MAX_BATCH_CELLS = 1 << 22
+
+@lru_cache(maxsize=1 << 16)
+def token_ngrams(token: str, n: int = 3) -> Tuple[str, ...]:
+    """Space-padded character n-grams of one token (" ip", "iph", ..., "ne ")"""
+    padded = f" {token} "
+    return tuple(padded[i:i + n] for i in range(max(1, len(padded) - n + 1)))
+
+def char_ngrams(tokens: Iterable[str], n: int = 3) -> Counter:
+    """Counts of the n-grams of every token; catalog vocabularies are small, so tokens hit the cache"""
+    grams = Counter()
+    for token in tokens:
+        grams.update(token_ngrams(token, n))
+    return grams
+
+def _ranges(starts: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """Concatenated index ranges [start, start + length) without a Python loop"""
+    offsets = np.cumsum(lengths) - lengths
+    return np.arange(lengths.sum()) - np.repeat(offsets, lengths) + np.repeat(starts, lengths)
+
+class SimilarityIndex:
+    """Top-k cosine neighbours for a pid or free text over TF-IDF n-gram vectors.
+
+    Queries are pruned to their ``query_terms`` highest-weighted n-grams to
+    pick candidates (rare n-grams carry the similarity, common ones only cost
+    time), and the best ``rerank`` * k candidates are then scored exactly.
+    """
+    def __init__(self, products: List[Product], analyzer: Optional[Analyzer] = None, n: int = 3,
+                 query_terms: int = 32, rerank: int = 4, compact_ratio: float = 0.2):
+        self.analyzer = analyzer or Analyzer()
+        self.n = n
+        self.query_terms = query_terms
+        self.rerank = rerank
+        self.compact_ratio = compact_ratio
+        self._lock = threading.Lock()
+        self.products: Dict[int, Product] = {p.pid: p for p in products}
+        self._build()
+
+    def _term_counts(self, product: Product) -> Dict[str, float]:
+        counts = Counter()
+        for name, weight in FIELD_WEIGHTS.items():
+            tokens = self.analyzer.tokenize(self.analyzer.normalize(getattr(product, name)))
+            for token in tokens:
+                for gram in token_ngrams(token, self.n):
+                    counts[gram] += weight
+        return counts
+
+    def _build(self):
+        counts = [self._term_counts(p) for p in self.products.values()]
+        self.doc_freq = Counter()
+        for c in counts:
+            self.doc_freq.update(c.keys())
+        self.num_docs = len(counts)
+        self.vocabulary = {gram: i for i, gram in enumerate(self.doc_freq)}
+        self.idf = np.array([self._idf(gram) for gram in self.vocabulary], dtype=np.float32)
+
+        # Row-major (CSR) layout first, weighted and normalized in bulk
+        vocabulary = self.vocabulary
+        lengths = np.fromiter((len(c) for c in counts), dtype=np.int64, count=len(counts))
+        self.row_ptr = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=self.row_ptr[1:])
+        total = int(self.row_ptr[-1])
+        self.col_idx = np.fromiter((vocabulary[g] for c in counts for g in c), dtype=np.int32, count=total)
+        tf = np.fromiter((v for c in counts for v in c.values()), dtype=np.float32, count=total)
+        rows = np.repeat(np.arange(len(counts), dtype=np.int32), lengths)
+        vals = (1.0 + np.log(tf)) * self.idf[self.col_idx]
+        norms = np.sqrt(np.bincount(rows, weights=vals * vals, minlength=len(counts)))
+        vals /= np.where(norms > 0, norms, 1.0)[rows]
+        # Sort columns within each row so rows can be intersected with queries
+        order = np.lexsort((self.col_idx, rows))
+        self.col_idx = self.col_idx[order]
+        self.row_values = vals[order].astype(np.float32)
+
+        # Column-major (CSC) copy: the entries of column j live in [col_ptr[j], col_ptr[j + 1])
+        order = np.argsort(self.col_idx, kind="stable")
+        self.row_idx = rows[order]
+        self.values = self.row_values[order]
+        self.col_ptr = np.zeros(len(self.vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.col_idx, minlength=len(self.vocabulary)), out=self.col_ptr[1:])
+
+        self.row_pids = np.fromiter(self.products, dtype=np.int64, count=len(self.products))
+        self.pid_row = {pid: row for row, pid in enumerate(self.products)}
+        self.alive = np.ones(len(self.row_pids), dtype=bool)
+        # Rows added or changed since the last build, scored exactly
+        self.delta: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+        self._delta_matrix = None
+
+    def _idf(self, gram: str) -> float:
+        return math.log((1 + self.num_docs) / (1 + self.doc_freq[gram])) + 1.0
+
+    def _weigh(self, counts: Dict[str, float], grow: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        """Sorted column ids and L2-normalized sublinear TF-IDF weights.
+
+        Unknown n-grams are dropped unless ``grow`` adds them to the vocabulary.
+        """
+        if grow:
+            new = [gram for gram in counts if gram not in self.vocabulary]
+            for gram in new:
+                self.vocabulary[gram] = len(self.vocabulary)
+            if new:
+                self.idf = np.concatenate([self.idf, np.array([self._idf(g) for g in new], dtype=np.float32)])
+        known = [(self.vocabulary[g], c) for g, c in counts.items() if g in self.vocabulary]
+        if not known:
+            return np.empty(0, np.int32), np.empty(0, np.float32)
+        known.sort()
+        cols = np.array([col for col, _ in known], dtype=np.int32)
+        tf = np.array([count for _, count in known], dtype=np.float32)
+        vals = (1.0 + np.log(tf)) * self.idf[cols]
+        norm = np.linalg.norm(vals)
+        return cols, (vals / norm if norm else vals).astype(np.float32)
+
+    def vectorize_text(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        tokens = self.analyzer.tokenize(self.analyzer.normalize(text))
+        return self._weigh(char_ngrams(tokens, self.n))
+
+    def _vector(self, pid: int) -> Tuple[np.ndarray, np.ndarray]:
+        if pid in self.delta:
+            return self.delta[pid]
+        row = self.pid_row[pid]
+        start, end = self.row_ptr[row], self.row_ptr[row + 1]
+        return self.col_idx[start:end], self.row_values[start:end]
+
+    def _prune(self, cols, vals):
+        if len(cols) > self.query_terms:
+            top = np.argpartition(-vals, self.query_terms)[:self.query_terms]
+            cols, vals = cols[top], vals[top]
+        # Columns added after the last build have no base entries
+        base = cols < len(self.col_ptr) - 1
+        return cols[base], vals[base]
+
+    def _base_scores(self, queries: List[Tuple[np.ndarray, np.ndarray]]) -> np.ndarray:
+        """Approximate base-matrix scores, shape (len(queries), rows): Q @ X.T in one bincount"""
+        num_rows = len(self.row_pids)
+        scores = np.zeros((len(queries), num_rows), dtype=np.float64)
+        chunk = max(1, MAX_BATCH_CELLS // max(num_rows, 1))
+        for first in range(0, len(queries), chunk):
+            batch = [self._prune(*q) for q in queries[first:first + chunk]]
+            cols = np.concatenate([c for c, _ in batch])
+            weights = np.concatenate([v for _, v in batch])
+            query_of = np.repeat(np.arange(len(batch)), [len(c) for c, _ in batch])
+            starts = self.col_ptr[cols]
+            lengths = self.col_ptr[cols + 1] - starts
+            # Gather every posting of every query column
+            entries = _ranges(starts, lengths)
+            cells = np.repeat(query_of, lengths) * num_rows + self.row_idx[entries]
+            flat = np.bincount(cells, weights=self.values[entries] * np.repeat(weights, lengths),
+                               minlength=len(batch) * num_rows)
+            scores[first:first + len(batch)] = flat.reshape(len(batch), num_rows)
+        scores[:, ~self.alive] = 0.0
+        return scores
+
+    def _delta_rows(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Delta vectors as one sparse matrix: (pids, row of each entry, columns, values)"""
+        if self._delta_matrix is None:
+            vectors = list(self.delta.values())
+            pids = np.fromiter(self.delta, dtype=np.int64, count=len(vectors))
+            rows = np.repeat(np.arange(len(vectors)), [len(cols) for cols, _ in vectors])
+            if vectors:
+                cols = np.concatenate([cols for cols, _ in vectors])
+                vals = np.concatenate([vals for _, vals in vectors])
+            else:
+                cols, vals = np.empty(0, np.int32), np.empty(0, np.float32)
+            self._delta_matrix = (pids, rows, cols, vals)
+        return self._delta_matrix
+
+    def _top(self, query, scores: np.ndarray, k: int, exclude: Optional[int]) -> List[Tuple[int, float]]:
+        if exclude is not None and exclude in self.pid_row:
+            scores[self.pid_row[exclude]] = 0.0
+        wanted = min(k * self.rerank, int(np.count_nonzero(scores)))
+        rows = np.argpartition(-scores, wanted - 1)[:wanted] if wanted else np.empty(0, np.int64)
+        rows = rows[scores[rows] > 0]
+        # Exact cosines of the base candidates and every delta row, each set as one sparse product
+        dense = np.zeros(len(self.vocabulary), dtype=np.float64)
+        dense[query[0]] = query[1]
+        starts = self.row_ptr[rows]
+        lengths = self.row_ptr[rows + 1] - starts
+        entries = _ranges(starts, lengths)
+        base = np.bincount(np.repeat(np.arange(len(rows)), lengths),
+                           weights=dense[self.col_idx[entries]] * self.row_values[entries], minlength=len(rows))
+        delta_pids, delta_rows, delta_cols, delta_vals = self._delta_rows()
+        delta = np.bincount(delta_rows, weights=dense[delta_cols] * delta_vals, minlength=len(delta_pids))
+        exact = list(zip(self.row_pids[rows].tolist(), base.tolist()))
+        exact.extend((pid, score) for pid, score in zip(delta_pids.tolist(), delta.tolist()) if pid != exclude)
+        exact.sort(key=lambda item: (-item[1], item[0]))
+        return [(pid, score) for pid, score in exact[:k] if score > 0]
+
+    def similar_many(self, pids: List[int], k: int = 10) -> List[List[Tuple[int, float]]]:
+        """(pid, cosine) neighbours for several products, scored as one batch"""
+        with self._lock:
+            queries = [self._vector(pid) if pid in self.products else (np.empty(0, np.int32), np.empty(0, np.float32))
+                       for pid in pids]
+            scores = self._base_scores(queries)
+            return [self._top(q, s, k, pid) for q, s, pid in zip(queries, scores, pids)]
+
+    def similar_to_pid(self, pid: int, k: int = 10) -> List[Tuple[int, float]]:
+        return self.similar_many([pid], k)[0]
+
+    def similar_to_text(self, text: str, k: int = 10) -> List[Tuple[int, float]]:
+        with self._lock:
+            query = self.vectorize_text(text)
+            return self._top(query, self._base_scores([query])[0], k, None)
+
+    def _set_row(self, product: Product):
+        counts = self._term_counts(product)
+        old = self.products.get(product.pid)
+        if old is not None:
+            self.doc_freq.subtract(self._term_counts(old).keys())
+        else:
+            self.num_docs += 1
+        self.doc_freq.update(counts.keys())
+        self.products[product.pid] = product
+        self.delta[product.pid] = self._weigh(counts, grow=True)
+        self._delta_matrix = None
+        if product.pid in self.pid_row:
+            self.alive[self.pid_row[product.pid]] = False
+
+    def add_product(self, product: Product) -> bool:
+        with self._lock:
+            if product.pid in self.products:
+                return False
+            self._set_row(product)
+            self._maybe_compact()
+            return True
+
+    def update_product(self, product: Product) -> bool:
+        with self._lock:
+            old = self.products.get(product.pid)
+            if old is None:
+                return False
+            if all(getattr(old, name) == getattr(product, name) for name in FIELD_WEIGHTS):
+                # Price, stock and rating changes leave the vector as it is
+                self.products[product.pid] = product
+                return True
+            self._set_row(product)
+            self._maybe_compact()
+            return True
+
+    def remove_product(self, pid: int) -> bool:
+        with self._lock:
+            product = self.products.pop(pid, None)
+            if product is None:
+                return False
+            self.doc_freq.subtract(self._term_counts(product).keys())
+            self.num_docs -= 1
+            if self.delta.pop(pid, None) is not None:
+                self._delta_matrix = None
+            if pid in self.pid_row:
+                self.alive[self.pid_row[pid]] = False
+            self._maybe_compact()
+            return True
+
+    def _maybe_compact(self):
+        stale = len(self.delta) + int(np.count_nonzero(~self.alive))
+        if stale > self.compact_ratio * max(len(self.products), 1):
+            self._build()
+
+    def on_catalog_change(self, event: str, product: Product):
+        """product_data listener keeping the index in step with catalog mutations"""
+        if event == "add":
+            self.add_product(product)
+        elif event == "update":
+            self.update_product(product)
+        elif event == "remove":
+            self.remove_product(product.pid)
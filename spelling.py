@@ -0,0 +1,141 @@
+"""Symmetric-delete ("SymSpell") spelling correction over indexed terms.
+
+Every vocabulary term is stored under each string reachable by deleting up
+to ``max_distance`` characters from its prefix. A misspelled word generates
+its own deletes, and any shared delete is a candidate within that edit
+distance. Lookups therefore touch a handful of dict keys, not the whole
+vocabulary, and candidates are confirmed with a real edit distance.
+"""
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Optimal string alignment distance (adjacent swaps cost 1), or limit + 1 once exceeded.
+
+    Only the diagonal band of width ``limit`` is filled; cells outside it
+    cannot lead to a distance within the limit.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    if a == b:
+        return 0
+    over = limit + 1
+    previous_previous = None
+    previous = [j if j <= limit else over for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        current = [over] * (len(b) + 1)
+        if i <= limit:
+            current[0] = i
+        row_min = current[0]
+        for j in range(max(1, i - limit), min(len(b), i + limit) + 1):
+            value = previous[j - 1] if a[i - 1] == b[j - 1] else previous[j - 1] + 1
+            if previous[j] + 1 < value:
+                value = previous[j] + 1
+            if current[j - 1] + 1 < value:
+                value = current[j - 1] + 1
+            if (i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]
+                    and previous_previous[j - 2] + 1 < value):
+                value = previous_previous[j - 2] + 1
+            current[j] = value
+            if value < row_min:
+                row_min = value
+        if row_min > limit:
+            return over
+        previous_previous, previous = previous, current
+    return min(previous[-1], over)
+
+class SymSpell:
+    """Term-level corrector; ``frequency(term)`` breaks ties between equally close candidates.
+
+    Terms are only ever added: a term whose frequency drops to zero stays in
+    the delete table but is never suggested.
+    """
+    def __init__(self, frequency: Callable[[str], int], max_distance: int = 2, prefix_length: int = 7):
+        self.frequency = frequency
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self.terms: Set[str] = set()
+        self.deletes: Dict[str, Set[str]] = defaultdict(set)
+
+    def _deletes(self, word: str) -> Set[str]:
+        word = word[:self.prefix_length]
+        found = {word}
+        frontier = [word]
+        for _ in range(self.max_distance):
+            next_frontier = []
+            for item in frontier:
+                for i in range(len(item)):
+                    shorter = item[:i] + item[i + 1:]
+                    if shorter not in found:
+                        found.add(shorter)
+                        next_frontier.append(shorter)
+            frontier = next_frontier
+        return found
+
+    def add(self, term: str):
+        # Single characters and numbers are not worth correcting towards
+        if term in self.terms or len(term) < 2 or term.isdigit():
+            return
+        self.terms.add(term)
+        for delete in self._deletes(term):
+            self.deletes[delete].add(term)
+
+    def update(self, terms: Iterable[str]):
+        for term in terms:
+            self.add(term)
+
+    def candidates(self, word: str) -> Dict[str, Tuple[int, int]]:
+        """Known terms close enough to word, as term -> (distance, frequency).
+
+        Just the word itself when it is a known term. Numbers and single
+        characters are never corrected and get no candidates.
+        """
+        if word.isdigit() or len(word) < 2:
+            return {}
+        if word in self.terms:
+            frequency = self.frequency(word)
+            if frequency > 0:
+                return {word: (0, frequency)}
+        # Short words get one edit at most, or every three-letter typo matches something
+        limit = min(self.max_distance, max(1, (len(word) - 1) // 2))
+        candidates = set()
+        for delete in self._deletes(word):
+            candidates.update(self.deletes.get(delete, ()))
+        found = {}
+        for term in candidates:
+            distance = edit_distance(word, term, limit)
+            if distance > limit:
+                continue
+            frequency = self.frequency(term)
+            if frequency > 0:
+                found[term] = (distance, frequency)
+        return found
+
+    def lookup(self, word: str) -> Optional[Tuple[str, int]]:
+        """Closest known term as (term, distance), preferring smaller distance then higher frequency"""
+        return best_candidate(self.candidates(word))
+
+    def correct(self, words: List[str]) -> List[str]:
+        """Correct each word independently; words with no close term are kept as typed"""
+        corrected = []
+        for word in words:
+            match = self.lookup(word)
+            corrected.append(match[0] if match else word)
+        return corrected
+
+def best_candidate(candidates: Dict[str, Tuple[int, int]]) -> Optional[Tuple[str, int]]:
+    """(term, distance) of the closest candidate, the most frequent one among equally close terms"""
+    if not candidates:
+        return None
+    term, (distance, _) = min(candidates.items(), key=lambda item: (item[1][0], -item[1][1], item[0]))
+    return term, distance
+
+def merge_candidates(per_index: Iterable[Dict[str, Tuple[int, int]]]) -> Dict[str, Tuple[int, int]]:
+    """Candidates from several partial indexes (e.g. shards), with each term's frequencies summed"""
+    merged: Dict[str, Tuple[int, int]] = {}
+    for candidates in per_index:
+        for term, (distance, frequency) in candidates.items():
+            if term in merged:
+                frequency += merged[term][1]
+            merged[term] = (distance, frequency)
+    return merged
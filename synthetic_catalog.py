@@ -0,0 +1,110 @@
+import random
+import string
+from models import Product
+
+# Brands per category, most popular first (popularity follows a Zipf-like skew)
+CATEGORY_BRANDS = {
+    "Electronics": ["Samsung", "Apple", "Xiaomi", "Sony", "JBL", "Dell", "Canon", "Anker", "Realme", "Oppo"],
+    "Laptops": ["Dell", "HP", "Lenovo", "Apple", "Asus", "Acer", "MSI", "Microsoft", "Huawei", "Razer"],
+    "Clothing": ["Nike", "Adidas", "Levi's", "Zara", "H&M", "Uniqlo", "Puma", "Allen Solly", "Gap", "Reebok"],
+    "Grocery": ["Nestle", "Tata", "Amul", "Kissan", "Tropicana", "Aashirvaad", "Fortune", "MTR", "Britannia", "Brook Bond"],
+    "Books": ["Penguin", "HarperCollins", "Eric Matthes", "O'Reilly", "Pearson", "Scholastic", "Hachette", "Macmillan", "Wiley", "Bloomsbury"],
+    "Home": ["Philips", "IKEA", "Prestige", "Pigeon", "Bajaj", "Havells", "Milton", "Cello", "Borosil", "Usha"],
+    "Sports": ["Yonex", "Cosco", "Nivea", "Decathlon", "Spalding", "Wilson", "Head", "Kookaburra", "SG", "Vector X"],
+}
+# Relative share of the catalog taken by each category
+CATEGORY_WEIGHTS = {"Electronics": 25, "Clothing": 22, "Grocery": 18, "Laptops": 12, "Home": 10, "Books": 8, "Sports": 5}
+
+CATEGORY_NOUNS = {
+    "Electronics": ["phone", "headphones", "earbuds", "speaker", "monitor", "camera", "tablet", "charger", "power bank", "smartwatch"],
+    "Laptops": ["laptop", "ultrabook", "notebook", "chromebook", "gaming laptop", "2-in-1 laptop"],
+    "Clothing": ["jeans", "t-shirt", "hoodie", "jacket", "running shoes", "track pants", "shirt", "trousers", "sneakers"],
+    "Grocery": ["milk pack", "salt", "butter", "jam", "orange juice", "atta", "sunflower oil", "masala", "tea", "biscuits"],
+    "Books": ["novel", "guide", "handbook", "crash course", "cookbook", "biography", "workbook"],
+    "Home": ["mixer grinder", "kettle", "iron", "water bottle", "pressure cooker", "ceiling fan", "lamp"],
+    "Sports": ["racket", "football", "cricket bat", "yoga mat", "dumbbells", "shuttlecock", "helmet"],
+}
+ADJECTIVES = ["premium", "budget", "lightweight", "durable", "classic", "wireless", "portable", "compact",
+              "fast charging", "waterproof", "slim fit", "organic", "bestselling", "ergonomic", "professional"]
+MODEL_WORDS = ["Pro", "Max", "Ultra", "Lite", "Plus", "Air", "Mini", "Neo", "Prime", "X", "S", "Note"]
+PRICE_RANGES = {
+    "Electronics": (1500, 450000), "Laptops": (60000, 500000), "Clothing": (800, 25000),
+    "Grocery": (30, 1500), "Books": (400, 4000), "Home": (500, 30000), "Sports": (300, 40000),
+}
+
+def _zipf_weights(n, s=1.1):
+    return [1 / (rank ** s) for rank in range(1, n + 1)]
+
+def add_typo(word, rng):
+    """Apply one random edit (drop, swap, replace or insert) to a word."""
+    if len(word) < 3:
+        return word
+    i = rng.randrange(1, len(word) - 1)
+    edit = rng.randrange(4)
+    if edit == 0:
+        return word[:i] + word[i + 1:]
+    if edit == 1:
+        return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    if edit == 2:
+        return word[:i] + rng.choice(string.ascii_lowercase) + word[i + 1:]
+    return word[:i] + rng.choice(string.ascii_lowercase) + word[i:]
+
+def generate_catalog(size, seed=42, typo_rate=0.02):
+    """Generate a reproducible list of `size` products with skewed brands and categories."""
+    rng = random.Random(seed)
+    categories = list(CATEGORY_WEIGHTS)
+    category_weights = [CATEGORY_WEIGHTS[c] for c in categories]
+    brand_weights = {c: _zipf_weights(len(CATEGORY_BRANDS[c])) for c in categories}
+
+    catalog = []
+    for pid in range(1, size + 1):
+        category = rng.choices(categories, category_weights)[0]
+        brand = rng.choices(CATEGORY_BRANDS[category], brand_weights[category])[0]
+        noun = rng.choice(CATEGORY_NOUNS[category])
+        name = f"{brand} {noun.title()} {rng.choice(MODEL_WORDS)} {rng.randint(1, 99)}"
+        description = f"{rng.choice(ADJECTIVES).capitalize()} {rng.choice(ADJECTIVES)} {noun} by {brand}."
+        if rng.random() < typo_rate:
+            # Merchant feeds are not always spelled correctly
+            words = description.split()
+            j = rng.randrange(len(words))
+            words[j] = add_typo(words[j], rng)
+            description = " ".join(words)
+        low, high = PRICE_RANGES[category]
+        price = int(round(low * (high / low) ** rng.random()))
+        availability = "In Stock" if rng.random() < 0.85 else "Out of Stock"
+        rating = rng.choices([1, 2, 3, 4, 5], [2, 5, 18, 40, 35])[0]
+        catalog.append(Product(pid, name, brand, price, availability, description, category, rating))
+    return catalog
+
+def generate_queries(catalog, count, seed=42):
+    """Build a mixed query workload drawn from the catalog.
+
+    Returns a list of (kind, query) pairs where kind is one of "name", "brand",
+    "category", "word", "typo", "prefix", "regex" or "price".
+    """
+    rng = random.Random(seed)
+    kinds = ["name", "brand", "category", "word", "typo", "prefix", "regex", "price"]
+    weights = [20, 20, 8, 15, 15, 12, 5, 5]
+    queries = []
+    for _ in range(count):
+        kind = rng.choices(kinds, weights)[0]
+        product = rng.choice(catalog)
+        if kind == "name":
+            query = " ".join(product.name.split()[:2])
+        elif kind == "brand":
+            query = product.brand
+        elif kind == "category":
+            query = product.category
+        elif kind == "word":
+            query = rng.choice(product.description.rstrip(".").split())
+        elif kind == "typo":
+            query = add_typo(product.name.split()[0].lower(), rng)
+        elif kind == "prefix":
+            query = product.name[:rng.randint(2, 5)].lower()
+        elif kind == "regex":
+            query = f"{product.brand.split()[0]}.*{product.name.split()[-1]}"
+        else:
+            low = rng.randint(0, int(product.price))
+            query = f"price:{low}-{int(product.price) + rng.randint(0, 5000)}"
+        queries.append((kind, query))
+    return queries
\ No newline at end of file
@@ -0,0 +1,40 @@
+import pytest
+pd = pytest.importorskip("pandas")
+import numpy as np
+import product_data
+from catalog_frame import CatalogFrame, build_frame
+from models import Product
+
+@pytest.fixture
+def frame(monkeypatch):
+    product_data.load_catalog()
+    # Put the shared catalog and its listeners back afterwards
+    monkeypatch.setattr(product_data, "_catalog", product_data.get_catalog())
+    monkeypatch.setattr(product_data, "catalog_listeners", [])
+    return CatalogFrame()
+
+def test_frame_is_patched_and_versioned(frame):
+    before = frame.get()
+    version = frame.version
+    product_data.update_product_obj(1, price=5, brand="Pear")
+    product_data.add_product_obj(Product(1000, "Zebra Rug", "Ikea", 9999, "In Stock", "Rug.", "Home", 4))
+    product_data.remove_product_obj(2)
+    df = frame.get()
+    catalog = product_data.get_catalog()
+    assert frame.version == catalog.version == version + 3
+    assert df.loc[1, "Price"] == 5 and df.loc[1, "Brand"] == "Pear" and 2 not in df.index
+    expected = build_frame(catalog.products)
+    pd.testing.assert_frame_equal(df.sort_index(), expected.sort_index(), check_categorical=False)
+    assert set(df["Brand"].cat.categories) == set(expected["Brand"])
+    # Frames handed out earlier are left as they were
+    assert before.loc[1, "Price"] == 419999 and 2 in before.index and 1000 not in before.index
+    # Columns no edit touched are shared rather than copied
+    product_data.update_product_obj(3, rating=1)
+    assert np.shares_memory(frame.get()["Description"].values, df["Description"].values)
+    assert df.loc[3, "Rating"] == 5 and frame.get().loc[3, "Rating"] == 1
+    assert frame.get() is frame.get()
+
+def test_missed_events_rebuild(frame):
+    product_data.catalog_listeners.clear()
+    product_data.update_product_obj(1, price=5)
+    assert frame.get().loc[1, "Price"] == 5
@@ -0,0 +1,19 @@
+from dedup import NearDuplicateIndex
+from synthetic_catalog import generate_catalog
+
+def test_price_and_stock_updates_skip_resigning(monkeypatch):
+    catalog = generate_catalog(50)
+    index = NearDuplicateIndex()
+    index.add_many(catalog, workers=1)
+    signed = []
+    signature = index.signature
+    monkeypatch.setattr(index, "signature", lambda p: signed.append(p.pid) or signature(p))
+    product = catalog[0]
+    index.on_catalog_change("update", product.replace(price=product.price + 1, availability="Out of Stock"))
+    assert signed == []
+    renamed = product.replace(name=product.name + " Deluxe")
+    index.on_catalog_change("update", renamed)
+    assert signed == [product.pid]
+    assert (index.signatures[product.pid] == signature(renamed)).all()
+    index.on_catalog_change("remove", renamed)
+    assert product.pid not in index.texts
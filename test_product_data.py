@@ -0,0 +1,72 @@
+import pytest
+import random
+from operator import attrgetter
+import product_data
+from models import Product
+from product_data import SortedChunks
+
+def test_sorted_chunks_match_a_sorted_list(monkeypatch):
+    monkeypatch.setattr(product_data, "CHUNK_SIZE", 4)
+    rng = random.Random(7)
+    chunks, expected = SortedChunks(lambda x: x), []
+    for _ in range(500):
+        k = rng.randrange(200)
+        if k in expected and rng.random() < 0.4:
+            chunks = chunks.remove(k)
+            expected.remove(k)
+        elif k not in expected:
+            chunks = chunks.insert(k)
+            expected.append(k)
+            expected.sort()
+        assert list(chunks) == expected
+    assert len(chunks) == len(expected)
+    assert [chunks[i] for i in range(-len(expected), len(expected))] == expected * 2
+    assert chunks[3:17:2] == tuple(expected[3:17:2])
+    assert list(chunks.irange(50, 120)) == [k for k in expected if 50 <= k <= 120]
+    assert all(chunks.get(k) == k for k in expected) and chunks.get(-1) is None
+
+def test_snapshot_writes_keep_every_index_consistent(monkeypatch):
+    monkeypatch.setattr(product_data, "CHUNK_SIZE", 4)
+    product_data.load_catalog()
+    # Put the shared catalog back afterwards
+    start = product_data.get_catalog()
+    monkeypatch.setattr(product_data, "_catalog", start)
+    pid = max(start.products_by_id) + 1
+    product_data.add_product_obj(Product(pid, "Zebra Rug", "Ikea", 9999, "In Stock", "Striped rug.", "Home", 4))
+    product_data.update_product_obj(pid, brand="Habitat", price=5)
+    product_data.update_product_obj(1, category="Phones", price=1)
+    product_data.update_product_obj(3, availability="Out of Stock")
+    product_data.remove_product_obj(2)
+    catalog = product_data.get_catalog()
+    products = sorted(catalog.products_by_id.values(), key=attrgetter("pid"))
+    assert list(catalog.products) == products
+    assert list(catalog.product_names) == [p.name for p in products]
+    assert list(catalog.products_by_price) == sorted((p.price, p.pid, p) for p in products)
+    assert 2 not in catalog.products_by_id and catalog.products_by_id[pid].brand == "Habitat"
+    for index, field in ((catalog.products_by_brand, "brand"), (catalog.products_by_category, "category")):
+        assert {key: list(bucket) for key, bucket in index.items()} == {
+            value: [p for p in products if getattr(p, field).lower() == value]
+            for value in {getattr(p, field).lower() for p in products}}
+    assert [p.pid for p in product_data.search_by_price_range(0, 5)] == [1, pid]
+    # The snapshot taken before the writes is unchanged
+    assert len(start.products) == 50 and start.products_by_id[1].price == 419999
+
+def test_unknown_duplicate_action_is_rejected(monkeypatch):
+    product_data.load_catalog()
+    monkeypatch.setattr(product_data, "_catalog", product_data.get_catalog())
+    version = product_data.get_catalog().version
+    with pytest.raises(ValueError):
+        product_data.add_product_obj(Product(10_000, "Zebra Rug", "Ikea", 9999, "In Stock", "Rug.", "Home"),
+                                     on_duplicate="merg")
+    assert product_data.get_catalog().version == version
+
+def test_a_failing_listener_does_not_stop_the_others(monkeypatch, caplog):
+    product_data.load_catalog()
+    monkeypatch.setattr(product_data, "_catalog", product_data.get_catalog())
+    seen = []
+    def broken(event, product):
+        raise RuntimeError("boom")
+    monkeypatch.setattr(product_data, "catalog_listeners", [broken, lambda event, product: seen.append(event)])
+    assert product_data.update_product_obj(1, price=5)
+    assert seen == ["update"] and product_data.get_catalog().products_by_id[1].price == 5
+    assert "boom" in caplog.text
@@ -0,0 +1,20 @@
+from recommendations import CooccurrenceRecommender
+
+def test_checkout_keeps_counts_and_clear_drops_them():
+    recommender = CooccurrenceRecommender({("ann", "cart"): [1, 2], ("bob", "cart"): [1, 3]})
+    recommender.on_basket_change("checkout", ("ann", "cart"), None)
+    assert recommender.counts[1][2] == 1 and dict(recommender.similar(1))[2] > 0
+    # The next cart starts empty and adds to, rather than replaces, the order's counts
+    recommender.on_basket_change("add", ("ann", "cart"), 1)
+    recommender.on_basket_change("add", ("ann", "cart"), 2)
+    assert recommender.counts[1][2] == 2
+    recommender.on_basket_change("clear", ("ann", "cart"), None)
+    assert recommender.counts[1][2] == 1
+    recommender.on_basket_change("clear", ("bob", "cart"), None)
+    assert 3 not in recommender.counts[1]
+
+def test_past_orders_seed_counts():
+    users = {"ann": {"cart": [], "wishlist": [], "orders": [[1, 2], [1, 2, 3]]}}
+    recommender = CooccurrenceRecommender.from_users(users)
+    assert recommender.counts[1][2] == 2 and recommender.frequency[1] == 2
+    assert not recommender.baskets
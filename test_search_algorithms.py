@@ -0,0 +1,91 @@
+import pytest
+from models import Product
+from search_algorithms import SearchAlgorithms
+from synthetic_catalog import generate_catalog, generate_queries
+
+def make_search():
+    return SearchAlgorithms([
+        Product(1, "Apple iPhone 14 Pro", "Apple", 419999, "In Stock", "Latest iPhone.", "Electronics", 5),
+        Product(2, "Dell 27-inch Monitor", "Dell", 44000, "In Stock", "Full HD monitor.", "Electronics", 4),
+    ])
+
+def test_query_sees_terms_added_after_it_was_first_run():
+    search = make_search()
+    assert search.indexed_search("zebra").matches_found == 0
+    assert search.phrase_search('"zebra rug"').matches_found == 0
+    assert search.search_many(["zebra"])[0].matches_found == 0
+
+    search.add_product(Product(999, "Zebra Rug", "Ikea", 9999, "In Stock", "Striped rug.", "Home", 4))
+
+    assert [p.pid for p in search.indexed_search("zebra").products] == [999]
+    assert [p.pid for p in search.phrase_search('"zebra rug"').products] == [999]
+    assert [p.pid for p in search.search_many(["zebra"])[0].products] == [999]
+    assert [p.pid for p in search.linear_search("zebra").products] == [999]
+
+def test_invalid_update_leaves_indexes_untouched():
+    search = make_search()
+    version = search.version
+    for changes in ({"price": "abc"}, {"rating": None}, {"name": 42}, {"price": True}):
+        with pytest.raises(ValueError):
+            search.update_product(1, **changes)
+    assert search.version == version
+    assert search.products_by_id[1].price == 419999
+    assert [pid for _, pid in search.price_index] == [2, 1]
+    assert [p.pid for p in search.price_range_search(0, 500000).products] == [2, 1]
+
+def test_phonetic_search_ignores_model_numbers_and_one_letter_keys():
+    search = make_search()
+    search.add_product(Product(3, "Samsung Galaxy Tab S8", "Samsung", 119999, "In Stock", "Tablet.", "Electronics", 4))
+    assert search.phonetic_search("zzzz").matches_found == 0
+    assert search.phonetic_search("x1").matches_found == 0
+    assert [p.pid for p in search.phonetic_search("Samsunk").products] == [3]
+
+def test_near_operator_matches_in_any_case():
+    search = make_search()
+    assert [p.pid for p in search.phrase_search("apple NEAR/3 pro").products] == [1]
+    assert [p.pid for p in search.phrase_search("apple near/3 pro").products] == [1]
+    assert search.phrase_search("apple near/2 pro").matches_found == 0
+
+def test_search_many_matches_a_per_query_loop():
+    catalog = generate_catalog(400)
+    search = SearchAlgorithms(catalog)
+    queries = [query for kind, query in generate_queries(catalog, 60) if kind != "price"]
+    queries += queries[:5]
+    try:
+        for engine, workers in (("indexed", None), ("regex", None), ("fuzzy", 2), ("linear", 2)):
+            expected = [[p.pid for p in getattr(search, f"{engine}_search")(q).products] for q in queries]
+            results = search.search_many(queries, engine, workers=workers)
+            assert [[p.pid for p in r.products] for r in results] == expected, engine
+        # The pool is kept for the next batch, and replaced once the catalog changes
+        pool = search._batch_pool
+        search.search_many(queries[:3], "fuzzy", workers=2)
+        assert search._batch_pool is pool
+        search.add_product(Product(9999, "Zebra Rug", "Ikea", 9999, "In Stock", "Striped rug.", "Home", 4))
+        assert [p.pid for p in search.search_many(["zebra", "striped"], "fuzzy", workers=2)[0].products] == [9999]
+        assert search._batch_pool is not pool
+        assert [p.pid for p in search.search_many(["zebra rug"])[0].products] == [9999]
+    finally:
+        search.close()
+
+def test_phonetic_search_treats_possessives_like_the_bare_word():
+    search = make_search()
+    search.add_product(Product(3, "Levi's 501 Jeans", "Levi's", 7999, "In Stock", "Jeans.", "Clothing", 4))
+    search.add_product(Product(4, "Levis Trucker Jacket", "Levis", 8999, "In Stock", "Jacket.", "Clothing", 5))
+    for query in ("Levis", "levi's", "Levi", "Leevis"):
+        assert {p.pid for p in search.phonetic_search(query).products} == {3, 4}, query
+    assert [p.pid for p in search.phonetic_search("Levis jeans").products] == [3]
+
+def test_cached_facet_counts_follow_catalog_changes():
+    search = make_search()
+    query = "price:0-500000"
+    assert search.run_all_searches(query, facets=True)["price_range"].facets["brand"] == {"apple": 1, "dell": 1}
+
+    search.update_product(2, brand="Apple", availability="Out of Stock")
+    facets = search.run_all_searches(query, facets=True)["price_range"].facets
+    assert facets["brand"] == {"apple": 2}
+    assert facets["availability"] == {"in stock": 1, "out of stock": 1}
+
+    search.add_product(Product(3, "Sony Headphones", "Sony", 29990, "In Stock", "Noise cancelling.", "Audio", 4))
+    facets = search.run_all_searches(query, facets=True)["price_range"].facets
+    assert facets["brand"] == {"apple": 2, "sony": 1}
+    assert facets["category"] == {"electronics": 2, "audio": 1}
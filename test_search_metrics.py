@@ -0,0 +1,46 @@
+import re
+from models import Product
+from search_algorithms import SearchAlgorithms
+from search_metrics import MetricsRegistry, PrometheusTextExporter
+
+SAMPLE = re.compile(r'^([a-z_]+)\{((?:[a-z_]+="[^"\\]*",?)+)\} (\S+)$')
+
+def test_prometheus_export_is_well_formed(tmp_path):
+    path = tmp_path / "search.prom"
+    registry = MetricsRegistry()
+    search = SearchAlgorithms([
+        Product(1, "Apple iPhone 14 Pro", "Apple", 419999, "In Stock", "Latest iPhone.", "Electronics", 5),
+        Product(2, "Dell 27-inch Monitor", "Dell", 44000, "In Stock", "Full HD monitor.", "Electronics", 4),
+    ], metrics=registry)
+    for query in ("iphone", "monitor", "zebra", "price:0-50000"):
+        search.run_all_searches(query)
+    PrometheusTextExporter(str(path)).write(registry)
+
+    typed, buckets, counts = {}, {}, {}
+    for line in path.read_text().splitlines():
+        if line.startswith("# TYPE "):
+            _, _, name, kind = line.split(" ")
+            assert name not in typed
+            typed[name] = kind
+            continue
+        match = SAMPLE.match(line)
+        assert match, line
+        name, value = match.group(1), float(match.group(3))
+        labels = dict(re.findall(r'([a-z_]+)="([^"]*)"', match.group(2)))
+        family = re.sub(r"_(bucket|sum|count)$", "", name) if name.startswith("search_latency_ms") else name
+        # Every sample follows its family's TYPE line
+        assert family in typed, line
+        assert value >= 0
+        if name == "search_latency_ms_bucket":
+            buckets.setdefault(labels["engine"], []).append((float(labels["le"]), value))
+        elif name == "search_latency_ms_count":
+            counts[labels["engine"]] = value
+
+    assert typed == {"search_latency_ms": "histogram", "search_stage_seconds_total": "counter",
+                     "search_work_total": "counter"}
+    assert buckets.keys() == counts.keys() and "price_range_search" in counts
+    for engine, series in buckets.items():
+        bounds, cumulative = zip(*series)
+        assert list(bounds) == sorted(bounds) and bounds[-1] == float("inf")
+        assert list(cumulative) == sorted(cumulative)
+        assert cumulative[-1] == counts[engine] > 0
@@ -0,0 +1,33 @@
+import threading
+from test_search_algorithms import make_search
+from models import Product
+from search_runtime import SharedSearch
+
+def test_searches_run_concurrently():
+    shared = SharedSearch()
+    engine = make_search()
+    shared.attach(engine)
+    both_inside = threading.Barrier(2, timeout=5)
+    search = engine.indexed_search
+    def waiting_search(query):
+        # Only returns once the other thread's search is running too
+        both_inside.wait()
+        return search(query)
+    engine.indexed_search = waiting_search
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(shared.indexed_search("apple").matches_found))
+               for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [1, 1]
+
+def test_catalog_changes_reach_the_engine():
+    shared = SharedSearch()
+    shared.on_catalog_change("add", Product(3, "Zebra Rug", "Ikea", 9999, "In Stock", "Striped rug.", "Home", 4))
+    shared.attach(make_search())
+    shared.on_catalog_change("update", Product(3, "Zebra Rug", "Ikea", 5, "In Stock", "Striped rug.", "Home", 4))
+    assert [p.price for p in shared.indexed_search("zebra").products] == [5]
+    shared.remove_product(3)
+    assert shared.indexed_search("zebra").matches_found == 0
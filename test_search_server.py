@@ -0,0 +1,46 @@
+import asyncio
+import json
+from test_search_algorithms import make_search
+from search_server import SearchService
+
+def request(service, method, target, body=None):
+    """Send one HTTP request through handle_connection and return (status, payload)"""
+    async def run():
+        server = await asyncio.start_server(service.handle_connection, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            data = b"" if body is None else body if isinstance(body, bytes) else json.dumps(body).encode()
+            writer.write(f"{method} {target} HTTP/1.1\r\nContent-Length: {len(data)}\r\n"
+                         f"Connection: close\r\n\r\n".encode() + data)
+            response = await reader.read()
+            writer.close()
+        head, _, payload = response.partition(b"\r\n\r\n")
+        return int(head.split()[1]), json.loads(payload)
+    return asyncio.run(run())
+
+def test_malformed_payloads_get_400():
+    service = SearchService(make_search(), workers=1)
+    assert request(service, "POST", "/batch", [1, 2])[0] == 400
+    assert request(service, "POST", "/batch", {"queries": ["apple"], "limit": "2"})[0] == 400
+    assert request(service, "PATCH", "/products/1", {"pid": 7})[0] == 400
+    assert request(service, "PATCH", "/products/1", {"price": "abc"})[0] == 400
+    assert request(service, "POST", "/products", {"pid": 3, "name": "Rug", "brand": "Ikea", "price": "abc",
+                                                  "availability": "In Stock", "description": "", "category": "Home"})[0] == 400
+    status, payload = request(service, "POST", "/batch", {"queries": ["apple"], "limit": 1})
+    assert status == 200 and payload["results"][0]["products"][0]["pid"] == 1
+
+def test_unexpected_errors_get_500():
+    service = SearchService(make_search(), workers=1)
+    def broken(*args, **kwargs):
+        raise KeyError("boom")
+    service.search.get_suggestions = broken
+    assert request(service, "GET", "/suggest?q=app") == (500, {"error": "Internal server error"})
+    assert request(service, "GET", "/health")[0] == 200
+
+def test_negative_limits_and_overlong_lines_get_4xx():
+    service = SearchService(make_search(), workers=1)
+    assert request(service, "GET", "/search?q=apple&limit=-1")[0] == 400
+    assert request(service, "GET", "/price?min=0&max=10&limit=-3")[0] == 400
+    assert request(service, "GET", "/search?q=" + "a" * 70000)[0] == 431
+    assert request(service, "GET", "/search?q=apple&limit=1")[0] == 200
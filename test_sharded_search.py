@@ -0,0 +1,28 @@
+import pytest
+from sharded_search import ShardedSearch
+from synthetic_catalog import generate_catalog
+from search_algorithms import SearchAlgorithms
+
+def test_zero_hit_queries_are_spelling_corrected_across_shards():
+    catalog = generate_catalog(500)
+    single = SearchAlgorithms(catalog)
+    with ShardedSearch(catalog, num_shards=2) as sharded:
+        for query in ("laptpo bag", "samsnug", "zzqx"):
+            assert sharded.did_you_mean(query) == single.did_you_mean(query)
+        results = sharded.run_all_searches("laptpo bag")
+        expected = single.run_all_searches("laptpo bag")
+        assert list(results) == list(expected) == ["indexed"]
+        assert results["indexed"].corrected_query == expected["indexed"].corrected_query
+        assert results["indexed"].matches_found == expected["indexed"].matches_found
+
+def test_a_failed_call_does_not_leave_answers_queued():
+    catalog = generate_catalog(300)
+    with ShardedSearch(catalog, num_shards=3) as sharded:
+        with pytest.raises(ValueError):
+            sharded.search_many(["x"], engine="bogus")
+        # Every shard fails this one; all of their answers must be read
+        with pytest.raises(RuntimeError):
+            sharded._broadcast("search", ("bogus", "x", None))
+        expected = SearchAlgorithms(catalog).indexed_search("samsung").matches_found
+        assert sharded.indexed_search("samsung").matches_found == expected
+        assert sharded.indexed_search("samsung").matches_found == expected
@@ -0,0 +1,29 @@
+from similar_products import SimilarityIndex
+from synthetic_catalog import generate_catalog
+
+def cosine(index, a, b):
+    (cols_a, vals_a), (cols_b, vals_b) = index._vector(a), index._vector(b)
+    weights = dict(zip(cols_b.tolist(), vals_b.tolist()))
+    return sum(v * weights.get(c, 0.0) for c, v in zip(cols_a.tolist(), vals_a.tolist()))
+
+def test_delta_rows_are_scored_exactly():
+    catalog = generate_catalog(300)
+    index = SimilarityIndex(catalog, compact_ratio=1.0)
+    for product in catalog[:40]:
+        index.update_product(product.replace(name=product.name + " Deluxe"))
+    assert len(index.delta) == 40
+    for pid in (catalog[0].pid, catalog[100].pid):
+        neighbours = index.similar_to_pid(pid, k=5)
+        for other, score in neighbours:
+            assert abs(score - cosine(index, pid, other)) < 1e-5
+        best_delta = max((p for p in index.delta if p != pid), key=lambda p: cosine(index, pid, p))
+        if cosine(index, pid, best_delta) > neighbours[-1][1]:
+            assert best_delta in dict(neighbours)
+
+def test_price_and_stock_updates_skip_revectorizing():
+    catalog = generate_catalog(50)
+    index = SimilarityIndex(catalog)
+    product = catalog[0].replace(price=catalog[0].price + 1, availability="Out of Stock")
+    assert index.update_product(product)
+    assert not index.delta and index.alive.all()
+    assert index.products[product.pid] is product
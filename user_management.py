@@ -7,6 +7,17 @@ import os
 # User data storage
 USERS_FILE = "users.json"
 
+# Callbacks invoked as listener(event, (username, basket), pid) on cart and wishlist changes
+basket_listeners = []
+
+def add_basket_listener(listener):
+    """Register a callback for "add", "remove", "clear" and "checkout" (pid None for the last two) basket events."""
+    basket_listeners.append(listener)
+
+def _notify(event, username, basket, pid=None):
+    for listener in basket_listeners:
+        listener(event, (username, basket), pid)
+
 def init_users_file():
     if not os.path.exists(USERS_FILE):
         with open(USERS_FILE, 'w') as f:
@@ -48,6 +59,11 @@ def login_user(username, password):
     
     return True, "Login successful"
 
+def load_users():
+    init_users_file()
+    with open(USERS_FILE, 'r') as f:
+        return json.load(f)
+
 def get_user_data(username):
     init_users_file()
     with open(USERS_FILE, 'r') as f:
@@ -72,6 +88,7 @@ def add_to_cart(username, product_id):
         if product_id not in user_data["cart"]:
             user_data["cart"].append(product_id)
             update_user_data(username, user_data)
+            _notify("add", username, "cart", product_id)
             return True
     return False
 
@@ -80,9 +97,54 @@ def remove_from_cart(username, product_id):
     if user_data and product_id in user_data["cart"]:
         user_data["cart"].remove(product_id)
         update_user_data(username, user_data)
+        _notify("remove", username, "cart", product_id)
+        return True
+    return False
+
+def clear_cart(username):
+    user_data = get_user_data(username)
+    if user_data:
+        user_data["cart"] = []
+        update_user_data(username, user_data)
+        _notify("clear", username, "cart")
+        return True
+    return False
+
+def checkout(username):
+    """Record the cart as an order and empty it"""
+    user_data = get_user_data(username)
+    if user_data and user_data["cart"]:
+        user_data.setdefault("orders", []).append(user_data["cart"])
+        user_data["cart"] = []
+        update_user_data(username, user_data)
+        _notify("checkout", username, "cart")
         return True
     return False
 
+def add_to_wishlist(username, product_id):
+    user_data = get_user_data(username)
+    if user_data:
+        wishlist = user_data.setdefault("wishlist", [])
+        if product_id not in wishlist:
+            wishlist.append(product_id)
+            update_user_data(username, user_data)
+            _notify("add", username, "wishlist", product_id)
+            return True
+    return False
+
+def remove_from_wishlist(username, product_id):
+    user_data = get_user_data(username)
+    if user_data and product_id in user_data.get("wishlist", []):
+        user_data["wishlist"].remove(product_id)
+        update_user_data(username, user_data)
+        _notify("remove", username, "wishlist", product_id)
+        return True
+    return False
+
+def get_wishlist(username):
+    user_data = get_user_data(username)
+    return user_data.get("wishlist", []) if user_data else []
+
 def get_cart(username):
     user_data = get_user_data(username)
     return user_data["cart"] if user_data else [] 
\ No newline at end of file